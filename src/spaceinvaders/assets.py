@@ -0,0 +1,188 @@
+import hashlib
+import json
+import os
+import struct
+
+import numpy as np
+import pygame
+
+from spaceinvaders.sprites import SpriteSheet, colorize_surface, convert_alpha, colorized_frame_cache, \
+    frame_mask_store
+
+BUNDLE_VERSION = 1
+MAGIC = b'SIAB'
+# magic, version, length of the JSON index
+HEADER = struct.Struct('<4sHI')
+BUNDLE_EXTENSION = '.bundle'
+
+
+def bundle_key(spritesheet_path, spritemap_path, wanted):
+    """Hash of everything a bundle is built from, the bundle is rebuilt as soon as any of it changes.
+
+    wanted is {frame number: [color, ...]}, the frames to slice and the colors to colorize each of them in."""
+    key = hashlib.sha256()
+    key.update(f'{BUNDLE_VERSION}:{pygame.version.ver}'.encode())
+    for path in (spritesheet_path, spritemap_path):
+        with open(path, 'rb') as f:
+            key.update(f.read())
+    key.update(json.dumps(sorted((num, sorted(map(list, colors))) for num, colors in wanted.items())).encode())
+    return key.hexdigest()[:16]
+
+
+def _surface_to_bytes(surface):
+    # the colorkey is stored separately, with it set tobytes() (and copy()) would bake it into the alpha
+    colorkey = surface.get_colorkey()
+    surface.set_colorkey(None)
+    data = pygame.image.tobytes(surface, 'RGBA')
+    surface.set_colorkey(colorkey)
+    return data
+
+
+def _surface_from_bytes(data, size, colorkey):
+    surface = pygame.image.frombytes(bytes(data), size, 'RGBA')
+    # same pixel format as a freshly sliced frame, or the colorkey doesn't match the same pixels
+    if pygame.display.get_surface() is None:
+        surface = surface.convert(pygame.Surface((1, 1), pygame.SRCALPHA))
+    else:
+        surface = convert_alpha(surface)
+    if colorkey is not None:
+        surface.set_colorkey(colorkey)
+    return surface
+
+
+def _mask_to_bytes(mask):
+    width, height = mask.get_size()
+    bits = np.array([[mask.get_at((x, y)) for x in range(width)] for y in range(height)], dtype=np.uint8)
+    return np.packbits(bits).tobytes()
+
+
+def _mask_from_bytes(data, size):
+    width, height = size
+    bits = np.unpackbits(np.frombuffer(data, dtype=np.uint8), count=width * height)
+    # go through a surface with the set bits opaque, so the mask is built in one call
+    pixels = np.zeros((width * height, 4), dtype=np.uint8)
+    pixels[:, 3] = bits * 255
+    return pygame.mask.from_surface(pygame.image.frombytes(pixels.tobytes(), size, 'RGBA'))
+
+
+class AssetBundle:
+    """Frames sliced out of the spritesheet, colorized, with their collision masks, ready to use.
+
+    Built from the spritesheet once, then saved as a single file: a JSON index followed by the raw pixels
+    and packed mask bits it points into. Loading is one read and no slicing, colorizing or mask building."""
+
+    def __init__(self):
+        # frame number -> uncolored frame
+        self.frames = {}
+        # (frame number, color) -> (colorized frame, mask)
+        self.colorized = {}
+
+    @classmethod
+    def build(cls, spritesheet_path, spritemap_path, wanted):
+        bundle = cls()
+        sprite_sheet = SpriteSheet(spritesheet_path, spritemap_path)
+        for num, colors in wanted.items():
+            frame = bundle.frames[num] = sprite_sheet.get_image_by_num(num)
+            for color in colors:
+                colorized = colorize_surface(frame, tuple(color))
+                bundle.colorized[num, tuple(color)] = colorized, pygame.mask.from_surface(colorized)
+        return bundle
+
+    def save(self, path):
+        index = []
+        blobs = []
+        offset = 0
+
+        def add(data):
+            nonlocal offset
+            blobs.append(data)
+            offset += len(data)
+            return [offset - len(data), len(data)]
+
+        for num, frame in self.frames.items():
+            colorkey = frame.get_colorkey()
+            entry = {'num': num, 'size': frame.get_size(), 'colorkey': colorkey and list(colorkey),
+                     'pixels': add(_surface_to_bytes(frame)), 'colors': []}
+            for (colorized_num, color), (colorized, mask) in self.colorized.items():
+                if colorized_num == num:
+                    colorkey = colorized.get_colorkey()
+                    entry['colors'].append({'color': list(color), 'colorkey': colorkey and list(colorkey),
+                                            'pixels': add(_surface_to_bytes(colorized)),
+                                            'mask': add(_mask_to_bytes(mask))})
+            index.append(entry)
+
+        index = json.dumps(index).encode()
+        # write to a temporary file first, other processes might be loading the bundle right now
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, BUNDLE_VERSION, len(index)))
+            f.write(index)
+            for blob in blobs:
+                f.write(blob)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            data = memoryview(f.read())
+        magic, version, index_length = HEADER.unpack_from(data)
+        if magic != MAGIC or version != BUNDLE_VERSION:
+            raise ValueError(f'{path} is not a version {BUNDLE_VERSION} asset bundle')
+        index = json.loads(bytes(data[HEADER.size:HEADER.size + index_length]))
+        blobs = data[HEADER.size + index_length:]
+
+        def blob(offset_length):
+            offset, length = offset_length
+            if offset + length > len(blobs):
+                raise ValueError(f'{path} is truncated')
+            return blobs[offset:offset + length]
+
+        bundle = cls()
+        for entry in index:
+            size = tuple(entry['size'])
+            bundle.frames[entry['num']] = _surface_from_bytes(blob(entry['pixels']), size, entry['colorkey'])
+            for colorized in entry['colors']:
+                bundle.colorized[entry['num'], tuple(colorized['color'])] = (
+                    _surface_from_bytes(blob(colorized['pixels']), size, colorized['colorkey']),
+                    _mask_from_bytes(blob(colorized['mask']), size))
+        return bundle
+
+    def install(self):
+        # hand the colorized frames and their masks to the caches every sprite goes through
+        for (num, color), (colorized, mask) in self.colorized.items():
+            colorized_frame_cache.put(self.frames[num], color, colorized)
+            frame_mask_store.put(colorized, mask)
+
+
+# bundles already loaded by this process, by path
+_loaded_bundles = {}
+
+
+def load_asset_bundle(spritesheet_path, spritemap_path, wanted, cache_dir):
+    """The bundle for these inputs, from cache_dir if it was built before, otherwise built and saved there.
+
+    Every game in a process built from the same inputs gets the same bundle, and so the same frame
+    surfaces, which is what the colorized frame cache is keyed by. The returned bundle has already been
+    installed."""
+    key = bundle_key(spritesheet_path, spritemap_path, wanted)
+    path = os.path.join(cache_dir, key + BUNDLE_EXTENSION)
+    bundle = _loaded_bundles.get(path)
+    if bundle is not None:
+        bundle.install()
+        return bundle
+    try:
+        bundle = AssetBundle.load(path)
+    except (FileNotFoundError, ValueError, struct.error):
+        bundle = AssetBundle.build(spritesheet_path, spritemap_path, wanted)
+        os.makedirs(cache_dir, exist_ok=True)
+        bundle.save(path)
+        # bundles built from older inputs will never be loaded again
+        for name in os.listdir(cache_dir):
+            if name.endswith(BUNDLE_EXTENSION) and name != key + BUNDLE_EXTENSION:
+                try:
+                    os.remove(os.path.join(cache_dir, name))
+                except FileNotFoundError:
+                    pass
+    _loaded_bundles[path] = bundle
+    bundle.install()
+    return bundle
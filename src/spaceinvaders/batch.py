@@ -0,0 +1,231 @@
+"""Run many headless games across a process pool and summarize the results.
+
+Run from the repository root, so the game can find its resources:
+
+    PYTHONPATH=src python -m spaceinvaders.batch --games 200 --set base_enemy_shoot_interval_ms=600
+
+Every game is identified by its seed and the config it was played with. Finished games are cached on
+disk under (config hash, seed), so repeating a sweep only plays the games that haven't been played yet.
+"""
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import random
+import sys
+import time
+
+# keep the worker processes from each printing the pygame banner
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+import numpy as np
+
+from spaceinvaders.helpers import Action
+from spaceinvaders.main import SpaceInvaders
+
+DEFAULT_CACHE_DIR = '.cache/batch'
+DEFAULT_MAX_FRAMES = 60 * 60 * 10
+DEFAULT_DT_MS = 16
+# bump whenever a change to the game changes how a seeded game plays out, so old results aren't reused
+GAME_VERSION = 3
+
+
+class RandomPlayer:
+    """Holds a random move for a short while, then picks another, and fires whenever it can."""
+    MOVES = (Action.NONE, Action.LEFT, Action.RIGHT)
+
+    def __init__(self, seed):
+        self.rng = random.Random(seed)
+        self.move = Action.NONE
+        self.frames_left = 0
+
+    def act(self, game: SpaceInvaders) -> Action:
+        if self.frames_left <= 0:
+            self.move = self.rng.choice(self.MOVES)
+            self.frames_left = self.rng.randint(5, 40)
+        self.frames_left -= 1
+        return self.move | Action.FIRE
+
+
+def config_hash(config, max_frames, dt_ms):
+    # the runner settings change the outcome of a game as much as the config does, so they're part of the key
+    key = json.dumps({'config': config, 'max_frames': max_frames, 'dt_ms': dt_ms, 'game_version': GAME_VERSION},
+                     sort_keys=True)
+    return hashlib.sha256(key.encode()).hexdigest()[:16]
+
+
+class ResultCache:
+    """One JSON file per finished game, at <directory>/<config hash>/<seed>.json."""
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def _path(self, key, seed):
+        return os.path.join(self.directory, key, f'{seed}.json')
+
+    def get(self, key, seed):
+        try:
+            with open(self._path(key, seed)) as f:
+                return json.load(f)
+        except (FileNotFoundError, json.decoder.JSONDecodeError):
+            return None
+
+    def put(self, key, seed, result):
+        path = self._path(key, seed)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # write to a temporary file first, so an interrupted sweep never leaves half a result behind
+        with open(path + '.tmp', 'w') as f:
+            json.dump(result, f)
+        os.replace(path + '.tmp', path)
+
+
+# games are reused within a worker process, reset() is much cheaper than building a new game
+_worker_games = {}
+
+
+def run_game(config, seed, max_frames=DEFAULT_MAX_FRAMES, dt_ms=DEFAULT_DT_MS):
+    key = json.dumps(config, sort_keys=True)
+    if key not in _worker_games:
+        _worker_games[key] = SpaceInvaders(headless=True, config=config)
+    game = _worker_games[key]
+    game.reset(seed)
+    player = RandomPlayer(seed)
+
+    frame_times_ms = np.empty(max_frames, dtype=np.float64)
+    while not game.game_is_over and game.frames_elapsed < max_frames:
+        start = time.perf_counter()
+        game.step(player.act(game), dt_ms)
+        frame_times_ms[game.frames_elapsed - 1] = (time.perf_counter() - start) * 1000
+    frame_times_ms = frame_times_ms[:game.frames_elapsed]
+
+    return {
+        'seed': seed,
+        'score': game.score_player,
+        'enemy_grid_clears': game.enemy_grid_clears,
+        'frames': game.frames_elapsed,
+        'game_over': game.game_is_over,
+        'frame_time_ms': {
+            'mean': float(frame_times_ms.mean()),
+            'p50': float(np.percentile(frame_times_ms, 50)),
+            'p95': float(np.percentile(frame_times_ms, 95)),
+            'max': float(frame_times_ms.max()),
+        },
+    }
+
+
+def _run_game_star(args):
+    return run_game(*args)
+
+
+def run_batch(config, seeds, processes=None, max_frames=DEFAULT_MAX_FRAMES, dt_ms=DEFAULT_DT_MS,
+              cache: ResultCache = None):
+    """Yields each game's result as soon as it's available, cached games first."""
+    key = config_hash(config, max_frames, dt_ms)
+    to_run = []
+    for seed in seeds:
+        result = cache.get(key, seed) if cache else None
+        if result is not None:
+            yield result
+        else:
+            to_run.append(seed)
+    if not to_run:
+        return
+
+    pool = multiprocessing.Pool(processes)
+    try:
+        jobs = [(config, seed, max_frames, dt_ms) for seed in to_run]
+        for result in pool.imap_unordered(_run_game_star, jobs):
+            if cache:
+                cache.put(key, result['seed'], result)
+            yield result
+        # let the workers finish on their own, terminating them can leave one holding the task queue's lock
+        pool.close()
+    except BaseException:
+        # interrupted, or the caller stopped asking for results
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+
+
+def summarize(results):
+    if not results:
+        # no games, nothing to take a mean or a max of
+        return {'games': 0, 'games_finished': 0}
+    scores = np.array([r['score'] for r in results])
+    clears = np.array([r['enemy_grid_clears'] for r in results])
+    frames = np.array([r['frames'] for r in results])
+    frame_means = np.array([r['frame_time_ms']['mean'] for r in results])
+    frame_p95s = np.array([r['frame_time_ms']['p95'] for r in results])
+    return {
+        'games': len(results),
+        'score': {'mean': float(scores.mean()), 'median': float(np.median(scores)),
+                  'min': int(scores.min()), 'max': int(scores.max())},
+        'enemy_grid_clears': {'mean': float(clears.mean()), 'max': int(clears.max())},
+        'frames': {'mean': float(frames.mean()), 'min': int(frames.min()), 'max': int(frames.max())},
+        'games_finished': sum(r['game_over'] for r in results),
+        'frame_time_ms': {'mean': float(frame_means.mean()), 'p95': float(frame_p95s.mean()),
+                          'max': max(r['frame_time_ms']['max'] for r in results)},
+    }
+
+
+def parse_setting(setting):
+    # "entity_info.ENEMY_EARS.speed=200" -> {'entity_info': {'ENEMY_EARS': {'speed': 200}}}
+    path, _, value = setting.partition('=')
+    try:
+        value = json.loads(value)
+    except json.decoder.JSONDecodeError:
+        pass
+    *parents, leaf = path.split('.')
+    config = node = {}
+    for parent in parents:
+        node = node.setdefault(parent, {})
+    node[leaf] = value
+    return config
+
+
+def merge_config(config, overrides):
+    for k, v in overrides.items():
+        if isinstance(v, dict) and isinstance(config.get(k), dict):
+            merge_config(config[k], v)
+        else:
+            config[k] = v
+    return config
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Play many headless Space Invaders games and summarize them.')
+    parser.add_argument('--games', type=int, default=100, help='number of games to play')
+    parser.add_argument('--first-seed', type=int, default=0, help='games use consecutive seeds starting here')
+    parser.add_argument('--processes', type=int, default=None, help='worker processes, defaults to one per core')
+    parser.add_argument('--config', help='JSON file with config overrides')
+    parser.add_argument('--set', action='append', default=[], metavar='KEY=VALUE',
+                        help='override a single config value, e.g. entity_info.ENEMY_EARS.speed=200')
+    parser.add_argument('--max-frames', type=int, default=DEFAULT_MAX_FRAMES, help='stop a game after this many frames')
+    parser.add_argument('--dt-ms', type=int, default=DEFAULT_DT_MS, help='simulated length of a frame')
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR)
+    parser.add_argument('--no-cache', action='store_true', help='play every game even if it was played before')
+    parser.add_argument('--quiet', action='store_true', help='only print the summary')
+    args = parser.parse_args(argv)
+
+    config = {}
+    if args.config:
+        with open(args.config) as f:
+            config = json.load(f)
+    for setting in args.set:
+        merge_config(config, parse_setting(setting))
+
+    cache = None if args.no_cache else ResultCache(args.cache_dir)
+    seeds = range(args.first_seed, args.first_seed + args.games)
+
+    results = []
+    for result in run_batch(config, seeds, args.processes, args.max_frames, args.dt_ms, cache):
+        results.append(result)
+        if not args.quiet:
+            print(json.dumps(result), flush=True)
+    print(json.dumps(summarize(results), indent=2))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,161 @@
+"""Time the game loop in fixed, seeded scenarios and compare against a stored baseline.
+
+Run from the repository root, so the game can find its resources:
+
+    PYTHONPATH=src python -m spaceinvaders.benchmarks --out results.json
+    PYTHONPATH=src python -m spaceinvaders.benchmarks --baseline baseline.json --threshold 0.1
+
+Each frame is a step() and a draw() into the offscreen screen of a headless game. Every scenario is timed
+a few times and the fastest run is kept, then played once more with the frame profiler on to break the
+frame down by stage. That second run only feeds the breakdown, the profiler's own overhead never shows up
+in the frame times.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+# keep the pygame banner out of the results
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+import numpy as np
+import pygame
+
+from spaceinvaders.benchmarks.scenarios import SCENARIOS, Scenario
+from spaceinvaders.main import SpaceInvaders
+from spaceinvaders.profiling import FrameProfiler
+
+RESULTS_VERSION = 1
+DEFAULT_FRAMES = 1200
+DEFAULT_REPEATS = 3
+DEFAULT_DT_MS = 16
+DEFAULT_THRESHOLD = 0.1
+
+
+def _play(game: SpaceInvaders, scenario: Scenario, frames, dt_ms, profiler: FrameProfiler = None):
+    game.reset(scenario.seed)
+    scenario.rng.seed(scenario.seed)
+    scenario.setup(game)
+    frame_times_ms = np.empty(frames, dtype=np.float64)
+    resets = 0
+    for frame in range(frames):
+        if game.game_is_over:
+            # keep the scenario going for the full run
+            game.reset(scenario.seed)
+            scenario.setup(game)
+            resets += 1
+        scenario.before_frame(game, frame)
+        actions = scenario.act(game, frame)
+        if profiler is not None:
+            profiler.begin_frame()
+        start = time.perf_counter()
+        game.step(actions, dt_ms)
+        game.draw()
+        frame_times_ms[frame] = (time.perf_counter() - start) * 1000
+        if profiler is not None:
+            profiler.end_frame()
+    return frame_times_ms, resets
+
+
+def run_scenario(scenario: Scenario, frames=DEFAULT_FRAMES, repeats=DEFAULT_REPEATS, dt_ms=DEFAULT_DT_MS):
+    game = SpaceInvaders(headless=True, seed=scenario.seed, config=scenario.config)
+
+    best = None
+    for _ in range(repeats):
+        frame_times_ms, resets = _play(game, scenario, frames, dt_ms)
+        if best is None or frame_times_ms.sum() < best[0].sum():
+            best = frame_times_ms, resets
+    frame_times_ms, resets = best
+
+    # one more run with every stage timed, for the breakdown only
+    game.profiler = FrameProfiler(capacity=frames, enabled=True)
+    _play(game, scenario, frames, dt_ms, game.profiler)
+    stages_ms = {name: float(np.nanmean(game.profiler.stage_ms[:, column]))
+                 for column, name in enumerate(game.profiler.stage_names)}
+
+    return {
+        'fps': float(frames / (frame_times_ms.sum() / 1000)),
+        'frame_ms': {
+            'mean': float(frame_times_ms.mean()),
+            'p50': float(np.percentile(frame_times_ms, 50)),
+            'p95': float(np.percentile(frame_times_ms, 95)),
+            'p99': float(np.percentile(frame_times_ms, 99)),
+            'max': float(frame_times_ms.max()),
+        },
+        # mean over the frames each stage ran in
+        'stages_ms': stages_ms,
+        'resets': resets,
+    }
+
+
+def run_benchmarks(names=None, frames=DEFAULT_FRAMES, repeats=DEFAULT_REPEATS, dt_ms=DEFAULT_DT_MS, seed=0):
+    return {
+        'version': RESULTS_VERSION,
+        'frames': frames,
+        'repeats': repeats,
+        'dt_ms': dt_ms,
+        'seed': seed,
+        'python': platform.python_version(),
+        'pygame': pygame.version.ver,
+        'machine': platform.machine(),
+        'scenarios': {name: run_scenario(SCENARIOS[name](seed), frames, repeats, dt_ms)
+                      for name in (names or SCENARIOS)},
+    }
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """{scenario: {...}} for every scenario in both, regressed if its mean frame time grew by more than threshold."""
+    comparison = {}
+    for name, result in results['scenarios'].items():
+        if name not in baseline['scenarios']:
+            continue
+        baseline_ms = baseline['scenarios'][name]['frame_ms']['mean']
+        current_ms = result['frame_ms']['mean']
+        change = current_ms / baseline_ms - 1
+        comparison[name] = {
+            'baseline_ms': baseline_ms,
+            'current_ms': current_ms,
+            'change': change,
+            'regressed': change > threshold,
+        }
+    return comparison
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m spaceinvaders.benchmarks',
+                                     description='Time the Space Invaders game loop in fixed scenarios.')
+    parser.add_argument('scenarios', nargs='*', metavar='SCENARIO',
+                        help=f'scenarios to run, all of them if none are given: {", ".join(SCENARIOS)}')
+    parser.add_argument('--frames', type=int, default=DEFAULT_FRAMES, help='frames per run')
+    parser.add_argument('--repeats', type=int, default=DEFAULT_REPEATS, help='runs per scenario, the fastest is kept')
+    parser.add_argument('--dt-ms', type=int, default=DEFAULT_DT_MS, help='simulated length of a frame')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', metavar='PATH', help='write the results to PATH as JSON')
+    parser.add_argument('--baseline', metavar='PATH', help='compare against results saved earlier with --out')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='how much slower a scenario\'s mean frame can get before it counts as a regression')
+    args = parser.parse_args(argv)
+    for name in args.scenarios:
+        if name not in SCENARIOS:
+            parser.error(f'unknown scenario {name}, pick from {", ".join(SCENARIOS)}')
+
+    results = run_benchmarks(args.scenarios, args.frames, args.repeats, args.dt_ms, args.seed)
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if not args.baseline:
+        print(json.dumps(results, indent=2))
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    comparison = compare(results, baseline, args.threshold)
+    print(json.dumps(comparison, indent=2))
+    for name, scenario in comparison.items():
+        if scenario['regressed']:
+            print(f'{name} regressed: {scenario["baseline_ms"]:.3f} -> {scenario["current_ms"]:.3f} ms per frame '
+                  f'({scenario["change"]:+.1%})', file=sys.stderr)
+    return 1 if any(scenario['regressed'] for scenario in comparison.values()) else 0
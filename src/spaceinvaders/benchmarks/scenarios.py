@@ -0,0 +1,94 @@
+import random
+
+from spaceinvaders.helpers import Action
+from spaceinvaders.main import SpaceInvaders, BULLET_GRID_ENEMY_1_TAG, BULLET_GRID_ENEMY_2_TAG, \
+    BULLET_GRID_ENEMY_3_TAG, BULLET_PLAYER_TAG
+
+ENEMY_BULLET_TAGS = (BULLET_GRID_ENEMY_1_TAG, BULLET_GRID_ENEMY_2_TAG, BULLET_GRID_ENEMY_3_TAG)
+
+
+class Scenario:
+    """A fixed, seeded situation to time the game loop in.
+
+    setup() puts a freshly reset game into the situation, before_frame() keeps it there, and act()
+    gives the input for each frame. Neither setup() nor before_frame() is timed, only the frames are."""
+    name = None
+    # config the game is built with
+    config = {}
+
+    def __init__(self, seed=0):
+        self.seed = seed
+        self.rng = random.Random(seed)
+
+    def setup(self, game: SpaceInvaders):
+        pass
+
+    def before_frame(self, game: SpaceInvaders, frame):
+        pass
+
+    def act(self, game: SpaceInvaders, frame) -> Action:
+        # sweep across the screen and back, firing the whole time
+        return Action.FIRE | (Action.RIGHT if (frame // 90) % 2 == 0 else Action.LEFT)
+
+
+class FullGrid(Scenario):
+    """An ordinary game with the standard 5x11 grid."""
+    name = 'full_grid'
+
+
+class EnlargedGrid(Scenario):
+    """8x12 grid, as many enemies as fit above the barriers."""
+    name = 'enlarged_grid'
+    config = {'enemy_rows': 8, 'enemy_columns': 12}
+
+
+class BulletStorm(Scenario):
+    """Hundreds of enemy bullets on screen at once, topped up every frame."""
+    name = 'bullet_storm'
+    bullets = 300
+
+    def before_frame(self, game: SpaceInvaders, frame):
+        player_x = game.current_player_sprite.rect.centerx if game.current_player_sprite else -100
+        while len(game.enemy_bullet_sprites) < self.bullets:
+            x = self.rng.randrange(4, game.WINDOW_WIDTH - 4)
+            # the player stands still, so leave a gap over it and keep it alive for the whole run
+            if abs(x - player_x) < 12:
+                continue
+            game.spawn(self.rng.choice(ENEMY_BULLET_TAGS), x_pos=x, y_pos=self.rng.randrange(40, 200),
+                       groups=(game.enemy_bullet_sprites,))
+
+    def act(self, game: SpaceInvaders, frame) -> Action:
+        return Action.FIRE
+
+
+class BarrierDamage(Scenario):
+    """Bullets raining onto the barriers from above and below, barriers are rebuilt as soon as they're gone."""
+    name = 'barrier_damage'
+    bullets_per_frame = 8
+
+    def before_frame(self, game: SpaceInvaders, frame):
+        if not game.barrier_sprites:
+            game.setup_barriers()
+        barriers = game.barrier_sprites.sprites()
+        for _ in range(self.bullets_per_frame):
+            barrier = self.rng.choice(barriers)
+            x = self.rng.randrange(barrier.rect.left, barrier.rect.right)
+            if self.rng.random() < 0.5:
+                game.spawn(self.rng.choice(ENEMY_BULLET_TAGS), x_pos=x, y_pos=barrier.rect.top - 6,
+                           groups=(game.enemy_bullet_sprites,))
+            else:
+                game.spawn(BULLET_PLAYER_TAG, x_pos=x, y_pos=barrier.rect.bottom + 6,
+                           groups=(game.player_bullet_sprites,))
+
+
+class Repopulation(Scenario):
+    """The grid is wiped out before every frame, so every frame repopulates it in setup_grid_enemies."""
+    name = 'repopulation'
+
+    def before_frame(self, game: SpaceInvaders, frame):
+        for enemy in game.grid_enemy_sprites.sprites():
+            enemy.kill()
+            game.formation.kill(enemy)
+
+
+SCENARIOS = {scenario.name: scenario for scenario in (FullGrid, EnlargedGrid, BulletStorm, BarrierDamage, Repopulation)}
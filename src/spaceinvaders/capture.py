@@ -0,0 +1,182 @@
+"""Record gameplay to an animated GIF, a directory of PNGs or a file of raw RGB frames, off the game's thread.
+
+What's written is picked by the path's extension, from the repository root:
+
+    PYTHONPATH=src python -m spaceinvaders.main --capture gameplay.gif
+    PYTHONPATH=src python -m spaceinvaders.main --capture frames/
+    PYTHONPATH=src python -m spaceinvaders.main --capture gameplay.raw
+
+A GIF needs Pillow, and is held in memory until the game exits, so it stops at GIF_MAX_FRAMES frames. PNGs
+and raw frames go to disk as they come, for recordings of any length.
+"""
+import os
+import queue
+import struct
+import sys
+import threading
+import time
+
+import pygame
+
+# frames waiting for the encoder, past this many the game drops them instead of waiting
+CAPTURE_QUEUE_SIZE = 120
+# browsers slow down GIFs with delays under 20 ms, so GIF capture keeps at most one frame per 20 ms
+GIF_MIN_FRAME_MS = 20
+# a GIF is only written out when capture stops, so its frames are all held in memory until then, at about
+# 57 kB each, past this many the rest of the capture is left out
+GIF_MAX_FRAMES = 3000
+RAW_MAGIC = b'SIRW'
+# magic, width, height of a raw capture, then every frame is its duration in ms followed by RGB rows
+RAW_HEADER = struct.Struct('<4sHH')
+RAW_FRAME = struct.Struct('<I')
+
+
+class GifWriter:
+    # Pillow is only needed for GIFs, so it's only imported when one is asked for
+    def __init__(self, path, size, max_frames=GIF_MAX_FRAMES):
+        try:
+            from PIL import Image
+        except ImportError:
+            raise RuntimeError('capturing a GIF needs Pillow, pip install pillow, or capture to .png or .raw') from None
+        self.image = Image
+        self.path = path
+        self.size = size
+        self.max_frames = max_frames
+        self.frames = []
+        self.durations = []
+        # frames that came after the GIF was full
+        self.left_out = 0
+
+    def write(self, pixels, duration_ms):
+        if len(self.frames) >= self.max_frames:
+            if not self.left_out:
+                print(f'capture: {self.path} is full at {self.max_frames} frames, leaving out the rest, '
+                      f'capture to .png or .raw for longer recordings', file=sys.stderr)
+            self.left_out += 1
+            return
+        # the game only uses a handful of colors, so a palette image holds a frame losslessly in a quarter the memory
+        frame = self.image.frombytes('RGB', self.size, pixels)
+        self.frames.append(frame.convert('P', palette=self.image.Palette.ADAPTIVE, colors=256))
+        self.durations.append(max(GIF_MIN_FRAME_MS, round(duration_ms)))
+
+    def close(self):
+        if self.frames:
+            self.frames[0].save(self.path, save_all=True, append_images=self.frames[1:], duration=self.durations,
+                                loop=0, optimize=False, disposal=1)
+
+
+class PngSequenceWriter:
+    # numbered PNGs in a directory, with how long each one is on screen in durations.csv
+    def __init__(self, path, size):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.size = size
+        self.count = 0
+        self.durations = open(os.path.join(path, 'durations.csv'), 'w')
+        self.durations.write('file,duration_ms\n')
+
+    def write(self, pixels, duration_ms):
+        self.count += 1
+        name = f'frame_{self.count:06d}.png'
+        pygame.image.save(pygame.image.frombytes(pixels, self.size, 'RGB'), os.path.join(self.path, name))
+        self.durations.write(f'{name},{duration_ms:.1f}\n')
+
+    def close(self):
+        self.durations.close()
+
+
+class RawWriter:
+    def __init__(self, path, size):
+        self.file = open(path, 'wb')
+        self.file.write(RAW_HEADER.pack(RAW_MAGIC, *size))
+
+    def write(self, pixels, duration_ms):
+        self.file.write(RAW_FRAME.pack(round(duration_ms)))
+        self.file.write(pixels)
+
+    def close(self):
+        self.file.close()
+
+
+def writer_for(path):
+    # what to write is picked by the path: .gif, .raw, or anything else is a directory of PNGs
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.gif':
+        return GifWriter
+    if extension == '.raw':
+        return RawWriter
+    return PngSequenceWriter
+
+
+class FrameCapture:
+    """Records the frames the game shows to a GIF, a PNG sequence or raw RGB frames, on a thread of its own.
+
+    All the game does per frame is submit(): a copy of the screen goes onto a bounded queue, or, if the
+    encoder has fallen that far behind, the frame is dropped and counted. The encoder thread turns frames
+    into RGB, and since most frames of a slow-moving grid are the same as the one before, only writes a
+    frame when it differs from the last one, holding it on screen until the next one that does. How long
+    a frame lasts comes from when it was submitted, so dropped and repeated frames don't throw the timing."""
+
+    def __init__(self, path, size, queue_size=CAPTURE_QUEUE_SIZE):
+        writer = writer_for(path)
+        self.path = path
+        # checks Pillow is there before the game starts, rather than when the first frame arrives
+        self.writer = writer(path, size)
+        self.min_frame_ms = GIF_MIN_FRAME_MS if writer is GifWriter else 0
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.last_submitted = None
+        self.submitted = 0
+        self.dropped = 0
+        self.written = 0
+        self.error = None
+        self.thread = threading.Thread(target=self.encode, name='capture', daemon=True)
+        self.thread.start()
+
+    def submit(self, surface: pygame.Surface):
+        now = time.perf_counter()
+        if self.last_submitted is not None and (now - self.last_submitted) * 1000 < self.min_frame_ms:
+            return
+        self.last_submitted = now
+        self.submitted += 1
+        try:
+            self.queue.put_nowait((now, surface.copy()))
+        except queue.Full:
+            self.dropped += 1
+
+    def encode(self):
+        # the frame waiting to be written, it's only known how long it lasts once a different one comes along
+        pending = pending_time = None
+        try:
+            while True:
+                item = self.queue.get()
+                if item is None:
+                    break
+                submitted_at, surface = item
+                pixels = pygame.image.tobytes(surface, 'RGB')
+                if pixels == pending:
+                    continue
+                if pending is not None:
+                    self.writer.write(pending, (submitted_at - pending_time) * 1000)
+                    self.written += 1
+                pending, pending_time = pixels, submitted_at
+            if pending is not None:
+                # the last frame gets as long as it was on screen before capture stopped
+                self.writer.write(pending, (time.perf_counter() - pending_time) * 1000)
+                self.written += 1
+            self.writer.close()
+        except Exception as error:
+            self.error = error
+
+    def close(self):
+        # waits for the encoder to finish what's queued, then raises anything it ran into
+        if self.thread.is_alive():
+            self.queue.put(None)
+        self.thread.join()
+        if self.error is not None:
+            raise self.error
+
+    def report(self):
+        left_out = getattr(self.writer, 'left_out', 0)
+        return (f'captured {self.submitted} frames to {self.path}: {self.written - left_out} written, '
+                f'{self.submitted - self.dropped - self.written} repeats skipped, {self.dropped} dropped' +
+                (f', {left_out} left out past the end of the GIF' if left_out else ''))
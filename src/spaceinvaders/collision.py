@@ -0,0 +1,147 @@
+from collections import defaultdict
+from enum import Enum, auto
+
+import pygame
+
+
+class CollisionKind(Enum):
+    PLAYER = auto()
+    PLAYER_BULLET = auto()
+    ENEMY_BULLET = auto()
+    GRID_ENEMY = auto()
+    BARRIER = auto()
+
+    # kinds get hashed for every candidate pair, the identity hash is done in C where Enum's isn't, and
+    # members are singletons so it agrees with ==
+    __hash__ = object.__hash__
+
+
+def collide_rect(a, b):
+    return a.rect.colliderect(b.rect)
+
+
+def collide_hitbox_mask(a, b):
+    # the hitboxes skip the transparent borders, the mask test only runs if those overlap
+    return a.hitbox.colliderect(b.hitbox) and pygame.sprite.collide_mask(a, b) is not None
+
+
+# every pair of kinds that can interact, and how to test a candidate pair of that kind
+INTERACTIONS = {
+    (CollisionKind.PLAYER_BULLET, CollisionKind.GRID_ENEMY): collide_hitbox_mask,
+    (CollisionKind.PLAYER, CollisionKind.ENEMY_BULLET): collide_rect,
+    (CollisionKind.PLAYER, CollisionKind.GRID_ENEMY): collide_rect,
+    (CollisionKind.BARRIER, CollisionKind.ENEMY_BULLET): collide_hitbox_mask,
+    (CollisionKind.BARRIER, CollisionKind.PLAYER_BULLET): collide_hitbox_mask,
+    (CollisionKind.PLAYER_BULLET, CollisionKind.ENEMY_BULLET): collide_hitbox_mask,
+}
+
+class SpatialHash:
+    """Uniform grid over the playfield, sprites are bucketed by the cells their rect touches."""
+
+    def __init__(self, cell_size=16):
+        self.cell_size = cell_size
+        self.cells = defaultdict(list)
+
+    def clear(self):
+        self.cells.clear()
+
+    def cells_of(self, rect):
+        cell_size = self.cell_size
+        return [(cell_x, cell_y)
+                for cell_x in range(rect.left // cell_size, (rect.right - 1) // cell_size + 1)
+                for cell_y in range(rect.top // cell_size, (rect.bottom - 1) // cell_size + 1)]
+
+    def insert(self, sprite, kind: CollisionKind):
+        for cell in self.cells_of(sprite.rect):
+            self.cells[cell].append((kind, sprite))
+
+    def insert_group(self, group, kind: CollisionKind):
+        for sprite in group:
+            self.insert(sprite, kind)
+
+    def insert_boxes(self, sprites, boxes, kind: CollisionKind):
+        # boxes is an (n, 4) array of left, top, right, bottom, one row per sprite, the cells they touch are
+        # worked out for all of them at once
+        cell_size = self.cell_size
+        cells = self.cells
+        first_cells = boxes[:, :2] // cell_size
+        last_cells = (boxes[:, 2:] - 1) // cell_size
+        for sprite, (left, top), (right, bottom) in zip(sprites, first_cells.tolist(), last_cells.tolist()):
+            if left == right and top == bottom:
+                cells[left, top].append((kind, sprite))
+                continue
+            for cell_x in range(left, right + 1):
+                for cell_y in range(top, bottom + 1):
+                    cells[cell_x, cell_y].append((kind, sprite))
+
+
+class BroadPhase:
+    """A single broad phase for every kind of collision in the game.
+
+    Things that only move now and then (the formation, the barriers) live in a static hash that is
+    rebuilt only when its owner says it moved. Things that move every frame (the player, bullets)
+    go into a dynamic hash that is rebuilt each frame. Candidates come from sprites sharing a cell,
+    and only candidates of interacting kinds get the narrow-phase test, so the cost grows with the
+    number of things that are actually close together, not with the size of the groups."""
+
+    def __init__(self, cell_size=16):
+        self.static = SpatialHash(cell_size)
+        self.dynamic = SpatialHash(cell_size)
+        self.static_version = None
+
+    def update_static(self, version, groups):
+        # groups is a list of (group, kind), rebuilt only when version changes
+        if version == self.static_version:
+            return
+        self.static.clear()
+        for group, kind in groups:
+            self.static.insert_group(group, kind)
+        self.static_version = version
+
+    def invalidate_static(self):
+        self.static_version = None
+
+    def update_dynamic(self, groups, boxes=()):
+        # boxes is a list of (sprites, boxes, kind), for things whose rects are already at hand as an array
+        self.dynamic.clear()
+        for group, kind in groups:
+            self.dynamic.insert_group(group, kind)
+        for sprites, sprite_boxes, kind in boxes:
+            self.dynamic.insert_boxes(sprites, sprite_boxes, kind)
+
+    def colliding_pairs(self):
+        """Every colliding pair, as {(kind_a, kind_b): [(sprite_a, sprite_b), ...]} with the kinds
+        ordered the way they are in INTERACTIONS."""
+        pairs = defaultdict(list)
+        seen = set()
+
+        def test(kind_a, sprite_a, kind_b, sprite_b):
+            # no kind interacts with itself, and crowds of bullets of the same kind are common
+            if kind_a is kind_b:
+                return
+            if (kind_a, kind_b) in INTERACTIONS:
+                key, pair = (kind_a, kind_b), (sprite_a, sprite_b)
+            elif (kind_b, kind_a) in INTERACTIONS:
+                key, pair = (kind_b, kind_a), (sprite_b, sprite_a)
+            else:
+                return
+            # sprites spanning several cells can meet more than once
+            if pair in seen:
+                return
+            seen.add(pair)
+            if INTERACTIONS[key](*pair):
+                pairs[key].append(pair)
+
+        static_cells = self.static.cells
+        for cell, bucket in self.dynamic.cells.items():
+            # moving things against each other
+            for i, (kind_a, sprite_a) in enumerate(bucket):
+                for kind_b, sprite_b in bucket[i + 1:]:
+                    test(kind_a, sprite_a, kind_b, sprite_b)
+            # moving things against the static ones in the same cell
+            static_bucket = static_cells.get(cell)
+            if static_bucket:
+                for kind_a, sprite_a in bucket:
+                    for kind_b, sprite_b in static_bucket:
+                        test(kind_a, sprite_a, kind_b, sprite_b)
+        return pairs
@@ -0,0 +1,203 @@
+from typing import List
+
+import numpy as np
+
+from spaceinvaders.helpers import Direction
+
+# animation frames an enemy type can have, frame numbers are stored as int8
+MAX_FRAMES = np.iinfo(np.int8).max
+
+
+class Formation:
+    """The main enemy grid, stored as one array per field instead of one object per enemy.
+
+    Cell i sits at row i // columns and column i % columns. The grid enemy sprites are only views of
+    the cells: they are registered with attach(), and sync_views() copies positions and animation
+    frames onto them when something has changed.
+
+    Every cell moves by the same amount, dead or alive, so each column shares one x position and
+    each row one y position. Together with an index of the occupied columns and the bottom living
+    enemy in each, kept up to date by kill(), that makes the edges of the formation and the choice
+    of shooter simple lookups."""
+
+    def __init__(self, rows: int, columns: int, origin: tuple, spacing: tuple, kinds: List[int],
+                 frame_counts: List[int], widths: List[int], heights: List[int], speeds: List[float]):
+        self.rows = rows
+        self.columns = columns
+        num_cells = rows * columns
+
+        # grid position of every cell
+        self.row = np.repeat(np.arange(rows), columns)
+        self.column = np.tile(np.arange(columns), rows)
+
+        # center position of every cell, x in column 0 and y in column 1
+        self.pos = np.empty((num_cells, 2), dtype=np.float64)
+        self.pos[:, 0] = origin[0] + self.column * spacing[0]
+        self.pos[:, 1] = origin[1] + self.row * spacing[1]
+
+        # kinds holds one enemy type per row, every cell of a row shares it
+        self.kind = np.asarray(kinds, dtype=np.int8)[self.row]
+        # number of animation frames, rect width and speed for each enemy type, looked up per cell
+        self.frame_count = np.asarray(frame_counts, dtype=np.int8)[self.kind]
+        self.width = np.asarray(widths, dtype=np.int16)[self.kind]
+        self.half_width = self.width // 2
+        self.speed = np.asarray(speeds, dtype=np.float64)[self.kind]
+
+        self.alive = np.ones(num_cells, dtype=bool)
+        self.frame = np.zeros(num_cells, dtype=np.int8)
+        self.num_alive = num_cells
+
+        # the formation index, updated on every kill
+        # number of living enemies and the row of the bottom living enemy in each column, -1 once empty
+        self.column_count = [rows] * columns
+        self.bottom_row = [rows - 1] * columns
+        # columns with at least one living enemy, in order
+        self.occupied_columns = list(range(columns))
+        # number of living enemies in each row, and the highest and lowest rows that still have any
+        self.row_count = [columns] * rows
+        self.top_row = 0
+        self.lowest_row = rows - 1
+        # edges use the biggest enemy type, the grid enemies are all the same size anyway
+        self.widths = list(widths)
+        self.heights = list(heights)
+        self.max_width = max(widths)
+        self.max_height = max(heights)
+
+        # the whole formation moves as one, so direction and step timing are shared by every cell
+        self.direction = Direction.RIGHT
+        self.ms_since_move = 0
+        self.move_time_threshold = 1000
+
+        # sprites drawing the cells, indexed the same way as the arrays
+        self.views = [None] * num_cells
+        self.views_dirty = True
+        # bumped every time the views move, so others can tell when the formation has moved
+        self.version = 0
+
+    def index_of(self, row, column):
+        return row * self.columns + column
+
+    def attach(self, sprite):
+        # the sprite's initial grid position tells us which cell it draws
+        self.views[self.index_of(*sprite.initial_grid_position)] = sprite
+        self.views_dirty = True
+
+    def kill(self, sprite):
+        row, column = sprite.initial_grid_position
+        index = self.index_of(row, column)
+        if not self.alive[index]:
+            return
+        self.alive[index] = False
+        self.num_alive -= 1
+        self.views[index] = None
+
+        # only the dead enemy's column can change
+        self.column_count[column] -= 1
+        if self.column_count[column] <= 0:
+            self.bottom_row[column] = -1
+            self.occupied_columns.remove(column)
+        elif row == self.bottom_row[column]:
+            # look upward from the old bottom for the next living enemy in the column
+            column_alive = self.alive[column:row * self.columns + column:self.columns]
+            self.bottom_row[column] = int(np.flatnonzero(column_alive)[-1])
+        # rows only ever empty out, so the top and bottom rows only ever move inward
+        self.row_count[row] -= 1
+        while self.top_row < self.rows - 1 and self.row_count[self.top_row] <= 0:
+            self.top_row += 1
+        while self.lowest_row > 0 and self.row_count[self.lowest_row] <= 0:
+            self.lowest_row -= 1
+
+    @property
+    def min_column(self):
+        return self.occupied_columns[0] if self.occupied_columns else -1
+
+    @property
+    def max_column(self):
+        return self.occupied_columns[-1] if self.occupied_columns else -1
+
+    def column_x(self, column):
+        return self.pos[column, 0]
+
+    def row_y(self, row):
+        return self.pos[row * self.columns, 1]
+
+    def bounding_box(self):
+        # pixel rect (left, top, width, height) around every living enemy, rounded the same way the sprite
+        # rects are, or None once the formation is empty
+        if self.num_alive <= 0:
+            return None
+        left = int(np.rint(self.column_x(self.min_column))) - self.max_width // 2
+        right = int(np.rint(self.column_x(self.max_column))) - self.max_width // 2 + self.max_width
+        top = int(np.rint(self.row_y(self.top_row))) - self.max_height // 2
+        bottom = int(np.rint(self.row_y(self.lowest_row))) - self.max_height // 2 + self.max_height
+        return left, top, right - left, bottom - top
+
+    def shooter(self, column):
+        # the enemy at the bottom of the column, the only one in it with a clear shot
+        return self.views[self.index_of(self.bottom_row[column], column)]
+
+    def retune(self, kind, frame_count, width, height, speed):
+        # new frames or speed for every cell of one enemy type, after its entity_info has been reloaded
+        cells = self.kind == kind
+        self.frame_count[cells] = frame_count
+        self.frame[cells] %= frame_count
+        self.width[cells] = width
+        self.half_width = self.width // 2
+        self.speed[cells] = speed
+        self.widths[kind] = width
+        self.heights[kind] = height
+        self.max_width = max(self.widths)
+        self.max_height = max(self.heights)
+        self.views_dirty = True
+
+    def speed_up(self, enemy_grid_clears):
+        # set the "time per move" proportional to the number of enemies left
+        # fewer enemies = lower threshold = more moves per time
+        # enemies get faster after each grid clear
+        self.move_time_threshold = self.num_alive * max(10, (20 - enemy_grid_clears))
+
+    def handle_walls(self, width, ms_since_move_threshold=100):
+        # turn around and descend if an enemy has reached the edge of the screen AND the formation has
+        # moved very recently, the second condition makes sure the whole formation has stepped toward the
+        # wall before it is reversed
+        if self.num_alive <= 0 or self.ms_since_move >= ms_since_move_threshold:
+            return
+        # only the outermost occupied columns can touch a wall
+        left = int(np.rint(self.column_x(self.min_column))) - self.max_width // 2
+        right = int(np.rint(self.column_x(self.max_column))) - self.max_width // 2 + self.max_width
+        for hit_wall, direction in [
+            (left < 0, Direction.RIGHT),
+            (right > width, Direction.LEFT)]:
+            if hit_wall:
+                self.pos[:, 1] += 1.5
+                self.direction = direction
+                self.views_dirty = True
+
+    def update(self, dt_ms):
+        # enemies use a time-based stepwise movement
+        # if it has been longer than move_time_threshold since the last step, step on this frame
+        if self.ms_since_move >= self.move_time_threshold:
+            # shift every cell to the next frame of its animation
+            self.frame = (self.frame + 1) % self.frame_count
+            # move every cell by one frame's worth of travel
+            sign = 1 if self.direction == Direction.RIGHT else -1
+            self.pos[:, 0] += sign * self.speed * (dt_ms / 1000)
+            # reset the time since move, because we just moved
+            self.ms_since_move = 0
+            self.views_dirty = True
+        else:
+            # add the elapsed time in the last frame to the ms_since_move
+            self.ms_since_move += dt_ms
+
+    def sync_views(self):
+        # copy the cell state onto the sprites, only needed after a step or a descent
+        if not self.views_dirty:
+            return
+        for index in np.flatnonzero(self.alive):
+            sprite = self.views[index]
+            if sprite is None:
+                continue
+            sprite.set_frame(int(self.frame[index]))
+            sprite.set_position(self.pos[index])
+        self.views_dirty = False
+        self.version += 1
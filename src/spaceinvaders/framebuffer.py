@@ -0,0 +1,225 @@
+"""Publish rendered frames to a ring of slots in shared memory, for other processes to read without copies.
+
+The game writes every frame it draws into the next slot of the ring. Recorders, analysers and spectator
+views in other processes map the same memory and look at the pixels in place, nothing is pickled or sent
+through a pipe. Start the game with a ring, then attach to it by name from the repository root:
+
+    PYTHONPATH=src python -m spaceinvaders.main --framebuffer spaceinvaders
+    PYTHONPATH=src python -m spaceinvaders.framebuffer spaceinvaders
+
+Each slot is guarded by a sequence lock instead of a real one: the writer makes the slot's sequence odd
+before touching the pixels and even again after, and a reader checks the sequence didn't change while it
+was looking. The writer never waits for anybody, a reader that falls behind just finds its frames have
+been overwritten and skips ahead to the latest one.
+"""
+import argparse
+import os
+import struct
+import sys
+import time
+from multiprocessing import resource_tracker, shared_memory
+
+# keep the banner out of the reader's output
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+import numpy as np
+import pygame
+
+MAGIC = b'SIFB'
+VERSION = 1
+# magic, version, width, height, bytes per row, slot count, bytes per slot, then the latest frame number
+# published, 0 before the first, at LATEST_OFFSET
+HEADER = struct.Struct('<4s6I')
+LATEST_OFFSET = 32
+HEADER_SIZE = 64
+# every slot starts with sequence, frame number and monotonic_ns() timestamp, all uint64
+SLOT_HEADER_SIZE = 32
+# BGRA in memory, which is what a 32 bit surface is on a little endian machine, the alpha is always 255
+PIXEL_FORMAT = 'BGRA'
+BYTES_PER_PIXEL = 4
+
+
+def _slot_size(pitch, height):
+    # slots are kept 64 byte aligned so no header shares a cache line with the previous slot's pixels
+    return (SLOT_HEADER_SIZE + pitch * height + 63) // 64 * 64
+
+
+class FramebufferRing:
+    """The game's side of the ring: creates the shared memory and writes frames into it.
+
+    publish() costs one blit of the screen into a slot, the same as drawing one more full-screen image,
+    and never blocks. The ring is removed when the writer is closed."""
+
+    def __init__(self, name=None, size=(224, 256), slots=4):
+        width, height = size
+        pitch = width * BYTES_PER_PIXEL
+        self.slot_count = slots
+        self.slot_size = _slot_size(pitch, height)
+        self.memory = shared_memory.SharedMemory(name=name, create=True, size=HEADER_SIZE + slots * self.slot_size)
+        self.name = self.memory.name
+        buffer = self.memory.buf
+        HEADER.pack_into(buffer, 0, MAGIC, VERSION, width, height, pitch, slots, self.slot_size)
+        self.latest = np.ndarray((), dtype=np.uint64, buffer=buffer, offset=LATEST_OFFSET)
+        self.latest[...] = 0
+        # per slot, the header as a uint64 array and a surface drawing straight into the shared pixels
+        self.slot_headers = []
+        self.slot_surfaces = []
+        for slot in range(slots):
+            offset = HEADER_SIZE + slot * self.slot_size
+            header = np.ndarray(4, dtype=np.uint64, buffer=buffer, offset=offset)
+            header[:] = 0
+            pixels = buffer[offset + SLOT_HEADER_SIZE:offset + SLOT_HEADER_SIZE + pitch * height]
+            self.slot_headers.append(header)
+            self.slot_surfaces.append(pygame.image.frombuffer(pixels, size, PIXEL_FORMAT))
+        self.frame = 0
+
+    def publish(self, surface: pygame.Surface, timestamp_ns=None):
+        # write surface into the next slot, returns its frame number, which starts at 1
+        self.frame += 1
+        slot = self.frame % self.slot_count
+        header = self.slot_headers[slot]
+        # odd while the pixels are being written, readers that see it leave the slot alone
+        header[0] += 1
+        self.slot_surfaces[slot].blit(surface, (0, 0))
+        header[1] = self.frame
+        header[2] = time.monotonic_ns() if timestamp_ns is None else timestamp_ns
+        header[0] += 1
+        self.latest[...] = self.frame
+        return self.frame
+
+    def close(self):
+        # the surfaces and arrays hold on to the shared buffer, it can't be let go of while they're around
+        self.slot_surfaces = []
+        self.slot_headers = []
+        self.latest = None
+        self.memory.close()
+        self.memory.unlink()
+
+
+class FrameView:
+    """One frame, looked at in place in the ring. pixels is a (height, width, 4) BGRA array over the slot.
+
+    The writer may come round and overwrite the slot at any time, so anything read from pixels only
+    counts if still_valid() is true afterwards."""
+
+    def __init__(self, header, pixels, sequence):
+        self.header = header
+        self.pixels = pixels
+        self.sequence = sequence
+        self.frame = int(header[1])
+        self.timestamp_ns = int(header[2])
+
+    def still_valid(self):
+        return int(self.header[0]) == self.sequence
+
+
+class FramebufferReader:
+    """Another process's side of the ring, attached to it by name. Reading never holds up the writer."""
+
+    def __init__(self, name):
+        self.memory = _attach(name)
+        buffer = self.memory.buf
+        magic, version, width, height, pitch, slots, slot_size = HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC or version != VERSION:
+            self.memory.close()
+            raise ValueError(f'{name} is not a version {VERSION} framebuffer ring')
+        self.size = width, height
+        self.slot_count = slots
+        self.latest_frame_number = np.ndarray((), dtype=np.uint64, buffer=buffer, offset=LATEST_OFFSET)
+        self.slot_headers = []
+        self.slot_pixels = []
+        for slot in range(slots):
+            offset = HEADER_SIZE + slot * slot_size
+            self.slot_headers.append(np.ndarray(4, dtype=np.uint64, buffer=buffer, offset=offset))
+            self.slot_pixels.append(np.ndarray((height, width, BYTES_PER_PIXEL), dtype=np.uint8, buffer=buffer,
+                                               offset=offset + SLOT_HEADER_SIZE, strides=(pitch, BYTES_PER_PIXEL, 1)))
+
+    @property
+    def latest(self):
+        # frame number of the last frame published, 0 if there hasn't been one
+        return int(self.latest_frame_number)
+
+    def view(self, frame=None):
+        # frame (the latest if not given) in place, or None if it's being written or has been overwritten
+        if frame is None:
+            frame = self.latest
+        if frame <= 0:
+            return None
+        slot = frame % self.slot_count
+        header = self.slot_headers[slot]
+        sequence = int(header[0])
+        if sequence % 2 or int(header[1]) != frame:
+            return None
+        view = FrameView(header, self.slot_pixels[slot], sequence)
+        # the frame number and timestamp were read after the sequence, make sure they're from the same write
+        return view if view.still_valid() and view.frame == frame else None
+
+    def read(self, frame=None, out=None):
+        # a consistent copy of frame in out (allocated if not given), for when the pixels have to outlive the
+        # slot, returns (frame number, timestamp, pixels) or None if the frame is gone
+        view = self.view(frame)
+        if view is None:
+            return None
+        if out is None:
+            out = np.empty_like(view.pixels)
+        np.copyto(out, view.pixels)
+        if not view.still_valid():
+            return None
+        return view.frame, view.timestamp_ns, out
+
+    def close(self):
+        self.slot_pixels = []
+        self.slot_headers = []
+        self.latest_frame_number = None
+        self.memory.close()
+
+
+def _attach(name):
+    # the writer owns the ring and removes it, but before 3.13 merely attaching registers it with this
+    # process's resource tracker, which would remove it from under the game when the reader exits
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    memory = shared_memory.SharedMemory(name=name)
+    resource_tracker.unregister(memory._name, 'shared_memory')
+    return memory
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m spaceinvaders.framebuffer',
+                                     description='Follow a running game\'s framebuffer ring and report what arrives.')
+    parser.add_argument('name', help='name the game was started with, --framebuffer NAME')
+    parser.add_argument('--seconds', type=float, default=5.0, help='how long to follow the ring for')
+    parser.add_argument('--save', metavar='PATH', help='save the last frame read as an image')
+    args = parser.parse_args(argv)
+
+    reader = FramebufferReader(args.name)
+    frame = np.empty((*reversed(reader.size), BYTES_PER_PIXEL), dtype=np.uint8)
+    seen = skipped = torn = 0
+    last = None
+    end = time.perf_counter() + args.seconds
+    latencies = []
+    while time.perf_counter() < end:
+        latest = reader.latest
+        if latest == last or latest == 0:
+            time.sleep(0.001)
+            continue
+        result = reader.read(latest, frame)
+        if result is None:
+            torn += 1
+            continue
+        if last is not None:
+            skipped += latest - last - 1
+        seen += 1
+        latencies.append(time.monotonic_ns() - result[1])
+        last = latest
+    print(f'{seen} frames read, {skipped} skipped, {torn} overwritten while reading')
+    if latencies:
+        print(f'median publish-to-read latency {np.median(latencies) / 1e6:.2f} ms')
+    if args.save and last is not None:
+        # BGRA rows to the (width, height) RGB array pygame wants
+        pygame.image.save(pygame.surfarray.make_surface(frame[:, :, 2::-1].swapaxes(0, 1)), args.save)
+    reader.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,5 @@
-from enum import Enum, auto
+import random
+from enum import Enum, Flag, auto
 
 
 class Direction(Enum):
@@ -16,4 +17,38 @@ class Direction(Enum):
             return Direction.LEFT
         elif self == Direction.LEFT:
             return Direction.RIGHT
-        return None
\ No newline at end of file
+        return None
+
+
+class Action(Flag):
+    """Player input for a single frame, independent of where it came from (keyboard, replay, bot)."""
+    NONE = 0
+    LEFT = auto()
+    RIGHT = auto()
+    FIRE = auto()
+    NEW_GAME = auto()
+    QUIT = auto()
+
+
+class RandomStreams:
+    """Independent random number streams, one per subsystem, all derived from a single seed.
+
+    Each subsystem draws from its own stream, so a change in how often one of them rolls the dice
+    doesn't shift the numbers every other one gets. Seeding with None picks a fresh random seed,
+    which is kept in self.seed so the game can still be recorded and replayed."""
+
+    def __init__(self, seed=None):
+        self.seed = None
+        self.streams = {}
+        self.reseed(seed)
+
+    def reseed(self, seed=None):
+        self.seed = seed if seed is not None else random.randrange(2 ** 63)
+        self.streams.clear()
+
+    def stream(self, name) -> random.Random:
+        rng = self.streams.get(name)
+        if rng is None:
+            # seeding with a string is stable across runs and platforms
+            rng = self.streams[name] = random.Random(f'{self.seed}:{name}')
+        return rng
@@ -0,0 +1,124 @@
+"""Apply edits to res/entity_info.json and the spritesheet while the game runs, without restarting it.
+
+    PYTHONPATH=src python -m spaceinvaders.main --hot-reload
+
+Save a change to an entity's frames, color or speed, or repaint a frame on the spritesheet, and the game
+picks it up within half a second. Only what changed is sliced, colorized and applied again.
+"""
+import json
+import os
+import sys
+
+import pygame
+
+from spaceinvaders.sprites import SpriteSheet
+
+# how often the files are looked at
+HOT_RELOAD_INTERVAL_MS = 500
+
+
+class AssetWatcher:
+    """Watches entity_info.json and the spritesheet while the game runs, and hands it whatever changed.
+
+    poll() is called every frame and only looks at the files' modification times every interval_ms. When
+    one has changed, the entries of entity_info.json are compared to the ones the game is running with, and
+    the spritesheet's frames to the ones already sliced: only frames whose place on the map or whose pixels
+    changed are sliced again, and only the tags with a changed entry or frame are handed to the game to
+    apply. Everything else keeps the surfaces, colorized frames and masks it already had.
+
+    A file caught halfway through being saved, or with a mistake in it, is reported and skipped, and so is
+    a reload with any entry the game can't take, such as more frames than there is room for: the game keeps
+    what it had until the next save."""
+
+    def __init__(self, game, entity_info_path, spritesheet_path, spritemap_path, interval_ms=HOT_RELOAD_INTERVAL_MS):
+        self.game = game
+        self.entity_info_path = entity_info_path
+        self.spritesheet_path = spritesheet_path
+        self.spritemap_path = spritemap_path
+        self.interval_ms = interval_ms
+        self.since_check_ms = 0
+        self.mtimes = self._mtimes()
+        self.entries = self._load_entries()
+        with open(spritemap_path) as f:
+            self.spritemap = json.load(f)
+        # frame number -> uncolored frame, starting with the bundle's so unchanged frames stay the same surfaces
+        self.frames = dict(game.assets.frames)
+        # the spritesheet the frames were sliced from, a newer one means comparing their pixels again
+        self._sliced_sheet_mtime = self.mtimes[spritesheet_path]
+        # everything reloaded so far, for the curious
+        self.reloads = 0
+        self.frames_sliced = 0
+
+    def _mtimes(self):
+        return {path: os.stat(path).st_mtime_ns
+                for path in (self.entity_info_path, self.spritesheet_path, self.spritemap_path)}
+
+    def _load_entries(self):
+        # the file's entries with the game's config overrides applied, the same way the game loads them
+        with open(self.entity_info_path) as f:
+            entries = json.load(f)
+        for tag, entry in entries.items():
+            entry.update(self.game.config.get('entity_info', {}).get(tag, {}))
+        return entries
+
+    def poll(self, elapsed_ms):
+        # returns the tags that were reloaded, usually none
+        self.since_check_ms += elapsed_ms
+        if self.since_check_ms < self.interval_ms:
+            return []
+        self.since_check_ms = 0
+        try:
+            mtimes = self._mtimes()
+            if mtimes == self.mtimes:
+                return []
+            self.mtimes = mtimes
+            return self.reload()
+        except (OSError, ValueError, KeyError, IndexError, TypeError, pygame.error) as error:
+            print(f'hot reload: skipped, {error}', file=sys.stderr)
+            return []
+
+    def reload(self):
+        entries = self._load_entries()
+        with open(self.spritemap_path) as f:
+            spritemap = json.load(f)
+
+        # frames in use that need slicing again: moved or resized on the map, or with new pixels on the sheet
+        in_use = {int(num) for entry in entries.values() for num in entry['image_indexes']}
+        changed_frames = {}
+        sprite_sheet = None
+        for num in sorted(in_use):
+            moved = num not in self.frames or num > len(self.spritemap) or \
+                self.spritemap[num - 1] != spritemap[num - 1]
+            if not moved and self.mtimes[self.spritesheet_path] == self._sliced_sheet_mtime:
+                continue
+            if sprite_sheet is None:
+                sprite_sheet = SpriteSheet(self.spritesheet_path, self.spritemap_path)
+            frame = sprite_sheet.get_image_by_num(num)
+            old = self.frames.get(num)
+            if moved or old is None or old.get_size() != frame.get_size() or \
+                    pygame.image.tobytes(old, 'RGBA') != pygame.image.tobytes(frame, 'RGBA'):
+                changed_frames[num] = frame
+        frames = {**self.frames, **changed_frames}
+
+        # only tags the game already knows about, a brand new entry has no code using it
+        changes = [(tag, [frames[int(num)] for num in entry['image_indexes']], tuple(entry['color']),
+                    entry['speed'])
+                   for tag, entry in entries.items()
+                   if tag in self.game.entity_info and
+                   (entry != self.entries.get(tag) or any(int(num) in changed_frames for num in entry['image_indexes']))]
+        # every change is checked before any is made, so one the game can't take leaves the game as it was
+        for change in changes:
+            self.game.check_entity_info(*change)
+
+        self._sliced_sheet_mtime = self.mtimes[self.spritesheet_path]
+        self.frames = frames
+        self.frames_sliced += len(changed_frames)
+        self.spritemap = spritemap
+        self.entries = entries
+        for change in changes:
+            self.game.apply_entity_info(*change)
+        self.reloads += 1
+        changed_tags = [tag for tag, *_ in changes]
+        print(f'hot reload: {", ".join(changed_tags) or "nothing"} changed, '
+              f'{len(changed_frames)} frames sliced again', file=sys.stderr)
+        return changed_tags
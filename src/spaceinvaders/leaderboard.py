@@ -0,0 +1,141 @@
+"""Every finished game's score, kept in a local SQLite database, with the best of them held in memory.
+
+The game only ever touches the in-memory side while it runs: record() puts a finished game in the top
+scores straight away and queues it for a background thread to write, so a game over never waits on the
+disk. The database is in WAL mode, so the writer's commits don't get in the way of anybody reading it.
+Print the top scores from the repository root:
+
+    PYTHONPATH=src python -m spaceinvaders.leaderboard .cache/leaderboard.sqlite3
+"""
+import argparse
+import bisect
+import os
+import queue
+import sqlite3
+import threading
+import time
+from typing import NamedTuple
+
+# how many of the best games are held in memory
+DEFAULT_TOP_N = 10
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS games (
+    id INTEGER PRIMARY KEY,
+    score INTEGER NOT NULL,
+    level INTEGER NOT NULL,
+    duration_ms INTEGER NOT NULL,
+    finished_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS games_by_score ON games (score DESC, finished_at);
+'''
+
+
+class LeaderboardEntry(NamedTuple):
+    score: int
+    # grid clears before the game ended
+    level: int
+    duration_ms: int
+    # time.time() when the game ended
+    finished_at: float
+
+
+def _connect(path):
+    connection = sqlite3.connect(path)
+    connection.execute('PRAGMA journal_mode=WAL')
+    # in WAL mode a commit only has to survive the process dying, not the power going, at NORMAL
+    connection.execute('PRAGMA synchronous=NORMAL')
+    return connection
+
+
+class Leaderboard:
+    """Finished games, the best top_n of them in memory, all of them in the database at path.
+
+    top() and high_score are answered from memory. Writes happen on a thread of their own, in batches of
+    whatever has piled up since the last one, and close() waits for the last of them."""
+
+    def __init__(self, path, top_n=DEFAULT_TOP_N):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.top_n = top_n
+        connection = _connect(path)
+        with connection:
+            connection.executescript(SCHEMA)
+        rows = connection.execute('SELECT score, level, duration_ms, finished_at FROM games '
+                                  'ORDER BY score DESC, finished_at LIMIT ?', (top_n,)).fetchall()
+        connection.close()
+        # best first, ties go to whoever got there first
+        self.entries = [LeaderboardEntry(*row) for row in rows]
+        self.keys = [self._key(entry) for entry in self.entries]
+
+        self.pending = queue.SimpleQueue()
+        self.error = None
+        self.thread = threading.Thread(target=self.write, name='leaderboard', daemon=True)
+        self.thread.start()
+
+    @staticmethod
+    def _key(entry):
+        return -entry.score, entry.finished_at
+
+    @property
+    def high_score(self):
+        return self.entries[0].score if self.entries else 0
+
+    def top(self, n=None):
+        return self.entries[:self.top_n if n is None else n]
+
+    def record(self, entry: LeaderboardEntry):
+        # into the top scores now, onto the disk whenever the writer gets to it
+        key = self._key(entry)
+        index = bisect.bisect_right(self.keys, key)
+        if index < self.top_n:
+            self.keys.insert(index, key)
+            self.entries.insert(index, entry)
+            del self.keys[self.top_n:], self.entries[self.top_n:]
+        self.pending.put(entry)
+
+    def write(self):
+        connection = _connect(self.path)
+        try:
+            stopping = False
+            while not stopping:
+                batch = [self.pending.get()]
+                while not self.pending.empty():
+                    batch.append(self.pending.get())
+                # None is close() asking for one last write
+                stopping = None in batch
+                batch = [entry for entry in batch if entry is not None]
+                if batch:
+                    with connection:
+                        connection.executemany('INSERT INTO games (score, level, duration_ms, finished_at) '
+                                               'VALUES (?, ?, ?, ?)', batch)
+        except Exception as error:
+            self.error = error
+        finally:
+            connection.close()
+
+    def close(self):
+        # waits for everything recorded to be written, then raises anything the writer ran into
+        self.pending.put(None)
+        self.thread.join()
+        if self.error is not None:
+            raise self.error
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m spaceinvaders.leaderboard', description='Print the top scores.')
+    parser.add_argument('path', help='leaderboard database, the game keeps one at .cache/leaderboard.sqlite3')
+    parser.add_argument('--top', type=int, default=DEFAULT_TOP_N, help='how many scores to show')
+    args = parser.parse_args(argv)
+
+    leaderboard = Leaderboard(args.path, args.top)
+    for rank, entry in enumerate(leaderboard.top(), 1):
+        finished = time.strftime('%Y-%m-%d %H:%M', time.localtime(entry.finished_at))
+        print(f'{rank:>3}. {entry.score:>6}  level {entry.level + 1:<3} {entry.duration_ms / 1000:>7.1f} s  {finished}')
+    leaderboard.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,14 +1,37 @@
+import argparse
 import functools
+import hashlib
 import json
-import random
+import sys
+import time
 
+# as close to launch as we can get, so the imports below count toward startup time
+_launch_time = time.perf_counter()
+
+import numpy as np
 import pygame
 from pygame.sprite import Sprite
 
-from spaceinvaders.helpers import Direction
-from spaceinvaders.sprites import SpriteSheet, PlayerSprite, BarrierSprite, PlayerBulletSprite, \
+from spaceinvaders.assets import load_asset_bundle
+from spaceinvaders.capture import FrameCapture
+from spaceinvaders.collision import BroadPhase, CollisionKind
+from spaceinvaders.formation import Formation, MAX_FRAMES as MAX_ENEMY_FRAMES
+from spaceinvaders.framebuffer import FramebufferRing
+from spaceinvaders.helpers import Direction, Action, RandomStreams
+from spaceinvaders.hotreload import AssetWatcher
+from spaceinvaders.leaderboard import Leaderboard, LeaderboardEntry
+from spaceinvaders.pools import SpritePool
+from spaceinvaders.projectiles import MAX_FRAMES as MAX_BULLET_FRAMES, ProjectileManager
+from spaceinvaders.profiling import FrameProfiler, ProfilerOverlay, StartupProfiler
+from spaceinvaders.replay import InputRecorder, MIN_SEED, MAX_SEED
+from spaceinvaders.rendering import DirtyRectRenderer
+from spaceinvaders.scheduler import UpdateScheduler
+from spaceinvaders.simulation import SimulationThread, Snapshot
+from spaceinvaders.text import GlyphAtlas
+from spaceinvaders.timestep import FixedTimestep, interpolated
+from spaceinvaders.sprites import PlayerSprite, BarrierSprite, PlayerBulletSprite, \
     EnemySprite, ConeheadEnemySprite, AntennaEnemySprite, EarsEnemySprite, GridEnemyBulletSprite, ExplosionSprite, \
-    PlayerExplosionSprite
+    PlayerExplosionSprite, Crater, colorize_surfaces, colorized_frame_cache, frame_mask_store
 
 # name tags used in entity_info.json and entity_info within the program
 PLAYER_SHIP_TAG = 'PLAYER_SHIP'
@@ -24,6 +47,8 @@ EXPLOSION_PLAYER_TAG = 'EXPLOSION_PLAYER'
 EXPLOSION_GRID_ENEMY_TAG = 'EXPLOSION_GRID_ENEMY'
 EXPLOSION_BULLET_PLAYER_TAG = "EXPLOSION_BULLET_PLAYER"
 EXPLOSION_BULLET_ENEMY_TAG = "EXPLOSION_BULLET_ENEMY"
+# grid enemy types, in the order the formation refers to them
+GRID_ENEMY_TAGS = (ENEMY_CONEHEAD_TAG, ENEMY_ANTENNA_TAG, ENEMY_EARS_TAG)
 # attribute tags
 SPEED_TAG = 'speed'
 COLOR_TAG = 'color'
@@ -35,6 +60,8 @@ SPRITESHEET_PATH = 'res/spritesheets/space_invaders.png'
 SPRITEMAP_PATH = 'res/spritesheets/space_invaders.json'
 ENTITYINFO_PATH = 'res/entity_info.json'
 SCORE_FONT_PATH = 'res/fonts/space_invaders/space-invaders.otf'
+# built asset bundles, safe to delete
+ASSET_CACHE_DIR = '.cache/assets'
 
 # colors
 WHITE = (255, 255, 255)
@@ -44,49 +71,149 @@ GREEN = (32, 255, 32)
 BG_COLOR = BLACK
 FG_COLOR = WHITE
 
+# colors entities get drawn in besides their own, these are colorized ahead of time too
+RECOLORS = {
+    EXPLOSION_BULLET_ENEMY_TAG: (RED,),
+    EXPLOSION_BULLET_PLAYER_TAG: (GREEN,),
+}
+
 EXPLOSION_LENGTH_MS = 300
 PLAYER_EXPLOSION_LENGTH_MS = 1000
 
+# number of sprites created up front for each pooled tag, pools grow past this if they need to
+POOL_SIZES = {
+    BULLET_PLAYER_TAG: 1,
+    BULLET_GRID_ENEMY_1_TAG: 4,
+    BULLET_GRID_ENEMY_2_TAG: 4,
+    BULLET_GRID_ENEMY_3_TAG: 4,
+    EXPLOSION_PLAYER_TAG: 1,
+    EXPLOSION_GRID_ENEMY_TAG: 4,
+    EXPLOSION_BULLET_PLAYER_TAG: 4,
+    EXPLOSION_BULLET_ENEMY_TAG: 4,
+}
+
+# bullets are moved by the projectile manager, which tells them apart by their collision kind
+PROJECTILE_KINDS = {
+    BULLET_PLAYER_TAG: CollisionKind.PLAYER_BULLET,
+    BULLET_GRID_ENEMY_1_TAG: CollisionKind.ENEMY_BULLET,
+    BULLET_GRID_ENEMY_2_TAG: CollisionKind.ENEMY_BULLET,
+    BULLET_GRID_ENEMY_3_TAG: CollisionKind.ENEMY_BULLET,
+}
+# the explosion each kind of bullet knocks out of a barrier
+CRATER_TAGS = {
+    CollisionKind.PLAYER_BULLET: EXPLOSION_BULLET_ENEMY_TAG,
+    CollisionKind.ENEMY_BULLET: EXPLOSION_BULLET_PLAYER_TAG,
+}
+
+# update phases, in the order they run
+PLAYER_PHASE = 'player'
+FORMATION_PHASE = 'formation'
+PROJECTILES_PHASE = 'projectiles'
+EFFECTS_PHASE = 'effects'
+HUD_PHASE = 'hud'
+
+# random streams, one per subsystem that rolls the dice
+ENEMY_SHOOTER_RNG = 'enemy_shooter'
+ENEMY_BULLET_RNG = 'enemy_bullet'
+ENEMY_SHOOT_INTERVAL_RNG = 'enemy_shoot_interval'
+NEW_GAME_RNG = 'new_game'
+
+# the simulation always advances in ticks this long, however fast the display runs
+TICK_MS = 16
+# the most ticks a frame catches up on (per unit of speed), the rest of a longer stall is dropped
+MAX_TICKS_PER_FRAME = 5
+# F4 steps through these
+FAST_FORWARD_SPEEDS = (1, 2, 4, 8)
+
 PLAYER_STARTING_POS = (15, 212)
 STARTING_LIVES = 3
 MAX_EXTRA_LIVES = 4
+# slots in the shared memory framebuffer ring, how many frames behind a reader can fall before it loses one
+FRAMEBUFFER_SLOTS = 4
+# where the windowed game keeps every finished game's score, the high score carries over from here
+LEADERBOARD_PATH = '.cache/leaderboard.sqlite3'
 
 
 class SpaceInvaders:
-    def __init__(self):
+    def __init__(self, headless: bool = False, seed=None, config=None, dirty_rects: bool = False, record_path=None,
+                 profile: bool = False, profile_path=None, audio: bool = False, profile_startup: bool = False,
+                 speed: int = 1, threaded: bool = False, framebuffer=None, capture_path=None,
+                 leaderboard_path=None, hot_reload: bool = False):
+        # time from launch to the first frame, the first game in a process counts the imports too
+        global _launch_time
+        self.startup = StartupProfiler(_launch_time)
+        if _launch_time is not None:
+            self.startup.mark('imports')
+        _launch_time = None
+        self.profile_startup = profile_startup
+
+        # headless games have no window and no main loop, they are driven by reset() and step() instead
+        self.headless = headless
+        # there's no sound yet, so audio is only started when asked for
+        self.audio = audio
+
         # initialize pygame
-        pygame.init()
+        self.init_subsystems()
+        self.startup.mark('pygame init')
         self.game_is_over = False
+        # whether this game's score has gone to the leaderboard yet
+        self.score_recorded = False
+
+        # config overrides the default tuning, e.g. {'starting_lives': 5, 'entity_info': {'ENEMY_EARS': {'speed': 200}}}
+        self.config = config or {}
 
         # set up window stuff
         self.WINDOW_WIDTH = 224
         self.WINDOW_HEIGHT = 256
         self.FPS = 60
         self.VSYNC_ON = True
-        self.screen = pygame.display.set_mode(
-            (self.WINDOW_WIDTH, self.WINDOW_HEIGHT),
-            pygame.SCALED,
-            vsync=self.VSYNC_ON,
-        )
-        # window title
-        pygame.display.set_caption('Space Invaders')
+        if self.headless:
+            # no window, no vsync, just an offscreen surface to draw into if anybody asks
+            self.screen = pygame.Surface((self.WINDOW_WIDTH, self.WINDOW_HEIGHT))
+        else:
+            self.screen = pygame.display.set_mode(
+                (self.WINDOW_WIDTH, self.WINDOW_HEIGHT),
+                pygame.SCALED,
+                vsync=self.VSYNC_ON,
+            )
+            # window title
+            pygame.display.set_caption('Space Invaders')
+        self.startup.mark('window')
+
+        # every random decision in the game comes from here, so a seeded game always plays out the same way
+        self.rng = RandomStreams(seed)
+        self.seed = self.rng.seed
+
+        # every frame's input goes here when recording, so the session can be replayed later
+        self.record_path = record_path
+        self.recorder = InputRecorder(self.seed, self.config) if record_path else None
+
+        # every finished game goes to the leaderboard, written out on a thread of its own
+        self.leaderboard = Leaderboard(leaderboard_path) if leaderboard_path is not None else None
+
+        # times each stage of a frame when switched on, F3 shows what it found
+        self.profiler = FrameProfiler(enabled=profile)
+        # the simulation thread times its ticks with a profiler of its own, in threaded mode
+        self.simulation_profiler = None
+        self.profile = profile
+        self.profile_path = profile_path
 
         # set up clock-related stuff
         self.clock = pygame.time.Clock()
         self.running = True
         self.dt_ms = 0
+        # real time between the last two rendered frames, which is not the length of a tick
+        self.frame_ms = 0
+        # the game loop runs the simulation in fixed ticks, speed of them for every tick's worth of real time
+        self.timestep = FixedTimestep(TICK_MS, MAX_TICKS_PER_FRAME, speed)
         self.ms_elapsed_since_start = 0
+        self.frames_elapsed = 0
 
         # ----- SPRITE STUFF -----
         # rows and columns of enemies
-        self.enemy_rows = 5
-        self.enemy_columns = 11
-
-        # sprite sheet
-        self.sprite_sheet = SpriteSheet(
-            SPRITESHEET_PATH,
-            SPRITEMAP_PATH
-        )
+        self.enemy_rows = self.config.get('enemy_rows', 5)
+        self.enemy_columns = self.config.get('enemy_columns', 11)
+        self.starting_lives = self.config.get('starting_lives', STARTING_LIVES)
 
         # sprite groups
         self.all_sprites = pygame.sprite.Group()
@@ -100,49 +227,83 @@ class SpaceInvaders:
         self.player_bullet_sprites = pygame.sprite.Group()
         self.enemy_bullet_sprites = pygame.sprite.Group()
         self.grid_enemy_sprites = pygame.sprite.Group()
-        self.grid_enemy_sprites_columns = [pygame.sprite.Group() for _ in range(self.enemy_columns)]
         self.all_enemy_sprites = pygame.sprite.Group()
         self.barrier_sprites = pygame.sprite.Group()
+        self.effect_sprites = pygame.sprite.Group()
+        self.formation = None
+        # everything that needs updating each frame, grouped into phases
+        self.update_scheduler = UpdateScheduler()
+        self.setup_update_scheduler()
+
+        # broad phase shared by every collision check, rebuilt each frame
+        self.collision_grid = BroadPhase()
+        # every bullet in play, moved all at once
+        self.projectiles = ProjectileManager((CollisionKind.PLAYER_BULLET, CollisionKind.ENEMY_BULLET),
+                                             self.screen.get_height())
 
         # load up the data about the game entities (player, enemy, bullet, barrier, etc.
-        data = json.load(open(ENTITYINFO_PATH))
-        self.entity_info = data
+        with open(ENTITYINFO_PATH) as f:
+            self.entity_info = json.load(f)
         for k in self.entity_info.keys():
+            # tuning overrides from the config replace the values in the file
+            self.entity_info[k].update(self.config.get('entity_info', {}).get(k, {}))
             # data cleanup
             # convert the color from list (JSON compatible) to tuple (Python)
             self.entity_info[k][COLOR_TAG] = tuple(self.entity_info[k][COLOR_TAG])
+
+        # every frame an entity uses, in every color it's drawn in, comes sliced, colorized and with its
+        # collision mask out of the asset bundle, which is only rebuilt from the spritesheet when it changes
+        wanted = {}
+        for k in self.entity_info.keys():
+            for i in self.entity_info[k][IMAGE_INDEXES_TAG]:
+                wanted.setdefault(int(i), set()).update([self.entity_info[k][COLOR_TAG], *RECOLORS.get(k, ())])
+        self.assets = load_asset_bundle(SPRITESHEET_PATH, SPRITEMAP_PATH, wanted, ASSET_CACHE_DIR)
+        for k in self.entity_info.keys():
             # create images in dict based on image_indexes
-            self.entity_info[k][IMAGES_TAG] = [self.sprite_sheet.get_image_by_num(int(i)) for i in
+            self.entity_info[k][IMAGES_TAG] = [self.assets.frames[int(i)] for i in
                                                self.entity_info[k][IMAGE_INDEXES_TAG]]
             # image indexes no longer relevant
             self.entity_info[k].pop(IMAGE_INDEXES_TAG)
+            # build the collision masks for every colored frame now, rather than when the first sprite spawns
+            frame_mask_store.preload(colorize_surfaces(self.entity_info[k][IMAGES_TAG], self.entity_info[k][COLOR_TAG]))
+
+        # the holes bullets knock out of barriers are shaped like their explosions
+        self.craters = {}
+        self.setup_craters()
+
+        # bullets and explosions come and go all the time, so they are reused rather than rebuilt
+        self.sprite_pools = {}
+        self.startup.mark('assets')
+        self.setup_sprite_pools()
 
         # reset and create sprites
         self.setup_new_game_sprites()
 
+        # picks up edits to entity_info.json and the spritesheet while the game runs
+        self.asset_watcher = AssetWatcher(self, ENTITYINFO_PATH, SPRITESHEET_PATH, SPRITEMAP_PATH) \
+            if hot_reload else None
+
         # ----- GAME VARIABLE STUFF -----
-        # set the interval for main grid enemy shooting
-        self.time_since_enemy_shoot_ms = 0
         # set the intial interval, but we're going to alter it to make it a bit more random
-        self.base_enemy_shoot_interval_ms = 1000
-        # set the initial interval for time gap between enemy shots to the base value
-        self.enemy_shoot_interval_ms = self.base_enemy_shoot_interval_ms
-        
+        self.base_enemy_shoot_interval_ms = self.config.get('base_enemy_shoot_interval_ms', 1000)
         # variable for seeing if the game should be frozen after a player death
-        self.pause_time_after_player_death_ms = 2000
-        self.time_since_player_death_ms = self.pause_time_after_player_death_ms
-        
-        # number of grid clears, used to set speed on subsequent levels
-        self.enemy_grid_clears = 0
+        self.pause_time_after_player_death_ms = self.config.get('pause_time_after_player_death_ms', 2000)
+        self.reset_game_variables()
 
         # initialize the score variable
         self.score_player = 0
         self.high_score = 0
+        # the best score of this session alone, which a replay can reproduce, unlike one loaded from the leaderboard
+        self.session_high_score = 0
+
+        self.startup.mark('sprites')
 
         # ----- TEXT STUFF -----
         # set up the font
         self.TEXT_ANTIALIASING = False
         self.font = pygame.font.Font(SCORE_FONT_PATH, 8)
+        # all of the HUD text goes through the glyph atlas, so the font is only rendered with at startup
+        self.text = GlyphAtlas(self.font, self.TEXT_ANTIALIASING, FG_COLOR)
 
         # initialize the scoreboard objects
         # set the positions for the score, score label
@@ -154,7 +315,7 @@ class SpaceInvaders:
         self.play_again_surface_pos = (self.game_over_surface_pos[0], self.game_over_surface_pos[1] + 20)
         self.extra_life_counter_surface_pos = (14, 240)
         # label "SCORE P1"
-        self.score_label_surface = self.font.render('SCORE P1', self.TEXT_ANTIALIASING, FG_COLOR)
+        self.score_label_surface = self.text.render('SCORE P1')
         self.score_label_rect = self.score_label_surface.get_rect()
         self.score_label_rect.center = self.score_label_surface_pos
         # score number e.g. "00002370"
@@ -162,40 +323,96 @@ class SpaceInvaders:
         self.setup_score_surface()
         
         # label "HI-SCORE"
-        self.high_score_label_surface = self.font.render('HI-SCORE', self.TEXT_ANTIALIASING, FG_COLOR)
+        self.high_score_label_surface = self.text.render('HI-SCORE')
         self.high_score_label_rect = self.high_score_label_surface.get_rect()
         self.high_score_label_rect.center = self.high_score_label_surface_pos
         # high score number e.g. "32063200"
-        self.high_score_value_surface = self.font.render('0000', self.TEXT_ANTIALIASING, FG_COLOR)
+        self.high_score_value_surface = self.text.render('0000')
         self.high_score_value_rect = self.high_score_value_surface.get_rect()
         self.high_score_value_rect.center = self.high_score_value_surface_pos
+        if self.leaderboard is not None and self.leaderboard.high_score:
+            self.update_high_score(self.leaderboard.high_score)
 
         # initialize game over text and background
-        self.game_over_surface = self.font.render('GAME OVER', self.TEXT_ANTIALIASING, FG_COLOR)
+        self.game_over_surface = self.text.render('GAME OVER')
         self.game_over_rect = self.game_over_surface.get_rect()
         self.game_over_rect.center = self.game_over_surface_pos
         
         # initialize 'play again' text and background
-        self.play_again_surface = self.font.render('\'N\' to play again!', self.TEXT_ANTIALIASING, FG_COLOR)
+        self.play_again_surface = self.text.render('\'N\' to play again!')
         self.play_again_rect = self.play_again_surface.get_rect()
         self.play_again_rect.center = self.play_again_surface_pos
         
         # initialize extra life counter
-        self.extra_life_counter_surface = self.font.render('0', self.TEXT_ANTIALIASING, FG_COLOR)
+        self.extra_life_counter_surface = self.text.render('0')
         self.extra_life_counter_rect = self.extra_life_counter_surface.get_rect()
         self.extra_life_counter_rect.center = self.extra_life_counter_surface_pos
 
+        # frame time overlay, hidden and not even built until F3 is pressed
+        self.profiler_overlay = None
+        self.show_profiler_overlay = False
+        self.startup.mark('text')
+
+        # redraw only what changed each frame, on top of a cached background, instead of the whole screen
+        self.renderer = DirtyRectRenderer(self, BG_COLOR) if dirty_rects else None
+        # or run the simulation on a thread of its own and draw the snapshots it publishes, the dirty rect
+        # renderer reads the live game, so it doesn't go with that
+        self.threaded = threaded
+        if threaded:
+            self.renderer = None
+
+        # every frame drawn also goes to a ring in shared memory under this name, for other processes to read
+        self.framebuffer = FramebufferRing(framebuffer, self.screen.get_size(), FRAMEBUFFER_SLOTS) \
+            if framebuffer is not None else None
+        # and is recorded to a GIF, PNGs or raw frames by an encoder thread
+        self.capture = FrameCapture(capture_path, self.screen.get_size()) if capture_path is not None else None
+
+        self.startup.mark('setup')
+
         # kick off the main loop
-        self.game_loop()
+        if not self.headless:
+            if threaded:
+                self.threaded_game_loop()
+            else:
+                self.game_loop()
         
+    def init_subsystems(self):
+        # only start what the game uses, pygame.init() would also bring up joysticks, audio, etc.
+        if not self.headless:
+            pygame.display.init()
+        pygame.font.init()
+        if self.audio:
+            pygame.mixer.init()
+
     def should_be_frozen_after_player_death(self):
         return self.time_since_player_death_ms < self.pause_time_after_player_death_ms
 
-    def reset(self):
+    def reset_game_variables(self):
+        # set the interval for main grid enemy shooting
+        self.time_since_enemy_shoot_ms = 0
+        # set the initial interval for time gap between enemy shots to the base value
+        self.enemy_shoot_interval_ms = self.base_enemy_shoot_interval_ms
+        # not frozen at the start of a game
+        self.time_since_player_death_ms = self.pause_time_after_player_death_ms
+        # number of grid clears, used to set speed on subsequent levels
+        self.enemy_grid_clears = 0
+
+    def reset(self, seed=None):
         self.game_is_over = False
+        self.score_recorded = False
         self.ms_elapsed_since_start = 0
-
-        self.all_sprites.empty()
+        self.frames_elapsed = 0
+
+        # a new game without a seed gets one from the last game, so a recorded session that starts new games
+        # still replays the same way
+        if seed is None:
+            seed = self.rng.stream(NEW_GAME_RNG).randrange(2 ** 63)
+        self.rng.reseed(seed)
+        self.seed = self.rng.seed
+
+        # kill rather than empty, so pooled sprites go back to their pools
+        for sprite in self.all_sprites.sprites():
+            sprite.kill()
         self.current_player_sprite = None
         self.extra_player_sprites = pygame.sprite.Group()
         self.left_wall_sprite = None
@@ -206,22 +423,135 @@ class SpaceInvaders:
         self.player_bullet_sprites = pygame.sprite.Group()
         self.enemy_bullet_sprites = pygame.sprite.Group()
         self.grid_enemy_sprites = pygame.sprite.Group()
-        self.grid_enemy_sprites_columns = [pygame.sprite.Group() for _ in range(self.enemy_columns)]
         self.all_enemy_sprites = pygame.sprite.Group()
         self.barrier_sprites = pygame.sprite.Group()
+        self.effect_sprites = pygame.sprite.Group()
 
         # reset and create sprites
         self.setup_new_game_sprites()
 
-        # initialize the score variable
+        # reset the level, timers and score
+        self.reset_game_variables()
         self.reset_score()
         
+    def setup_update_scheduler(self):
+        # phases look the groups up when they run, the groups get replaced on a new game
+        def update_player(dt_ms, ms_elapsed_since_start):
+            if self.current_player_sprite is not None:
+                self.current_player_sprite.update(dt_ms, ms_elapsed_since_start)
+
+        self.update_scheduler.add_phase(PLAYER_PHASE, update_player)
+        self.update_scheduler.add_phase(FORMATION_PHASE, lambda dt_ms, _: self.formation.update(dt_ms))
+        self.update_scheduler.add_phase(PROJECTILES_PHASE, lambda dt_ms, _: self.projectiles.update(dt_ms))
+        self.update_scheduler.add_phase(EFFECTS_PHASE, lambda dt_ms, t: self.effect_sprites.update(dt_ms, t))
+        self.update_scheduler.add_phase(HUD_PHASE, lambda dt_ms, _: self.update_hud())
+        # walls, barriers and the spare ships never change on their own, so no phase visits them
+
+    def setup_craters(self):
+        for kind, tag in CRATER_TAGS.items():
+            self.craters[kind] = Crater(frame_mask_store.get(colorized_frame_cache.get(
+                self.entity_info[tag][IMAGES_TAG][0], self.entity_info[tag][COLOR_TAG])))
+
+    def check_entity_info(self, tag, images, color, speed):
+        # raises ValueError if the game couldn't take tag's new frames, color or speed, before anything has changed
+        if tag not in self.entity_info:
+            raise ValueError(f'{tag} is not an entry the game uses')
+        if not images:
+            raise ValueError(f'{tag} has no frames')
+        # the formation and the projectile manager only have room for so many frames of animation
+        max_frames = MAX_ENEMY_FRAMES if tag in GRID_ENEMY_TAGS else \
+            MAX_BULLET_FRAMES if tag in PROJECTILE_KINDS else None
+        if max_frames is not None and len(images) > max_frames:
+            raise ValueError(f'{tag} has {len(images)} frames, at most {max_frames} fit')
+        if len(color) != 3 or not all(isinstance(c, int) and 0 <= c <= 255 for c in color):
+            raise ValueError(f'{tag} has color {color}, it needs three values from 0 to 255')
+        if not isinstance(speed, (int, float)):
+            raise ValueError(f'{tag} has speed {speed}, it needs a number')
+
+    def apply_entity_info(self, tag, images, color, speed):
+        """Switch every sprite built from tag over to new frames, color or speed, without restarting the game.
+
+        Sprites keep their place and animation, pooled ones waiting to be used get the new look too, and
+        sprites that were recolored on purpose, like the red explosions, keep their color unless the
+        entry's color is what changed. Anything check_entity_info() turns down raises before the game is
+        touched."""
+        self.check_entity_info(tag, images, color, speed)
+        entry = self.entity_info[tag]
+        color_changed = color != entry[COLOR_TAG]
+        entry[IMAGES_TAG], entry[COLOR_TAG], entry[SPEED_TAG] = images, color, speed
+        frame_mask_store.preload(colorize_surfaces(images, color))
+
+        sprites = [sprite for sprite in self.all_sprites if getattr(sprite, 'entity_tag', None) == tag]
+        pool = self.sprite_pools.get(tag)
+        if pool is not None:
+            sprites += pool.free
+            # sprites the pool builds from now on
+            pool.factory = functools.partial(pool.factory.func, **{
+                **pool.factory.keywords, 'images': images, 'color': color, 'speed': speed})
+        for sprite in sprites:
+            sprite_color = color if color_changed else sprite.initial_color
+            if tag in PROJECTILE_KINDS and sprite.slot >= 0:
+                # the projectile manager has the bullet's real position, and takes it back with the new look
+                sprite.pos.update(*self.projectiles.pos[sprite.slot])
+                self.projectiles.remove(sprite)
+                sprite.reskin(images, sprite_color, speed)
+                self.projectiles.add(sprite, PROJECTILE_KINDS[tag], sprite.animation_interval_ms)
+            else:
+                sprite.reskin(images, sprite_color, speed)
+
+        if tag in GRID_ENEMY_TAGS and self.formation is not None:
+            self.formation.retune(GRID_ENEMY_TAGS.index(tag), len(images), images[0].get_width(),
+                                  images[0].get_height(), speed)
+        if tag in CRATER_TAGS.values():
+            self.setup_craters()
+        # barriers and the grid might have changed shape
+        self.collision_grid.invalidate_static()
+
+    def setup_sprite_pools(self):
+        pooled_sprites = {
+            BULLET_PLAYER_TAG: PlayerBulletSprite,
+            BULLET_GRID_ENEMY_1_TAG: GridEnemyBulletSprite,
+            BULLET_GRID_ENEMY_2_TAG: GridEnemyBulletSprite,
+            BULLET_GRID_ENEMY_3_TAG: GridEnemyBulletSprite,
+            EXPLOSION_PLAYER_TAG: functools.partial(PlayerExplosionSprite, time_should_exist_ms=PLAYER_EXPLOSION_LENGTH_MS),
+            EXPLOSION_GRID_ENEMY_TAG: functools.partial(ExplosionSprite, time_should_exist_ms=EXPLOSION_LENGTH_MS),
+            EXPLOSION_BULLET_PLAYER_TAG: functools.partial(ExplosionSprite, time_should_exist_ms=EXPLOSION_LENGTH_MS),
+            EXPLOSION_BULLET_ENEMY_TAG: functools.partial(ExplosionSprite, time_should_exist_ms=EXPLOSION_LENGTH_MS),
+        }
+        for tag, sprite_class in pooled_sprites.items():
+            self.sprite_pools[tag] = SpritePool(
+                functools.partial(
+                    sprite_class,
+                    images=self.entity_info[tag][IMAGES_TAG],
+                    color=self.entity_info[tag][COLOR_TAG],
+                    speed=self.entity_info[tag][SPEED_TAG],
+                    x_pos=0,
+                    y_pos=0,
+                    groups=()),
+                size=POOL_SIZES[tag],
+                tag=tag)
+
+    def spawn(self, tag, x_pos, y_pos, groups=(), color=None, **kwargs):
+        # take a sprite from the tag's pool and put it into play
+        sprite = self.sprite_pools[tag].acquire(
+            groups=(self.all_sprites,) + tuple(groups),
+            color=color if color is not None else self.entity_info[tag][COLOR_TAG],
+            speed=self.entity_info[tag][SPEED_TAG],
+            x_pos=x_pos,
+            y_pos=y_pos,
+            **kwargs)
+        if tag in PROJECTILE_KINDS:
+            self.projectiles.add(sprite, PROJECTILE_KINDS[tag], sprite.animation_interval_ms)
+        return sprite
+
+    def pool_stats(self):
+        return {tag: pool.stats() for tag, pool in self.sprite_pools.items()}
+
     def setup_grid_enemies(self):
         self.grid_enemy_sprites = pygame.sprite.Group()
-        self.grid_enemy_sprites_columns = [pygame.sprite.Group() for _ in range(self.enemy_columns)]
         self.all_enemy_sprites = pygame.sprite.Group()
         
-        # create five rows of enemy sprites
+        # create the rows of enemy sprites
         y_initial = 60
         y_increment = 16
         x_increment = self.screen.get_width() // 14
@@ -230,28 +560,52 @@ class SpaceInvaders:
             ENEMY_ANTENNA_TAG: AntennaEnemySprite,
             ENEMY_EARS_TAG: EarsEnemySprite,
         }
-        for row in range(5):
-            # 1st enemy row - Conehead
-            if row == 0:
-                enemy_name = ENEMY_CONEHEAD_TAG
-            # 2nd and 3rd enemy rows - Antenna
-            elif row == 1 or row == 2:
-                enemy_name = ENEMY_ANTENNA_TAG
-            # 4th and 5th enemy rows - Ears
-            # elif row == 3 or row == 4: enemy = ENEMY_EARS_TAG
-            else:
-                enemy_name = ENEMY_EARS_TAG
-            for column, x in zip(range(self.enemy_columns), range(2 * x_increment, 13 * x_increment, x_increment)):
+        # 1st enemy row - Conehead
+        # 2nd and 3rd enemy rows - Antenna
+        # every row after that - Ears
+        row_kinds = [min(row, 1) if row < 3 else 2 for row in range(self.enemy_rows)]
+
+        # the formation owns the positions, timing and animation of the grid, the sprites just draw it
+        self.formation = Formation(
+            rows=self.enemy_rows,
+            columns=self.enemy_columns,
+            origin=(2 * x_increment, y_initial),
+            spacing=(x_increment, y_increment),
+            kinds=row_kinds,
+            frame_counts=[len(self.entity_info[tag][IMAGES_TAG]) for tag in GRID_ENEMY_TAGS],
+            widths=[self.entity_info[tag][IMAGES_TAG][0].get_width() for tag in GRID_ENEMY_TAGS],
+            heights=[self.entity_info[tag][IMAGES_TAG][0].get_height() for tag in GRID_ENEMY_TAGS],
+            speeds=[self.entity_info[tag][SPEED_TAG] for tag in GRID_ENEMY_TAGS])
+        # a new grid always needs to go into the collision grid
+        self.collision_grid.invalidate_static()
+        for row in range(self.enemy_rows):
+            enemy_name = GRID_ENEMY_TAGS[row_kinds[row]]
+            for column in range(self.enemy_columns):
                 # print(f'Row: {row} Column: {column}')
-                enemy_sprites[enemy_name](
+                x, y = self.formation.pos[self.formation.index_of(row, column)]
+                enemy_sprite = enemy_sprites[enemy_name](
                     images=self.entity_info[enemy_name][IMAGES_TAG],
                     color=self.entity_info[enemy_name][COLOR_TAG],
                     speed=self.entity_info[enemy_name][SPEED_TAG],
                     x_pos=x,
-                    y_pos=y_initial + (row * y_increment),
+                    y_pos=y,
                     initial_grid_position=(row, column),
-                    groups=(self.all_sprites, self.grid_enemy_sprites, self.grid_enemy_sprites_columns[column],
-                            self.all_enemy_sprites))
+                    groups=(self.all_sprites, self.grid_enemy_sprites, self.all_enemy_sprites))
+                enemy_sprite.entity_tag = enemy_name
+                self.formation.attach(enemy_sprite)
+
+    def setup_barriers(self):
+        for x in range(self.screen.get_width() // 5, 4 * self.screen.get_width() // 5, self.screen.get_width() // 5):
+            barrier_sprite = BarrierSprite(
+                images=self.entity_info[BARRIER_TAG][IMAGES_TAG],
+                color=self.entity_info[BARRIER_TAG][COLOR_TAG],
+                speed=self.entity_info[BARRIER_TAG][SPEED_TAG],
+                x_pos=x,
+                y_pos=190,
+                groups=(self.all_sprites, self.barrier_sprites))
+            barrier_sprite.entity_tag = BARRIER_TAG
+        # the barriers live in the static collision layer
+        self.collision_grid.invalidate_static()
 
     def setup_new_game_sprites(self):
         # ----- newgame sprite creation -----
@@ -277,21 +631,17 @@ class SpaceInvaders:
         self.bottom_wall_sprite.image.fill(GREEN)
         self.top_wall_sprite.rect.bottom = 36
         self.bottom_wall_sprite.rect.top = 232
+        # bullets are checked against the walls all at once, as left, top, right, bottom
+        self.wall_boxes = np.array([(wall.rect.left, wall.rect.top, wall.rect.right, wall.rect.bottom)
+                                    for wall in self.wall_sprites])
         
         # player extra lives and 
-        for _ in range(STARTING_LIVES):
+        for _ in range(self.starting_lives):
             self.increment_player_extra_lives()
 
         # create the barrier sprites
-        for x in range(self.screen.get_width() // 5, 4 * self.screen.get_width() // 5, self.screen.get_width() // 5):
-            BarrierSprite(
-                images=self.entity_info[BARRIER_TAG][IMAGES_TAG],
-                color=self.entity_info[BARRIER_TAG][COLOR_TAG],
-                speed=self.entity_info[BARRIER_TAG][SPEED_TAG],
-                x_pos=x,
-                y_pos=190,
-                groups=(self.all_sprites, self.barrier_sprites))
-            
+        self.setup_barriers()
+
         self.setup_grid_enemies()
 
         # DEBUG: create three enemy sprites in the middle of the screen
@@ -328,13 +678,14 @@ class SpaceInvaders:
         y_pos = 240
         num_extra_lives = len(self.extra_player_sprites.sprites())
         if num_extra_lives < MAX_EXTRA_LIVES:
-            PlayerSprite(
+            player_sprite = PlayerSprite(
                 images=self.entity_info[PLAYER_SHIP_TAG][IMAGES_TAG],
                 color=self.entity_info[PLAYER_SHIP_TAG][COLOR_TAG],
                 speed=self.entity_info[PLAYER_SHIP_TAG][SPEED_TAG],
                 x_pos=initial_x_pos + ((num_extra_lives) * x_spacing),
                 y_pos=y_pos,
                 groups=(self.all_sprites, self.extra_player_sprites))
+            player_sprite.entity_tag = PLAYER_SHIP_TAG
 
     def replace_player_sprite(self) -> bool:
         if self.current_player_sprite:
@@ -344,27 +695,31 @@ class SpaceInvaders:
         else:
             self.current_player_sprite = self.extra_player_sprites.sprites()[len(self.extra_player_sprites.sprites()) - 1]
             self.current_player_sprite.set_position(PLAYER_STARTING_POS)
+            # spare ships aren't updated while they wait, but they have been around since the game started
+            self.current_player_sprite.time_since_shoot_ms = self.ms_elapsed_since_start
             self.extra_player_sprites.remove(self.current_player_sprite)
             return True
 
-    def draw_game_over(self):
+    # the draw_* methods draw onto the screen unless they're given another surface,
+    # and return the rects they drew over
+    def draw_game_over(self, surface=None):
+        surface = surface or self.screen
         border_thickness = 1
         game_over_bg_rect = pygame.Rect(0, 0, self.game_over_rect.width * 1.5, self.game_over_rect.height * 2)
         game_over_bg_rect.center = self.game_over_rect.center
         game_over_bg_rect_frame = game_over_bg_rect.inflate(border_thickness * 2, border_thickness * 2)
-        pygame.draw.rect(self.screen, FG_COLOR, game_over_bg_rect_frame, 0)
-        pygame.draw.rect(self.screen, BG_COLOR, game_over_bg_rect, 0)
-        self.screen.blit(self.game_over_surface, self.game_over_rect)
+        pygame.draw.rect(surface, FG_COLOR, game_over_bg_rect_frame, 0)
+        pygame.draw.rect(surface, BG_COLOR, game_over_bg_rect, 0)
+        surface.blit(self.game_over_surface, self.game_over_rect)
         
         play_again_bg_rect = pygame.Rect(0, 0, self.play_again_rect.width * 1.1, self.play_again_rect.height * 2)
         play_again_bg_rect.center = self.play_again_rect.center
         play_again_bg_rect_frame = play_again_bg_rect.inflate(border_thickness * 2, border_thickness * 2)
-        pygame.draw.rect(self.screen, FG_COLOR, play_again_bg_rect_frame, 0)
-        pygame.draw.rect(self.screen, BG_COLOR, play_again_bg_rect, 0)
-        self.screen.blit(self.play_again_surface, self.play_again_rect)
-        
-        
-        
+        pygame.draw.rect(surface, FG_COLOR, play_again_bg_rect_frame, 0)
+        pygame.draw.rect(surface, BG_COLOR, play_again_bg_rect, 0)
+        surface.blit(self.play_again_surface, self.play_again_rect)
+        return [game_over_bg_rect_frame, play_again_bg_rect_frame]
+
 
     @staticmethod
     def update_score_surface(func):
@@ -373,7 +728,7 @@ class SpaceInvaders:
             # change the score variable etc. before changing the visual
             result = func(calling_instance, *args, **kwargs)
             # change the visual
-            calling_instance.score_value_surface = (calling_instance.font.render(f'{calling_instance.score_player:04d}',calling_instance.TEXT_ANTIALIASING,FG_COLOR))
+            calling_instance.score_value_surface = calling_instance.text.render(f'{calling_instance.score_player:04d}')
             calling_instance.score_value_rect = calling_instance.score_value_surface.get_rect()
             calling_instance.score_value_rect.center = calling_instance.score_value_surface_pos
             return result
@@ -381,9 +736,7 @@ class SpaceInvaders:
         return wrapper
 
     def setup_score_surface(self):
-        self.score_value_surface = self.font.render(f'{self.score_player:04d}',
-                                                    self.TEXT_ANTIALIASING,
-                                                    FG_COLOR)
+        self.score_value_surface = self.text.render(f'{self.score_player:04d}')
         self.score_value_rect = self.score_value_surface.get_rect()
         self.score_value_rect.center = self.score_value_surface_pos
 
@@ -395,73 +748,74 @@ class SpaceInvaders:
     def add_to_score(self, num):
         self.score_player += num
 
-    def draw_score(self):
-        # draw the score label "SCORE P1"
-        self.screen.blit(self.score_label_surface, self.score_label_rect)
-        # draw the numeric score
-        self.screen.blit(self.score_value_surface, self.score_value_rect)
+    def draw_score(self, surface=None):
+        surface = surface or self.screen
+        return [
+            # draw the score label "SCORE P1"
+            surface.blit(self.score_label_surface, self.score_label_rect),
+            # draw the numeric score
+            surface.blit(self.score_value_surface, self.score_value_rect),
+        ]
         
     def update_high_score(self, new_high_score):
         self.high_score = new_high_score
-        self.high_score_value_surface = self.font.render(f'{self.high_score:04d}', self.TEXT_ANTIALIASING, FG_COLOR)
+        self.high_score_value_surface = self.text.render(f'{self.high_score:04d}')
         self.high_score_value_rect = self.high_score_value_surface.get_rect()
         self.high_score_value_rect.center = self.high_score_value_surface_pos
         
-    def draw_high_score(self):
-        # draw the high score label
-        self.screen.blit(self.high_score_label_surface, self.high_score_label_rect)
-        # draw the high score value
-        self.screen.blit(self.high_score_value_surface, self.high_score_value_rect)
-        
-    def draw_extra_life_counter(self):
+    def draw_high_score(self, surface=None):
+        surface = surface or self.screen
+        return [
+            # draw the high score label
+            surface.blit(self.high_score_label_surface, self.high_score_label_rect),
+            # draw the high score value
+            surface.blit(self.high_score_value_surface, self.high_score_value_rect),
+        ]
+
+    def count_lives(self):
         lives = len(self.extra_player_sprites.sprites())
         if self.current_player_sprite is not None: lives += 1
-        self.extra_life_counter_surface = self.font.render(f'{lives}', self.TEXT_ANTIALIASING, FG_COLOR)
+        return lives
+        
+    def update_hud(self):
+        # the memo hands back the same surface until the number of lives changes
+        self.extra_life_counter_surface = self.text.render(f'{self.count_lives()}')
+
+    def draw_extra_life_counter(self, surface=None):
+        surface = surface or self.screen
         # draw the extra life number
-        self.screen.blit(self.extra_life_counter_surface, self.extra_life_counter_rect)
+        return [surface.blit(self.extra_life_counter_surface, self.extra_life_counter_rect)]
 
     def player_shoot(self):
         # if no player bullet exists, create a bullet sprite at the player's location
         if len(self.player_bullet_sprites.sprites()) == 0:
             if self.current_player_sprite.time_since_shoot_ms >= self.current_player_sprite.min_shoot_interval_ms:
-                PlayerBulletSprite(
-                    images=self.entity_info[BULLET_PLAYER_TAG][IMAGES_TAG],
-                    color=self.entity_info[BULLET_PLAYER_TAG][COLOR_TAG],
-                    speed=self.entity_info[BULLET_PLAYER_TAG][SPEED_TAG],
+                self.spawn(
+                    BULLET_PLAYER_TAG,
                     x_pos=self.current_player_sprite.rect.centerx,
                     y_pos=self.current_player_sprite.rect.centery,
-                    groups=(self.all_sprites, self.player_bullet_sprites)
+                    groups=(self.player_bullet_sprites,)
                 )
                 self.current_player_sprite.time_since_shoot_ms = 0
 
     def enemy_shoot(self, enemy: EnemySprite):
-        random_bullet_tag = random.choice([BULLET_GRID_ENEMY_1_TAG, BULLET_GRID_ENEMY_2_TAG, BULLET_GRID_ENEMY_3_TAG])
-        GridEnemyBulletSprite(
-            images=self.entity_info[random_bullet_tag][IMAGES_TAG],
-            color=self.entity_info[random_bullet_tag][COLOR_TAG],
-            speed=self.entity_info[random_bullet_tag][SPEED_TAG],
+        random_bullet_tag = self.rng.stream(ENEMY_BULLET_RNG).choice([BULLET_GRID_ENEMY_1_TAG, BULLET_GRID_ENEMY_2_TAG, BULLET_GRID_ENEMY_3_TAG])
+        self.spawn(
+            random_bullet_tag,
             x_pos=enemy.rect.centerx,
             y_pos=enemy.rect.centery,
-            groups=(self.all_sprites, self.enemy_bullet_sprites)
+            groups=(self.enemy_bullet_sprites,)
         )
 
     def handle_enemy_shoot(self):
         if self.time_since_enemy_shoot_ms > self.enemy_shoot_interval_ms:
             # shoot, reset counter
             # if there is at least one grid enemy left
-            if self.grid_enemy_sprites.sprites():
-                # this list will contain the enemy at the bottom of each column that still exists
-                possible_enemies = []
-                # in each column of the enemy grid
-                for column_sprite_group in self.grid_enemy_sprites_columns:
-                    # if the column group has one sprite or more
-                    if len(column_sprite_group.sprites()) > 0:
-                        # add the enemy at the end of the group to the list of possibles
-                        possible_enemies.append(column_sprite_group.sprites()[len(column_sprite_group) - 1])
-                # trigger a shot from a random enemy from the possibles array
-                self.enemy_shoot(random.choice(possible_enemies))
+            if self.formation.num_alive > 0:
+                # trigger a shot from the enemy at the bottom of a random column that still has enemies in it
+                self.enemy_shoot(self.formation.shooter(self.rng.stream(ENEMY_SHOOTER_RNG).choice(self.formation.occupied_columns)))
             # randomize the interval a little bit, but keep it rooted by the base value
-            self.enemy_shoot_interval_ms = self.base_enemy_shoot_interval_ms * random.uniform(0.6, 1.2)
+            self.enemy_shoot_interval_ms = self.base_enemy_shoot_interval_ms * self.rng.stream(ENEMY_SHOOT_INTERVAL_RNG).uniform(0.6, 1.2)
             # an enemy shot, so reset the counter
             self.time_since_enemy_shoot_ms = 0
         else:
@@ -469,177 +823,244 @@ class SpaceInvaders:
             self.time_since_enemy_shoot_ms += self.dt_ms
 
     def handle_collision(self):
+        # broad phase: the formation and barriers only go back into the grid after the formation has moved,
+        # the player and the bullets go in every frame, then collect every colliding pair at once
+        self.collision_grid.update_static(self.formation.version, [
+            (self.grid_enemy_sprites, CollisionKind.GRID_ENEMY),
+            (self.barrier_sprites, CollisionKind.BARRIER)])
+        # the bullets' rects come straight out of the projectile arrays
+        projectiles = self.projectiles
+        bullet_boxes = []
+        for kind in (CollisionKind.PLAYER_BULLET, CollisionKind.ENEMY_BULLET):
+            slots = projectiles.live(kind)
+            if len(slots):
+                bullet_boxes.append(([projectiles.views[slot] for slot in slots.tolist()], projectiles.box[slots],
+                                     kind))
+        self.collision_grid.update_dynamic(
+            [((self.current_player_sprite,) if self.current_player_sprite else (), CollisionKind.PLAYER)],
+            bullet_boxes)
+        colliding = self.collision_grid.colliding_pairs()
+        # the pairs are found before anything is killed, so every handler below checks that its sprites
+        # are still in their groups, in case an earlier handler already took them out
+
+        def _bullets_hitting_walls(kind):
+            # the walls are plain rectangles, so a bullet hits one when its hitbox (its rect shrunk down to
+            # the opaque pixels of the current frame) overlaps the wall's box, checked for every bullet of
+            # the kind at once
+            slots = projectiles.live(kind)
+            if not len(slots):
+                return []
+            hitboxes = projectiles.hitbox[slots][:, None, :]
+            walls = self.wall_boxes[None, :, :]
+            hits = ((hitboxes[..., 0] < walls[..., 2]) & (walls[..., 0] < hitboxes[..., 2]) &
+                    (hitboxes[..., 1] < walls[..., 3]) & (walls[..., 1] < hitboxes[..., 3])).any(axis=1)
+            return [projectiles.views[slot] for slot in slots[hits].tolist()]
+
         def _handle_grid_enemy_and_wall_collision():
-            # see if the enemies have reached the edge
-            if len(self.grid_enemy_sprites) > 0:
-                ms_since_move_threshold = 100
-                for wall, direction in [
-                    (self.left_wall_sprite, Direction.RIGHT),
-                    (self.right_wall_sprite, Direction.LEFT)]:
-                    # if an enemy has collided with a wall AND
-                    # if the top left Sprite (or the first one in the enemy_sprites array if the top left has been destroyed)
-                    # has moved very recently
-                    # the second 'if' statement exists because we need to make sure all of the enemies have moved
-                    # toward the wall before reversing them all
-                    if pygame.sprite.spritecollide(wall, self.all_enemy_sprites, False) and \
-                            self.all_enemy_sprites.sprites()[0].ms_since_move < ms_since_move_threshold:
-                        for sprite in self.all_enemy_sprites:
-                            sprite.shift_down()
-                            sprite.direction = direction
+            # see if the enemies have reached the edge, and if so turn the whole formation around
+            self.formation.handle_walls(self.screen.get_width())
 
         def _handle_player_and_bullet_collision():
             if self.current_player_sprite is not None:
-                collided = pygame.sprite.spritecollide(self.current_player_sprite, self.enemy_bullet_sprites, True)
+                collided = [enemy_bullet for _, enemy_bullet in
+                            colliding[CollisionKind.PLAYER, CollisionKind.ENEMY_BULLET]
+                            if enemy_bullet in self.enemy_bullet_sprites]
                 if collided:
+                    for enemy_bullet in collided:
+                        enemy_bullet.kill()
                     # wipe enemy bullets
-                    self.enemy_bullet_sprites.empty()
+                    for enemy_bullet in self.enemy_bullet_sprites.sprites():
+                        enemy_bullet.kill()
                     
                     # reset "time since player death" variable
                     self.time_since_player_death_ms = 0
                     
                     # make explosion
-                    PlayerExplosionSprite(
-                        images=self.entity_info[EXPLOSION_PLAYER_TAG][IMAGES_TAG],
-                        color=self.entity_info[EXPLOSION_PLAYER_TAG][COLOR_TAG],
-                        speed=self.entity_info[EXPLOSION_PLAYER_TAG][SPEED_TAG],
+                    self.spawn(
+                        EXPLOSION_PLAYER_TAG,
                         x_pos=self.current_player_sprite.rect.centerx,
                         y_pos=self.current_player_sprite.rect.centery,
                         time_should_exist_ms=PLAYER_EXPLOSION_LENGTH_MS,
-                        groups=(self.all_sprites,)
+                        groups=(self.effect_sprites,),
                     )
                     self.current_player_sprite.kill()
                     self.current_player_sprite = None
 
         def _handle_enemy_and_bullet_collision():
-            enemies_shot = pygame.sprite.groupcollide(self.player_bullet_sprites, self.grid_enemy_sprites,
-                                                      True, True, collided=pygame.sprite.collide_mask)
-            # {<PlayerBulletSprite Sprite(in 0 groups)>: [<EnemySprite Sprite(in 0 groups)>]}
-            # find the value to add to the score and add it
-            for enemies in enemies_shot.values():
-                for enemy_sprite in enemies:
-                    # print(f'Enemy killed - grid position {enemy.initial_grid_position}')
-                    # give the player score depending on the enemy
-                    self.add_to_score(enemy_sprite.score_for_kill)
-
-                    # create an explosion at the place where the enemy died
-                    ExplosionSprite(
-                        images=self.entity_info[EXPLOSION_GRID_ENEMY_TAG][IMAGES_TAG],
-                        color=self.entity_info[EXPLOSION_GRID_ENEMY_TAG][COLOR_TAG],
-                        speed=self.entity_info[EXPLOSION_GRID_ENEMY_TAG][SPEED_TAG],
-                        x_pos=enemy_sprite.rect.centerx,
-                        y_pos=enemy_sprite.rect.centery,
-                        time_should_exist_ms=EXPLOSION_LENGTH_MS,
-                        groups=(self.all_sprites,)
-                    )
+            # a bullet takes out every enemy it touches on this frame, then it's gone too
+            player_bullets_hit = []
+            for player_bullet, enemy_sprite in colliding[CollisionKind.PLAYER_BULLET, CollisionKind.GRID_ENEMY]:
+                if enemy_sprite not in self.grid_enemy_sprites:
+                    continue
+                if player_bullet not in self.player_bullet_sprites and player_bullet not in player_bullets_hit:
+                    continue
+                player_bullets_hit.append(player_bullet)
+                # print(f'Enemy killed - grid position {enemy.initial_grid_position}')
+                enemy_sprite.kill()
+                self.formation.kill(enemy_sprite)
+                # give the player score depending on the enemy
+                self.add_to_score(enemy_sprite.score_for_kill)
+
+                # create an explosion at the place where the enemy died
+                self.spawn(
+                    EXPLOSION_GRID_ENEMY_TAG,
+                    x_pos=enemy_sprite.rect.centerx,
+                    y_pos=enemy_sprite.rect.centery,
+                    time_should_exist_ms=EXPLOSION_LENGTH_MS,
+                    groups=(self.effect_sprites,),
+                )
+            for player_bullet in player_bullets_hit:
+                player_bullet.kill()
 
-            # speed up each grid enemy by setting their "time per move" proportional to the number of enemies left
-            # fewer enemies = lower threshold = more moves per time
-            for enemy_sprite in self.grid_enemy_sprites.sprites():
-                # enemies get faster after each grid clear
-                enemy_sprite.move_time_threshold = len(self.grid_enemy_sprites.sprites()) * max(10, (20 - self.enemy_grid_clears))
-                
+            # speed up the grid according to the number of enemies left
+            self.formation.speed_up(self.enemy_grid_clears)
 
         def _handle_enemy_and_player_collision():
-            if len(self.all_enemy_sprites) > 0 and self.current_player_sprite is not None:
-                if pygame.sprite.spritecollide(self.current_player_sprite, self.all_enemy_sprites, False):
-                    self.game_is_over = True
+            # nothing to check until the formation has come down as far as the player
+            formation_box = self.formation.bounding_box()
+            if self.current_player_sprite is not None and formation_box is not None and \
+                    self.current_player_sprite.rect.colliderect(formation_box):
+                for _, enemy_sprite in colliding[CollisionKind.PLAYER, CollisionKind.GRID_ENEMY]:
+                    if enemy_sprite in self.all_enemy_sprites:
+                        self.game_is_over = True
 
         def _handle_barrier_and_bullet_collision():
-            collided = {}
-            for bullet_group in (self.enemy_bullet_sprites, self.player_bullet_sprites):
-                collided |= pygame.sprite.groupcollide(self.barrier_sprites, bullet_group,
-                                                       False, True, collided=pygame.sprite.collide_mask)
-            for barrier in collided:
-                barrier.reduce_health(1)
+            # every bullet that touches what's left of a barrier knocks a crater out of it where it landed,
+            # all the craters a barrier takes in a frame go in together
+            barriers_hit = {}
+            for bullet_kind, bullet_group in [
+                (CollisionKind.ENEMY_BULLET, self.enemy_bullet_sprites),
+                (CollisionKind.PLAYER_BULLET, self.player_bullet_sprites)]:
+                for barrier, bullet in colliding[CollisionKind.BARRIER, bullet_kind]:
+                    if bullet in bullet_group and barrier in self.barrier_sprites:
+                        contact = barrier.mask.overlap(bullet.mask, (bullet.rect.x - barrier.rect.x,
+                                                                     bullet.rect.y - barrier.rect.y))
+                        if contact is None:
+                            continue
+                        bullet.kill()
+                        barriers_hit.setdefault(barrier, []).append(
+                            (self.craters[bullet_kind], (bullet.rect.centerx - barrier.rect.x, contact[1])))
+            for barrier, hits in barriers_hit.items():
+                barrier.erode(hits)
 
         def _handle_double_bullet_collision():
-            collided = pygame.sprite.groupcollide(self.player_bullet_sprites, self.enemy_bullet_sprites,
-                                                  True, True, collided=pygame.sprite.collide_mask)
+            collided = {}
+            for player_bullet, enemy_bullet in colliding[CollisionKind.PLAYER_BULLET, CollisionKind.ENEMY_BULLET]:
+                if enemy_bullet in self.enemy_bullet_sprites and \
+                        (player_bullet in self.player_bullet_sprites or player_bullet in collided):
+                    collided.setdefault(player_bullet, []).append(enemy_bullet)
+                    player_bullet.kill()
+                    enemy_bullet.kill()
             for player_bullet, enemy_bullet in collided.items():
                 # player bullet explosion
-                ExplosionSprite(
-                    images=self.entity_info[EXPLOSION_BULLET_PLAYER_TAG][IMAGES_TAG],
-                    color=self.entity_info[EXPLOSION_BULLET_PLAYER_TAG][COLOR_TAG],
-                    speed=self.entity_info[EXPLOSION_BULLET_PLAYER_TAG][SPEED_TAG],
+                self.spawn(
+                    EXPLOSION_BULLET_PLAYER_TAG,
                     x_pos=player_bullet.rect.centerx,
                     y_pos=player_bullet.rect.centery,
                     time_should_exist_ms=EXPLOSION_LENGTH_MS,
-                    groups=(self.all_sprites,)
+                    groups=(self.effect_sprites,),
                 )
                 # enemy bullet explosion
-                ExplosionSprite(
-                    images=self.entity_info[EXPLOSION_BULLET_ENEMY_TAG][IMAGES_TAG],
-                    color=self.entity_info[EXPLOSION_BULLET_ENEMY_TAG][COLOR_TAG],
-                    speed=self.entity_info[EXPLOSION_BULLET_ENEMY_TAG][SPEED_TAG],
+                self.spawn(
+                    EXPLOSION_BULLET_ENEMY_TAG,
                     x_pos=enemy_bullet[0].rect.centerx,
                     y_pos=enemy_bullet[0].rect.centery,
                     time_should_exist_ms=EXPLOSION_LENGTH_MS,
-                    groups=(self.all_sprites,)
+                    groups=(self.effect_sprites,),
                 )
 
         def _handle_player_bullet_wall_collision():
-            collided = pygame.sprite.groupcollide(self.player_bullet_sprites, self.wall_sprites,
-                                                  True, False, collided=pygame.sprite.collide_mask)
-            for player_bullet in collided.keys():
+            for player_bullet in _bullets_hitting_walls(CollisionKind.PLAYER_BULLET):
+                player_bullet.kill()
                 # player bullet explosion
-                ExplosionSprite(
-                    images=self.entity_info[EXPLOSION_BULLET_ENEMY_TAG][IMAGES_TAG],
+                self.spawn(
+                    EXPLOSION_BULLET_ENEMY_TAG,
                     color=RED,
-                    speed=self.entity_info[EXPLOSION_BULLET_PLAYER_TAG][SPEED_TAG],
                     x_pos=player_bullet.rect.centerx,
                     y_pos=player_bullet.rect.centery,
                     time_should_exist_ms=EXPLOSION_LENGTH_MS,
-                    groups=(self.all_sprites,)
+                    groups=(self.effect_sprites,),
                 )
 
         def _handle_enemy_bullet_wall_collision():
-            collided = pygame.sprite.groupcollide(self.enemy_bullet_sprites, self.wall_sprites,
-                                                  True, False, collided=pygame.sprite.collide_mask)
-            for enemy_bullet in collided.keys():
+            for enemy_bullet in _bullets_hitting_walls(CollisionKind.ENEMY_BULLET):
+                enemy_bullet.kill()
                 # enemy bullet explosion
-                ExplosionSprite(
-                    images=self.entity_info[EXPLOSION_BULLET_PLAYER_TAG][IMAGES_TAG],
+                self.spawn(
+                    EXPLOSION_BULLET_PLAYER_TAG,
                     color=GREEN,
-                    speed=self.entity_info[EXPLOSION_BULLET_ENEMY_TAG][SPEED_TAG],
                     x_pos=enemy_bullet.rect.centerx,
                     y_pos=enemy_bullet.rect.centery - 1.5,
                     time_should_exist_ms=EXPLOSION_LENGTH_MS,
-                    groups=(self.all_sprites,)
+                    groups=(self.effect_sprites,),
                 )
-        
+
+        stage = self.tick_profiler.stage
+
         # Enemy collides with PlayerBullet
-        _handle_enemy_and_bullet_collision()
+        with stage('collision.enemy_and_bullet'):
+            _handle_enemy_and_bullet_collision()
 
         # Player collides with EnemyBullet
-        _handle_player_and_bullet_collision()
+        with stage('collision.player_and_bullet'):
+            _handle_player_and_bullet_collision()
 
         # Barrier collides with Bullet of any kind
-        _handle_barrier_and_bullet_collision()
+        with stage('collision.barrier_and_bullet'):
+            _handle_barrier_and_bullet_collision()
 
         # Enemy collides with Player
-        _handle_enemy_and_player_collision()
+        with stage('collision.enemy_and_player'):
+            _handle_enemy_and_player_collision()
 
         # GridEnemy collides with side wall
-        _handle_grid_enemy_and_wall_collision()
+        with stage('collision.grid_enemy_and_wall'):
+            _handle_grid_enemy_and_wall_collision()
 
         # EnemyBullet collides with PlayerBullet
-        _handle_double_bullet_collision()
+        with stage('collision.double_bullet'):
+            _handle_double_bullet_collision()
 
         # Player or Enemy Bullet collides with wall
-        _handle_player_bullet_wall_collision()
-        _handle_enemy_bullet_wall_collision()
+        with stage('collision.bullet_and_wall'):
+            _handle_player_bullet_wall_collision()
+            _handle_enemy_bullet_wall_collision()
 
-    def handle_input(self):
+    @staticmethod
+    def read_input(keys=None) -> Action:
         # poll for pressed keys during this frame
-        keys = pygame.key.get_pressed()
+        if keys is None:
+            keys = pygame.key.get_pressed()
+
+        actions = Action.NONE
+        # check A, D, Left Arrow, Right Arrow
+        if keys[pygame.K_a] or keys[pygame.K_LEFT]:
+            actions |= Action.LEFT
+        if keys[pygame.K_d] or keys[pygame.K_RIGHT]:
+            actions |= Action.RIGHT
+        # Spacebar - shoot
+        if keys[pygame.K_SPACE]:
+            actions |= Action.FIRE
+        # N for new game
+        if keys[pygame.K_n]:
+            actions |= Action.NEW_GAME
+        # Escape - quit
+        if keys[pygame.K_ESCAPE]:
+            actions |= Action.QUIT
+        return actions
+
+    def handle_input(self, actions: Action = None):
+        # poll the keyboard unless the input for this frame was handed to us
+        if actions is None:
+            actions = self.read_input()
 
         # everything within this if statement only happens if the game is not over
         if not self.game_is_over and self.current_player_sprite:
-            # check A, D, Left Arrow, Right Arrow
-            for k_letter, k_arrow, direction in [
-                (keys[pygame.K_a], keys[pygame.K_LEFT], Direction.LEFT),
-                (keys[pygame.K_d], keys[pygame.K_RIGHT], Direction.RIGHT), ]:
-                if k_letter or k_arrow:
+            # left wins if both directions are held
+            for action, direction in [
+                (Action.LEFT, Direction.LEFT),
+                (Action.RIGHT, Direction.RIGHT), ]:
+                if action in actions:
                     if not self.current_player_sprite.is_at_edge(self.screen, direction):
                         self.current_player_sprite.start_moving(direction)
                     else:
@@ -650,100 +1071,383 @@ class SpaceInvaders:
                 self.current_player_sprite.stop_moving()
 
             # Spacebar - shoot
-            if keys[pygame.K_SPACE]:
+            if Action.FIRE in actions:
                 self.player_shoot()
                 
         # N for new game - DEBUG
         # TODO remove debug N mapping to newgame
-        if keys[pygame.K_n]:
+        if Action.NEW_GAME in actions:
             self.reset()
 
         # Escape - quit
-        if keys[pygame.K_ESCAPE]:
+        if Action.QUIT in actions:
             self.running = False
 
-    def update_sprite_group_except_groups(self, group_to_update: pygame.sprite.Group, *exception_groups):
-        for sprite in group_to_update.sprites():
-            should_update = True
-            for exception_group in exception_groups:
-                if sprite in exception_group:
-                    should_update = False
-            if should_update: 
-                sprite.update(self.dt_ms, self.ms_elapsed_since_start)
-    
-    def game_loop(self):
-        while self.running:
-            # poll for events
-            for event in pygame.event.get():
-                # pygame.QUIT event means the user clicked X to close your window
-                if event.type == pygame.QUIT:
-                    # cause the gameloop to end
-                    self.running = False
-
-            # handle the keyboard and mouse input
-            self.handle_input()
-
-            # wipe away anything from last frame
-            self.screen.fill(BG_COLOR)
-
-            # things in this section only happen if the game is not over
-            if not self.game_is_over:
-                # if there are no grid enemies, increment the clear counter and re-populate the grid
-                if len(self.grid_enemy_sprites.sprites()) <= 0:
-                    self.enemy_grid_clears += 1
-                    self.setup_grid_enemies()
-                
-                # check for collisions
+    def update_game(self):
+        # things in this section only happen if the game is not over
+        if not self.game_is_over:
+            # if there are no grid enemies, increment the clear counter and re-populate the grid
+            if self.formation.num_alive <= 0:
+                self.enemy_grid_clears += 1
+                self.setup_grid_enemies()
+            
+            # check for collisions
+            with self.tick_profiler.stage('collision'):
                 self.handle_collision()
 
-                # in the if statement, we are frozen after a player death
-                if self.should_be_frozen_after_player_death():
-                    # update everything except the enemy sprites
-                    self.update_sprite_group_except_groups(self.all_sprites, self.all_enemy_sprites)
-                # for the else, we are not frozen after player death
-                else:
-                    # if the player has no sprite
-                    if self.current_player_sprite is None:
-                        # replace the player sprite if possible, otherwise end the game
-                        replaced_player = self.replace_player_sprite()
-                        if not replaced_player:
-                            self.game_is_over = True
-                    # decide if an enemy should shoot, and if so, handle it
-                    self.handle_enemy_shoot()
-                    # call every sprite's update() if the game's not over
-                    self.all_sprites.update(self.dt_ms, self.ms_elapsed_since_start)
-            # game is over
-            else:
-                if self.score_player > self.high_score:
-                    self.update_high_score(self.score_player)
-
-            # draw all the sprites (excluding text)
+            # while we are frozen after a player death, everything except the enemies keeps updating
+            frozen = self.should_be_frozen_after_player_death()
+            self.update_scheduler.set_paused(FORMATION_PHASE, frozen)
+            if not frozen:
+                # if the player has no sprite
+                if self.current_player_sprite is None:
+                    # replace the player sprite if possible, otherwise end the game
+                    replaced_player = self.replace_player_sprite()
+                    if not replaced_player:
+                        self.game_is_over = True
+                # decide if an enemy should shoot, and if so, handle it
+                self.handle_enemy_shoot()
+            with self.tick_profiler.stage('update'):
+                # run every update phase that isn't paused, if the game's not over
+                self.update_scheduler.tick(self.dt_ms, self.ms_elapsed_since_start)
+
+                # move the grid enemy sprites to wherever the formation put them, and the bullets to
+                # wherever the projectile manager did
+                self.formation.sync_views()
+                self.projectiles.sync_views()
+        # game is over
+        else:
+            self.session_high_score = max(self.session_high_score, self.score_player)
+            if self.score_player > self.high_score:
+                self.update_high_score(self.score_player)
+            if not self.score_recorded:
+                self.score_recorded = True
+                if self.leaderboard is not None:
+                    # queued, the disk is the leaderboard's writer thread's business
+                    self.leaderboard.record(LeaderboardEntry(self.score_player, self.enemy_grid_clears,
+                                                             self.ms_elapsed_since_start, time.time()))
+
+    @property
+    def tick_profiler(self):
+        # whatever times the ticks, the simulation thread's profiler when there is one, else the frame's
+        return self.simulation_profiler or self.profiler
+
+    def step(self, actions: Action, dt_ms):
+        """Advance the game by a single tick lasting dt_ms, using actions as the input for that tick.
+
+        Nothing here waits on a clock or touches the display, so a headless game can be stepped as fast as
+        the simulation allows."""
+        self.dt_ms = dt_ms
+        if self.recorder is not None:
+            self.recorder.record(dt_ms, actions)
+        # handle the keyboard and mouse input
+        with self.tick_profiler.stage('input'):
+            self.handle_input(actions)
+        self.update_game()
+        # add elapsed milliseconds to milliseconds since start
+        self.ms_elapsed_since_start += self.dt_ms
+        self.time_since_player_death_ms += self.dt_ms
+        self.frames_elapsed += 1
+
+    def state_digest(self) -> bytes:
+        # everything that decides how the rest of the game plays out, a replay has to end on the same digest
+        state = hashlib.sha256()
+        state.update(repr((self.score_player, self.session_high_score, self.enemy_grid_clears, self.game_is_over,
+                           self.frames_elapsed, self.ms_elapsed_since_start, self.count_lives(),
+                           tuple(self.current_player_sprite.rect) if self.current_player_sprite else None,
+                           sorted(tuple(bullet.rect) for bullet in self.player_bullet_sprites),
+                           sorted(tuple(bullet.rect) for bullet in self.enemy_bullet_sprites),
+                           sorted((tuple(barrier.rect), barrier.mask.count()) for barrier in self.barrier_sprites),
+                           )).encode())
+        state.update(self.formation.pos.tobytes())
+        state.update(self.formation.alive.tobytes())
+        for barrier in sorted(self.barrier_sprites, key=lambda barrier: tuple(barrier.rect)):
+            state.update(pygame.image.tobytes(barrier.image, 'RGBA'))
+        return state.digest()
+
+    def save_recording(self):
+        self.recorder.save(self.record_path, self.score_player, self.state_digest())
+
+    def draw(self):
+        # wipe away anything from last frame
+        self.screen.fill(BG_COLOR)
+
+        # draw all the sprites (excluding text)
+        with self.profiler.stage('draw'):
             self.all_sprites.draw(self.screen)
 
+        with self.profiler.stage('hud'):
             # draw the score label and score
             self.draw_score()
             self.draw_high_score()
-            
+
             # draw extra life counter
             self.draw_extra_life_counter()
 
-            # show the GAME OVER text on top of everything
-            if self.game_is_over:
-                self.draw_game_over()
+        # show the GAME OVER text on top of everything
+        if self.game_is_over:
+            self.draw_game_over()
+
+    def snapshot(self) -> Snapshot:
+        # the game as it stands, in a form another thread can draw without touching the game itself
+        sprites = []
+        for sprite in self.all_sprites:
+            # barriers get eroded in place, so they hand out a copy
+            image = sprite.frozen_image() if isinstance(sprite, BarrierSprite) else sprite.image
+            rect = sprite.rect
+            prev_center = getattr(sprite, 'prev_center', None)
+            prev_topleft = (prev_center[0] - rect.width // 2, prev_center[1] - rect.height // 2) \
+                if prev_center is not None else rect.topleft
+            sprites.append((image, rect.topleft, prev_topleft))
+        hud = (
+            (self.score_label_surface, self.score_label_rect.topleft),
+            (self.score_value_surface, self.score_value_rect.topleft),
+            (self.high_score_label_surface, self.high_score_label_rect.topleft),
+            (self.high_score_value_surface, self.high_score_value_rect.topleft),
+            (self.extra_life_counter_surface, self.extra_life_counter_rect.topleft),
+        )
+        return Snapshot(self.frames_elapsed, time.perf_counter(), tuple(sprites), hud, self.game_is_over)
+
+    def draw_snapshot(self, snapshot: Snapshot, alpha=1.0):
+        # draw a snapshot, with everything that moved over its last tick part of the way there
+        self.screen.fill(BG_COLOR)
+        with self.profiler.stage('draw'):
+            blits = []
+            for image, (x, y), (prev_x, prev_y) in snapshot.sprites:
+                if (prev_x, prev_y) != (x, y):
+                    x, y = round(prev_x + (x - prev_x) * alpha), round(prev_y + (y - prev_y) * alpha)
+                blits.append((image, (x, y)))
+            self.screen.blits(blits, doreturn=False)
+        with self.profiler.stage('hud'):
+            self.screen.blits(snapshot.hud, doreturn=False)
+        if snapshot.game_over:
+            self.draw_game_over()
+
+    def toggle_profiler_overlay(self):
+        if self.profiler_overlay is None:
+            self.profiler_overlay = ProfilerOverlay(self.profiler, self.font, FG_COLOR, RED, GREEN,
+                                                    self.screen.get_size(), budget_ms=1000 / self.FPS)
+        self.show_profiler_overlay = not self.show_profiler_overlay
+        # the profiler only runs while somebody is looking at it, unless it was asked for from the start
+        self.profiler.set_enabled(self.profile or self.show_profiler_overlay)
+        if self.simulation_profiler is not None:
+            self.simulation_profiler.set_enabled(self.profiler.enabled)
+
+    def draw_profiler_overlay(self, surface=None):
+        surface = surface or self.screen
+        return self.profiler_overlay.draw(surface, self.frame_ms)
+
+    def interpolated_sprites(self):
+        # the things that move smoothly, the formation steps and is drawn where it is
+        if self.current_player_sprite is not None:
+            yield self.current_player_sprite
+        yield from self.player_bullet_sprites
+        yield from self.enemy_bullet_sprites
+
+    def cycle_speed(self):
+        speeds = FAST_FORWARD_SPEEDS
+        self.timestep.speed = speeds[(speeds.index(self.timestep.speed) + 1) % len(speeds)] \
+            if self.timestep.speed in speeds else speeds[0]
 
-            # flip() the display to put your work on screen
-            pygame.display.flip()
+    def game_loop(self):
+        stage = self.profiler.stage
+        first_frame = True
+        while self.running:
+            self.profiler.begin_frame()
 
-            # limits FPS to 60
-            # the number of milliseconds passed since the last .tick() call
-            # multiply movements by dt to create framerate-independence (real-time dependence)
-            self.dt_ms = self.clock.tick(self.FPS)
-            # add elapsed milliseconds to milliseconds since start
-            self.ms_elapsed_since_start += self.dt_ms
-            self.time_since_player_death_ms += self.dt_ms
+            # poll for events
+            with stage('events'):
+                self.handle_events()
+            if self.asset_watcher is not None:
+                with stage('reload'):
+                    self.asset_watcher.poll(self.frame_ms)
+
+            # run as many fixed ticks as the time since the last frame adds up to, all with this frame's input
+            actions = self.read_input()
+            for _ in range(self.timestep.advance(self.frame_ms)):
+                self.step(actions, TICK_MS)
+                # a new game is one press, not one per tick
+                actions &= ~Action.NEW_GAME
+
+            overlay = self.draw_profiler_overlay if self.show_profiler_overlay else None
+            # draw the moving sprites part of the way into the tick that's still running
+            with interpolated(self.interpolated_sprites(), self.timestep.alpha):
+                if self.renderer is not None:
+                    # only push the parts of the screen that changed
+                    with stage('draw'):
+                        dirty_rects = self.renderer.render(overlay)
+                    self.publish_frame()
+                    with stage('flip'):
+                        pygame.display.update(dirty_rects)
+                    self.capture_frame()
+                else:
+                    self.draw()
+                    if overlay is not None:
+                        overlay()
+                    self.publish_frame()
+                    # flip() the display to put your work on screen
+                    with stage('flip'):
+                        pygame.display.flip()
+                    self.capture_frame()
+
+            if first_frame:
+                first_frame = False
+                self.first_frame_shown()
 
+            # limits FPS to 60
+            # the number of milliseconds passed since the last .tick() call, which feeds the next frame's ticks
+            with stage('tick'):
+                self.frame_ms = self.clock.tick(self.FPS)
+
+            self.profiler.end_frame()
+
+        self.shut_down()
+
+    def threaded_game_loop(self):
+        # the simulation ticks away on its own thread, this one only polls input and draws what it publishes
+        stage = self.profiler.stage
+        # the ticks are timed on their own thread, into a profiler of their own
+        self.simulation_profiler = FrameProfiler(enabled=self.profiler.enabled, name='simulation', tid=1)
+        simulation = SimulationThread(self, TICK_MS, self.simulation_profiler)
+        simulation.start()
+        first_frame = True
+        try:
+            while self.running:
+                self.profiler.begin_frame()
+
+                with stage('events'):
+                    self.handle_events()
+                simulation.set_input(self.read_input())
+
+                snapshot = simulation.latest()
+                if snapshot is not None:
+                    tick_s = TICK_MS / 1000 / self.timestep.speed
+                    alpha = min(1.0, (time.perf_counter() - snapshot.published_at) / tick_s)
+                    self.draw_snapshot(snapshot, alpha)
+                    if self.show_profiler_overlay:
+                        self.draw_profiler_overlay()
+                    self.publish_frame()
+                    with stage('flip'):
+                        pygame.display.flip()
+                    self.capture_frame()
+                    if first_frame:
+                        first_frame = False
+                        self.first_frame_shown()
+
+                with stage('tick'):
+                    self.frame_ms = self.clock.tick(self.FPS)
+
+                self.profiler.end_frame()
+                if simulation.error is not None:
+                    raise simulation.error
+        finally:
+            simulation.stop()
+            simulation.join()
+        self.shut_down()
+
+    def handle_events(self):
+        for event in pygame.event.get():
+            # pygame.QUIT event means the user clicked X to close your window
+            if event.type == pygame.QUIT:
+                # cause the gameloop to end
+                self.running = False
+            # F3 - frame time overlay
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                self.toggle_profiler_overlay()
+            # F4 - fast-forward
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_F4:
+                self.cycle_speed()
+
+    def publish_frame(self):
+        # the screen as it's about to be shown, into the next slot of the shared memory ring
+        if self.framebuffer is not None:
+            with self.profiler.stage('publish'):
+                self.framebuffer.publish(self.screen)
+
+    def capture_frame(self):
+        # hand what's on screen to the capture encoder, or drop it if the encoder is behind
+        if self.capture is not None:
+            with self.profiler.stage('capture'):
+                self.capture.submit(self.screen)
+
+    def first_frame_shown(self):
+        # the first frame is on screen, startup is over
+        self.startup.mark('first frame')
+        if self.profile_startup:
+            print(self.startup.report(), file=sys.stderr)
+
+    def shut_down(self):
+        if self.recorder is not None:
+            self.save_recording()
+        if self.profile_path is not None:
+            self.profiler.export(self.profile_path,
+                                 [self.simulation_profiler] if self.simulation_profiler is not None else [])
+        if self.framebuffer is not None:
+            self.framebuffer.close()
+        if self.leaderboard is not None:
+            self.leaderboard.close()
+        if self.capture is not None:
+            self.capture.close()
+            print(self.capture.report(), file=sys.stderr)
         pygame.quit()
 
 
+def seed_argument(text):
+    # any seed plays, but a recording only has room for a signed 64 bit one
+    try:
+        seed = int(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'{text!r} is not a whole number') from None
+    if not MIN_SEED <= seed <= MAX_SEED:
+        raise argparse.ArgumentTypeError(f'{seed} is out of range, seeds go from {MIN_SEED} to {MAX_SEED}')
+    return seed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Space Invaders')
+    parser.add_argument('--dirty-rects', action='store_true',
+                        help='redraw and push only the parts of the screen that changed each frame')
+    parser.add_argument('--seed', type=seed_argument, help='seed for the first game, random if not given')
+    parser.add_argument('--record', metavar='PATH',
+                        help='record the session to PATH, play it back with python -m spaceinvaders.replay PATH')
+    parser.add_argument('--profile', action='store_true',
+                        help='time every stage of every frame from the start, rather than only while F3 is on')
+    parser.add_argument('--profile-out', metavar='PATH',
+                        help='on exit, write the last frames\' timings to PATH, as CSV if it ends in .csv, '
+                             'otherwise as a Chrome trace, with --threaded the ticks go in their own thread\'s '
+                             'track, or in a CSV of their own next to PATH')
+    parser.add_argument('--audio', action='store_true', help='start the audio subsystem')
+    parser.add_argument('--speed', type=int, default=1,
+                        help='run this many simulation ticks for every tick\'s worth of real time, F4 cycles through '
+                             f'{", ".join(map(str, FAST_FORWARD_SPEEDS))}')
+    parser.add_argument('--profile-startup', action='store_true',
+                        help='once the first frame is on screen, print how long each step of startup took')
+    parser.add_argument('--threaded', action='store_true',
+                        help='run the simulation on its own thread, so a slow draw or flip never holds it up')
+    parser.add_argument('--framebuffer', metavar='NAME',
+                        help='publish every frame to a shared memory ring called NAME, follow it with '
+                             'python -m spaceinvaders.framebuffer NAME')
+    parser.add_argument('--capture', metavar='PATH',
+                        help='record what\'s shown to PATH, a .gif (needs Pillow), a .raw file of RGB frames or '
+                             'otherwise a directory of PNGs')
+    parser.add_argument('--leaderboard', metavar='PATH', default=LEADERBOARD_PATH,
+                        help=f'keep every finished game\'s score in PATH, {LEADERBOARD_PATH} by default, '
+                             'list the best with python -m spaceinvaders.leaderboard PATH')
+    parser.add_argument('--no-leaderboard', dest='leaderboard', action='store_const', const=None,
+                        help='don\'t load or save scores, the high score only lasts as long as the game')
+    parser.add_argument('--hot-reload', action='store_true',
+                        help='apply edits to res/entity_info.json and the spritesheet while the game runs')
+    args = parser.parse_args(argv)
+    if args.threaded and args.dirty_rects:
+        parser.error('--dirty-rects can\'t be used with --threaded')
+    if args.threaded and args.hot_reload:
+        parser.error('--hot-reload can\'t be used with --threaded')
+    SpaceInvaders(dirty_rects=args.dirty_rects, seed=args.seed, record_path=args.record,
+                  profile=args.profile or args.profile_out is not None, profile_path=args.profile_out,
+                  audio=args.audio, profile_startup=args.profile_startup, speed=args.speed, threaded=args.threaded,
+                  framebuffer=args.framebuffer, capture_path=args.capture,
+                  leaderboard_path=args.leaderboard, hot_reload=args.hot_reload)
+
+
 if __name__ == '__main__':
-    game = SpaceInvaders()
+    main()
@@ -0,0 +1,44 @@
+from typing import Callable
+
+from spaceinvaders.sprites import SpaceInvadersSprite
+
+
+class SpritePool:
+    """Preallocated sprites for a single entity tag, re-armed with respawn() instead of rebuilt.
+
+    A pooled sprite returns itself to its pool when it is killed, so the rest of the game can keep
+    treating bullets and explosions as throwaway sprites."""
+
+    def __init__(self, factory: Callable[[], SpaceInvadersSprite], size=0, tag=None):
+        # factory builds a new sprite that isn't in any group yet
+        self.factory = factory
+        # entity tag every sprite from the pool is marked with
+        self.tag = tag
+        self.free = []
+        self.in_use = 0
+        self.high_water = 0
+        self.created = 0
+        for _ in range(size):
+            self.free.append(self._create())
+
+    def _create(self):
+        sprite = self.factory()
+        sprite.pool = self
+        sprite.entity_tag = self.tag
+        self.created += 1
+        return sprite
+
+    def acquire(self, groups, **respawn_kwargs):
+        sprite = self.free.pop() if self.free else self._create()
+        sprite.respawn(**respawn_kwargs)
+        sprite.add(*groups)
+        self.in_use += 1
+        self.high_water = max(self.high_water, self.in_use)
+        return sprite
+
+    def release(self, sprite):
+        self.free.append(sprite)
+        self.in_use -= 1
+
+    def stats(self):
+        return {'in_use': self.in_use, 'free': len(self.free), 'high_water': self.high_water, 'created': self.created}
@@ -0,0 +1,271 @@
+import csv
+import json
+import os
+import string
+import threading
+import time
+
+import numpy as np
+import pygame
+
+from spaceinvaders.text import GlyphAtlas
+
+
+class _NullStage:
+    # handed out while profiling is off, so an instrumented block costs one method call and nothing else
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+class _Stage:
+    def __init__(self, profiler, column):
+        self.profiler = profiler
+        self.column = column
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.profiler.record(self.column, self.start, time.perf_counter())
+        return False
+
+
+class FrameProfiler:
+    """Times the stages of each frame into a fixed-size ring buffer of the most recent frames.
+
+    Wrap a frame in begin_frame()/end_frame() and each stage within it in `with profiler.stage(name):`.
+    Stages can nest, and a stage that runs more than once in a frame adds up. While the profiler is
+    disabled, stage() hands back a shared do-nothing context manager and nothing is recorded.
+
+    Frames are recorded by one thread. A thread with frames of its own, like the simulation thread and
+    its ticks, gets a profiler of its own, named after it, and the traces are exported together."""
+
+    def __init__(self, capacity=600, max_stages=32, enabled=False, name='main', tid=0):
+        self.capacity = capacity
+        self.max_stages = max_stages
+        self.enabled = enabled
+        # the thread the frames are recorded on, for the trace
+        self.name = name
+        self.tid = tid
+        # times are in ms since the profiler was made, NaN where a frame or stage has nothing recorded
+        self.epoch = time.perf_counter()
+        self.frame_start = np.full(capacity, np.nan)
+        self.frame_ms = np.full(capacity, np.nan)
+        self.stage_start = np.full((capacity, max_stages), np.nan)
+        self.stage_ms = np.full((capacity, max_stages), np.nan)
+        # stage names, in the order they were first seen, are the buffer's columns
+        self.stage_names = []
+        self.stages = {}
+        # new stages can come from any thread, the overlay reads the names from the render thread
+        self.stages_lock = threading.Lock()
+        # slot is where the frame in progress goes, frames is how many have been recorded in total
+        self.slot = 0
+        self.frames = 0
+        self.frame_begin = None
+
+    def set_enabled(self, enabled: bool):
+        self.enabled = enabled
+        # a frame that was half recorded when we were switched on or off doesn't count
+        self.frame_begin = None
+
+    def stage(self, name):
+        if not self.enabled:
+            return _NULL_STAGE
+        stage = self.stages.get(name)
+        if stage is None:
+            with self.stages_lock:
+                stage = self.stages.get(name)
+                if stage is None:
+                    if len(self.stage_names) >= self.max_stages:
+                        raise ValueError(f'can\'t time more than {self.max_stages} stages, {name} is one too many')
+                    column = len(self.stage_names)
+                    self.stage_names.append(name)
+                    stage = self.stages[name] = _Stage(self, column)
+        return stage
+
+    def record(self, column, start, end):
+        slot = self.slot
+        if np.isnan(self.stage_ms[slot, column]):
+            self.stage_start[slot, column] = (start - self.epoch) * 1000
+            self.stage_ms[slot, column] = (end - start) * 1000
+        else:
+            self.stage_ms[slot, column] += (end - start) * 1000
+
+    def begin_frame(self):
+        if not self.enabled:
+            return
+        self.frame_begin = time.perf_counter()
+        slot = self.slot
+        self.frame_start[slot] = (self.frame_begin - self.epoch) * 1000
+        self.frame_ms[slot] = np.nan
+        self.stage_start[slot] = np.nan
+        self.stage_ms[slot] = np.nan
+
+    def end_frame(self):
+        if not self.enabled or self.frame_begin is None:
+            return
+        self.frame_ms[self.slot] = (time.perf_counter() - self.frame_begin) * 1000
+        self.slot = (self.slot + 1) % self.capacity
+        self.frames += 1
+        self.frame_begin = None
+
+    def recorded_slots(self):
+        # slots of the frames still in the buffer, oldest first
+        count = min(self.frames, self.capacity)
+        return (self.slot - count + np.arange(count)) % self.capacity
+
+    def frame_times_ms(self):
+        return self.frame_ms[self.recorded_slots()]
+
+    def percentiles(self, name=None, q=(50, 95, 99)):
+        """{q: ms} over the frames in the buffer, for a single stage if a name is given, otherwise for whole frames.
+        Frames a stage didn't run in are left out."""
+        slots = self.recorded_slots()
+        if name is None:
+            times = self.frame_ms[slots]
+        elif name in self.stages:
+            times = self.stage_ms[slots, self.stages[name].column]
+        else:
+            times = np.empty(0)
+        times = times[~np.isnan(times)]
+        if not len(times):
+            return {p: 0.0 for p in q}
+        return dict(zip(q, np.percentile(times, q).tolist()))
+
+    def export_csv(self, path):
+        # one row per frame, with a column for each stage
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['frame', 'start_ms', 'frame_ms'] + self.stage_names)
+            first_frame = self.frames - len(self.recorded_slots())
+            for i, slot in enumerate(self.recorded_slots()):
+                writer.writerow([first_frame + i] + [
+                    '' if np.isnan(value) else f'{value:.4f}' for value in
+                    [self.frame_start[slot], self.frame_ms[slot], *self.stage_ms[slot, :len(self.stage_names)]]])
+
+    def chrome_trace_events(self, epoch):
+        # this profiler's frames and stages as trace events, with times in µs since epoch
+        offset_us = (self.epoch - epoch) * 1e6
+        events = [{'name': 'thread_name', 'ph': 'M', 'pid': 0, 'tid': self.tid, 'args': {'name': self.name}}]
+        for slot in self.recorded_slots():
+            events.append({'name': 'frame', 'ph': 'X', 'pid': 0, 'tid': self.tid,
+                           'ts': offset_us + self.frame_start[slot] * 1000, 'dur': self.frame_ms[slot] * 1000})
+            for column, name in enumerate(self.stage_names):
+                if not np.isnan(self.stage_ms[slot, column]):
+                    events.append({'name': name, 'ph': 'X', 'pid': 0, 'tid': self.tid,
+                                   'ts': offset_us + self.stage_start[slot, column] * 1000,
+                                   'dur': self.stage_ms[slot, column] * 1000})
+        return events
+
+    def export_chrome_trace(self, path, others=()):
+        # load the file into chrome://tracing or https://ui.perfetto.dev, stages show up nested inside their
+        # frame, and the other profilers' threads show up under this one's
+        events = []
+        for profiler in (self, *others):
+            events += profiler.chrome_trace_events(self.epoch)
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+
+    def export(self, path, others=()):
+        # the extension picks the format, a CSV has no room for other threads, they get files of their own
+        # next to it, named after their thread
+        if path.endswith('.csv'):
+            self.export_csv(path)
+            root, extension = os.path.splitext(path)
+            for profiler in others:
+                profiler.export_csv(f'{root}.{profiler.name}{extension}')
+        else:
+            self.export_chrome_trace(path, others)
+
+
+class StartupProfiler:
+    """Wall time from launch to the first frame on screen, split into the steps in between.
+
+    mark(name) closes a step: it gets the time since the previous mark, or since launch for the first one."""
+
+    def __init__(self, launched=None):
+        self.launched = launched if launched is not None else time.perf_counter()
+        self.last_mark = self.launched
+        # [(name, ms), ...] in order
+        self.phases = []
+
+    def mark(self, name):
+        now = time.perf_counter()
+        self.phases.append((name, (now - self.last_mark) * 1000))
+        self.last_mark = now
+
+    def total_ms(self):
+        return (self.last_mark - self.launched) * 1000
+
+    def report(self):
+        total_ms = self.total_ms()
+        width = max((len(name) for name, _ in self.phases), default=0)
+        lines = [f'{name:<{width}}  {ms:8.1f} ms  {ms / total_ms if total_ms else 0:6.1%}' for name, ms in self.phases]
+        lines.append(f'{"total":<{width}}  {total_ms:8.1f} ms')
+        return '\n'.join(lines)
+
+
+class ProfilerOverlay:
+    """Frame time percentiles, the slowest stages and a graph of recent frame times, drawn over the game.
+
+    The numbers only change a few times a second, so their text comes out of the glyph atlas memo most frames."""
+
+    def __init__(self, profiler: FrameProfiler, font: pygame.font.Font, color, over_budget_color, budget_line_color,
+                 size, budget_ms=1000 / 60, refresh_ms=250, stages_shown=3):
+        self.profiler = profiler
+        self.text = GlyphAtlas(font, False, color, charset=string.digits + string.ascii_letters + ' ._-', memo_size=64)
+        self.color = color
+        # bars of frames that went over budget, and the line across the graph at the budget
+        self.over_budget_color = over_budget_color
+        self.budget_line_color = budget_line_color
+        self.budget_ms = budget_ms
+        self.refresh_ms = refresh_ms
+        self.stages_shown = stages_shown
+        self.lines = []
+        self.ms_since_refresh = refresh_ms
+
+        line_height = self.text.height + 1
+        self.graph_height = 24
+        self.panel = pygame.Surface((size[0], line_height * (stages_shown + 1) + self.graph_height + 2), pygame.SRCALPHA)
+        self.line_height = line_height
+
+    def refresh(self):
+        frame = self.profiler.percentiles()
+        self.lines = [f'p50 {frame[50]:.1f} p95 {frame[95]:.1f} p99 {frame[99]:.1f}']
+        # the stages that are slowest at p95 are the likeliest source of a stutter
+        stages = sorted(((self.profiler.percentiles(name, (95,))[95], name) for name in self.profiler.stage_names),
+                        reverse=True)
+        self.lines += [f'{name[:20]} {p95:.2f}' for p95, name in stages[:self.stages_shown]]
+
+    def draw(self, surface, dt_ms):
+        self.ms_since_refresh += dt_ms
+        if self.ms_since_refresh >= self.refresh_ms:
+            self.ms_since_refresh = 0
+            self.refresh()
+
+        panel = self.panel
+        panel.fill((0, 0, 0, 192))
+        for i, line in enumerate(self.lines):
+            panel.blit(self.text.render(line), (1, 1 + i * self.line_height))
+
+        # one bar per frame, newest on the right, full height is twice the frame budget
+        graph_bottom = panel.get_height() - 1
+        scale = self.graph_height / (2 * self.budget_ms)
+        times = self.profiler.frame_times_ms()[-panel.get_width():]
+        x_offset = panel.get_width() - len(times)
+        for x, frame_ms in enumerate(times):
+            height = min(self.graph_height, int(frame_ms * scale) + 1)
+            color = self.color if frame_ms <= self.budget_ms else self.over_budget_color
+            panel.fill(color, (x_offset + x, graph_bottom - height, 1, height))
+        budget_y = graph_bottom - int(self.budget_ms * scale)
+        pygame.draw.line(panel, self.budget_line_color, (0, budget_y), (panel.get_width() - 1, budget_y))
+
+        return [surface.blit(panel, (0, 0))]
@@ -0,0 +1,185 @@
+import numpy as np
+
+from spaceinvaders.helpers import Direction
+from spaceinvaders.sprites import frame_mask_store
+
+DIRECTION_VECTORS = {
+    Direction.UP: (0, -1),
+    Direction.DOWN: (0, 1),
+    Direction.LEFT: (-1, 0),
+    Direction.RIGHT: (1, 0),
+}
+# animation frames a bullet can have, frame numbers are stored as int16
+MAX_FRAMES = np.iinfo(np.int16).max
+
+
+class ProjectileManager:
+    """Every bullet in play, stored as one array per field instead of one object per bullet.
+
+    Bullets are sprites as far as the rest of the game is concerned, but only as views: add() gives a
+    bullet a slot, update() moves, animates and culls every slot in a few array operations, and
+    sync_views() copies the result onto the sprites. A bullet frees its slot when it's killed.
+
+    kinds are whatever the caller wants to tell bullets apart by, each slot stores the index of its
+    kind. The box and hitbox arrays hold every slot's rect as left, top, right, bottom, rounded the way
+    the sprite rects are. max_frames is only where the per-frame arrays start, they grow to fit the first
+    bullet with more frames than that."""
+
+    def __init__(self, kinds, screen_height, capacity=64, max_frames=4):
+        self.kinds = tuple(kinds)
+        self.screen_height = screen_height
+        self.max_frames = max_frames
+        self.capacity = 0
+        self.views = []
+        self.free = []
+        self._allocate(capacity)
+        self.views_dirty = False
+        # live slots, overall and by kind, worked out again only after a bullet comes or goes
+        self._live = {}
+
+    def _allocate(self, capacity):
+        # grows every array to capacity slots, keeping whatever is in the old ones
+        # name: (shape of one slot, dtype, value of an empty slot)
+        fields = {
+            'pos': ((2,), np.float64, 0),
+            'vel': ((2,), np.float64, 0),
+            'kind': ((), np.int8, 0),
+            # rect size and, per animation frame, the opaque part of the frame as left, top, right, bottom
+            'size': ((2,), np.int32, 0),
+            'bounds': ((self.max_frames, 4), np.int32, 0),
+            # the rect and the rect shrunk down to the opaque pixels of the current frame, as left, top,
+            # right, bottom, kept up to date by update() so collisions can read them as they are
+            'box': ((4,), np.int32, 0),
+            'hitbox': ((4,), np.int32, 0),
+            # the opaque part of the current frame, the one out of bounds the hitbox is made from
+            'hitbox_offset': ((4,), np.int32, 0),
+            'frame': ((), np.int16, 0),
+            'frame_count': ((), np.int16, 1),
+            # infinite for bullets that don't animate, so they're never due for a new frame
+            'animation_interval_ms': ((), np.float64, np.inf),
+            'elapsed_since_animation_ms': ((), np.float64, 0),
+            # the frame the view is showing, so sync_views() only swaps the images that changed
+            'view_frame': ((), np.int16, 0),
+            'alive': ((), bool, False),
+        }
+        old = self.capacity
+        for name, (shape, dtype, fill) in fields.items():
+            array = np.full((capacity, *shape), fill, dtype=dtype)
+            if old:
+                array[:old] = getattr(self, name)
+            setattr(self, name, array)
+        self.slots = np.arange(capacity)
+        self.views += [None] * (capacity - old)
+        # lowest slots get handed out first
+        self.free = list(range(capacity - 1, old - 1, -1)) + self.free
+        self.capacity = capacity
+
+    def _grow_frames(self, max_frames):
+        # room for every slot to hold the bounds of max_frames frames, keeping the ones already there
+        bounds = np.zeros((self.capacity, max_frames, 4), dtype=np.int32)
+        bounds[:, :self.max_frames] = self.bounds
+        self.bounds = bounds
+        self.max_frames = max_frames
+
+    def add(self, sprite, kind, animation_interval_ms=0):
+        # give a freshly spawned bullet a slot, from here on the manager moves it
+        if len(sprite.images) > self.max_frames:
+            self._grow_frames(len(sprite.images))
+        if not self.free:
+            self._allocate(self.capacity * 2)
+        slot = self.free.pop()
+        self.pos[slot] = sprite.pos.x, sprite.pos.y
+        dx, dy = DIRECTION_VECTORS[sprite.direction] if sprite.should_move else (0, 0)
+        self.vel[slot] = dx * sprite.speed, dy * sprite.speed
+        self.kind[slot] = self.kinds.index(kind)
+        self.size[slot] = sprite.rect.size
+        for frame, image in enumerate(sprite.images):
+            left, top, width, height = frame_mask_store.get_bounds(image)
+            self.bounds[slot, frame] = left, top, left + width, top + height
+        self.frame[slot] = self.view_frame[slot] = sprite.image_frame
+        self.frame_count[slot] = len(sprite.images)
+        self.animation_interval_ms[slot] = animation_interval_ms or np.inf
+        self.elapsed_since_animation_ms[slot] = 0
+        self.alive[slot] = True
+        self.views[slot] = sprite
+        # the sprite was just put where it starts, so its rect is already right
+        left, top = sprite.rect.topleft
+        self.box[slot] = left, top, sprite.rect.right, sprite.rect.bottom
+        self.hitbox_offset[slot] = self.bounds[slot, sprite.image_frame]
+        self.hitbox[slot] = self.hitbox_offset[slot] + (left, top, left, top)
+        self._live.clear()
+        sprite.projectiles = self
+        sprite.slot = slot
+        return slot
+
+    def remove(self, sprite):
+        slot = sprite.slot
+        if slot < 0 or self.views[slot] is not sprite:
+            return
+        self.alive[slot] = False
+        self.vel[slot] = 0
+        self.views[slot] = None
+        self.free.append(slot)
+        self._live.clear()
+        sprite.projectiles = None
+        sprite.slot = -1
+
+    def live(self, kind=None):
+        # slots in use, in slot order, only those of one kind if it's given
+        slots = self._live.get(kind)
+        if slots is None:
+            if kind is None:
+                slots = np.flatnonzero(self.alive)
+            else:
+                slots = np.flatnonzero(self.alive & (self.kind == self.kinds.index(kind)))
+            self._live[kind] = slots
+        return slots
+
+    def __len__(self):
+        return self.capacity - len(self.free)
+
+    def update(self, dt_ms):
+        if not len(self):
+            return
+        # free slots go along for the ride, it's cheaper than picking out the live ones, they stand still
+        # and whatever is in them gets overwritten when they're handed out again
+        self.pos += self.vel * (dt_ms / 1000)
+
+        # animated bullets step a frame once their interval has gone by, the frame after that they start counting again
+        due = self.elapsed_since_animation_ms >= self.animation_interval_ms
+        if due.any():
+            self.frame[due] = (self.frame[due] + 1) % self.frame_count[due]
+            self.hitbox_offset[due] = self.bounds[self.slots[due], self.frame[due]]
+            self.elapsed_since_animation_ms[due] = -dt_ms
+        self.elapsed_since_animation_ms += dt_ms
+
+        # rects get rounded and centered the same way the sprites' are
+        topleft = np.rint(self.pos).astype(np.int32) - self.size // 2
+        box = self.box
+        box[:, :2] = topleft
+        box[:, 2:] = topleft + self.size
+        self.hitbox = self.hitbox_offset + np.concatenate([topleft, topleft], axis=1)
+        self.views_dirty = True
+
+        # anything that's left the screen entirely is gone
+        for slot in np.flatnonzero(self.alive & ((box[:, 3] < 0) | (box[:, 1] > self.screen_height))).tolist():
+            self.views[slot].kill()
+
+    def sync_views(self):
+        # copy the slot state onto the bullet sprites, only needed after an update
+        if not self.views_dirty:
+            return
+        slots = self.live()
+        box = self.box[slots]
+        changed_frame = self.frame[slots] != self.view_frame[slots]
+        views = self.views
+        for slot, left, top, frame_changed in zip(slots.tolist(), box[:, 0].tolist(), box[:, 1].tolist(),
+                                                  changed_frame.tolist()):
+            sprite = views[slot]
+            # where it was before this update, for drawing in between ticks
+            sprite.prev_center = sprite.rect.center
+            sprite.rect.topleft = left, top
+            if frame_changed:
+                sprite.set_frame(int(self.frame[slot]))
+        self.view_frame[slots] = self.frame[slots]
+        self.views_dirty = False
@@ -0,0 +1,83 @@
+import pygame
+
+
+class DirtyRectRenderer:
+    """Draws a frame by touching only the parts of the screen that changed since the last one.
+
+    Everything that rarely changes (walls, barriers, the spare ships and the HUD) is composited into
+    a background layer that is only rebuilt when one of those things changes. Each frame, the moving
+    sprites are erased by copying the background back over where they were, then drawn again where
+    they are now. render() returns the rects that need to be pushed to the display."""
+
+    def __init__(self, game, bg_color):
+        self.game = game
+        self.bg_color = bg_color
+        self.screen = game.screen
+        self.background = pygame.Surface(self.screen.get_size())
+        # what each static sprite looked like and where it was when the background was last built
+        self.static_state = None
+        self.hud_state = None
+        # where we drew moving things last frame, those need erasing this frame
+        self.previous_rects = []
+
+    def static_groups(self):
+        return self.game.wall_sprites, self.game.barrier_sprites, self.game.extra_player_sprites
+
+    def _static_state(self):
+        # barriers get eroded in place, their image_version is how we tell
+        return {sprite: (sprite.image, getattr(sprite, 'image_version', 0), tuple(sprite.rect))
+                for group in self.static_groups() for sprite in group}
+
+    def _hud_state(self):
+        return self.game.score_value_surface, self.game.high_score_value_surface, self.game.count_lives()
+
+    def rebuild_background(self):
+        self.background.fill(self.bg_color)
+        for group in self.static_groups():
+            group.draw(self.background)
+        # hand back the HUD rects, those are the parts of the background that change most often
+        return (self.game.draw_score(self.background) + self.game.draw_high_score(self.background) +
+                self.game.draw_extra_life_counter(self.background))
+
+    def render(self, overlay=None):
+        # overlay(surface) draws on top of everything and returns the rects it drew
+        dirty_rects = self.previous_rects
+
+        static_state = self._static_state()
+        hud_state = self._hud_state()
+        if self.static_state is None:
+            # very first frame, everything is new
+            self.rebuild_background()
+            self.screen.blit(self.background, (0, 0))
+            dirty_rects = [self.screen.get_rect()]
+        elif static_state != self.static_state or hud_state != self.hud_state:
+            dirty_rects = list(dirty_rects)
+            # anything that moved, changed or disappeared needs redrawing where it was and where it is now
+            for sprite in static_state.keys() ^ self.static_state.keys():
+                dirty_rects.append(pygame.Rect((static_state.get(sprite) or self.static_state.get(sprite))[-1]))
+            for sprite in static_state.keys() & self.static_state.keys():
+                if static_state[sprite] != self.static_state[sprite]:
+                    dirty_rects.append(pygame.Rect(self.static_state[sprite][-1]))
+                    dirty_rects.append(sprite.rect.copy())
+            # the HUD text is small, so just redraw all of it when any of it changes
+            dirty_rects.extend(self.rebuild_background())
+        self.static_state = static_state
+        self.hud_state = hud_state
+
+        # erase last frame's moving things, and anything static that changed
+        for rect in dirty_rects:
+            self.screen.blit(self.background, rect, rect)
+
+        # draw the moving things
+        static_sprites = static_state.keys()
+        drawn_rects = [self.screen.blit(sprite.image, sprite.rect)
+                       for sprite in self.game.all_sprites if sprite not in static_sprites]
+
+        # show the GAME OVER text on top of everything
+        if self.game.game_is_over:
+            drawn_rects.extend(self.game.draw_game_over())
+        if overlay is not None:
+            drawn_rects.extend(overlay(self.screen))
+
+        self.previous_rects = drawn_rects
+        return dirty_rects + drawn_rects
@@ -0,0 +1,119 @@
+"""Record a game's input to a compact binary log, and play it back as fast as the simulation allows.
+
+A recording holds the seed and config the game started with, then one (dt_ms, actions) entry per frame.
+The game is deterministic given those, so playing the entries back through step() must end in the same
+score and the same final state, which the footer records. Replay from the repository root:
+
+    PYTHONPATH=src python -m spaceinvaders.replay session.sir
+"""
+import argparse
+import json
+import os
+import struct
+import sys
+import zlib
+
+# keep the banner out of replay output
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+from spaceinvaders.helpers import Action
+
+MAGIC = b'SIRP'
+VERSION = 1
+# magic, version, seed, length of the config JSON
+HEADER = struct.Struct('<4sHqI')
+# the seeds a header has room for
+MIN_SEED, MAX_SEED = -2 ** 63, 2 ** 63 - 1
+# dt_ms, actions
+FRAME = struct.Struct('<HB')
+# frame count, final score, sha256 of the final state
+FOOTER = struct.Struct('<IQ32s')
+
+
+class InputRecorder:
+    """Collects every frame's input in memory, nothing touches the disk until save()."""
+
+    def __init__(self, seed, config=None):
+        # checked now rather than when the recording is saved at the end of the session
+        if not MIN_SEED <= seed <= MAX_SEED:
+            raise ValueError(f'seed {seed} can\'t be recorded, recorded seeds go from {MIN_SEED} to {MAX_SEED}')
+        self.seed = seed
+        self.config = config or {}
+        self.frames = bytearray()
+        self.frame_count = 0
+
+    def record(self, dt_ms, actions: Action):
+        self.frames += FRAME.pack(dt_ms, actions.value)
+        self.frame_count += 1
+
+    def save(self, path, final_score, final_digest: bytes):
+        config = json.dumps(self.config, sort_keys=True).encode()
+        with open(path + '.tmp', 'wb') as f:
+            f.write(HEADER.pack(MAGIC, VERSION, self.seed, len(config)))
+            f.write(config)
+            # long stretches of the same input compress very well
+            f.write(zlib.compress(bytes(self.frames), 9))
+            f.write(FOOTER.pack(self.frame_count, final_score, final_digest))
+        os.replace(path + '.tmp', path)
+
+
+class Recording:
+    def __init__(self, seed, config, frames, final_score, final_digest):
+        self.seed = seed
+        self.config = config
+        # [(dt_ms, Action), ...]
+        self.frames = frames
+        self.final_score = final_score
+        self.final_digest = final_digest
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            data = f.read()
+        magic, version, seed, config_length = HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError(f'{path} is not a recording')
+        if version != VERSION:
+            raise ValueError(f'{path} is recording version {version}, only version {VERSION} can be played back')
+        offset = HEADER.size
+        config = json.loads(data[offset:offset + config_length])
+        offset += config_length
+        frame_count, final_score, final_digest = FOOTER.unpack_from(data, len(data) - FOOTER.size)
+        frames = zlib.decompress(data[offset:len(data) - FOOTER.size])
+        if len(frames) != frame_count * FRAME.size:
+            raise ValueError(f'{path} should have {frame_count} frames, but it has {len(frames) // FRAME.size}')
+        return cls(seed, config, [(dt_ms, Action(actions)) for dt_ms, actions in FRAME.iter_unpack(frames)],
+                   final_score, final_digest)
+
+
+def replay(path):
+    """Plays a recording back headless and reports whether it ended where the recorded game did."""
+    # imported here so the recording format can be read without pulling in the whole game
+    from spaceinvaders.main import SpaceInvaders
+
+    recording = Recording.load(path)
+    game = SpaceInvaders(headless=True, seed=recording.seed, config=recording.config)
+    for dt_ms, actions in recording.frames:
+        game.step(actions, dt_ms)
+    digest = game.state_digest()
+    return {
+        'frames': len(recording.frames),
+        'score': game.score_player,
+        'recorded_score': recording.final_score,
+        'digest': digest.hex(),
+        'recorded_digest': recording.final_digest.hex(),
+        'matches': game.score_player == recording.final_score and digest == recording.final_digest,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Play back a recorded Space Invaders game and check it.')
+    parser.add_argument('path', help='recording made with --record')
+    args = parser.parse_args(argv)
+    result = replay(args.path)
+    print(json.dumps(result, indent=2))
+    return 0 if result['matches'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
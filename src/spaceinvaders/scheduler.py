@@ -0,0 +1,57 @@
+import time
+from typing import Callable
+
+
+class UpdatePhase:
+    def __init__(self, name, update: Callable, interval_ms=0):
+        self.name = name
+        # update(dt_ms, ms_elapsed_since_start)
+        self.update = update
+        # 0 ticks the phase every frame, anything else ticks it at most once per interval with the time
+        # that has built up since its last tick
+        self.interval_ms = interval_ms
+        self.accumulated_ms = 0
+        self.paused = False
+        # how long the phase's last tick took
+        self.last_duration_ms = 0.0
+
+
+class UpdateScheduler:
+    """Runs the game's updates as named phases, in the order they were added.
+
+    Each phase knows exactly what it updates, so sprites with nothing to do every frame are never
+    visited. A phase can be paused as a whole, or ticked at its own rate."""
+
+    def __init__(self):
+        self.phases = {}
+
+    def add_phase(self, name, update: Callable, interval_ms=0):
+        self.phases[name] = UpdatePhase(name, update, interval_ms)
+
+    def set_paused(self, name, paused: bool):
+        phase = self.phases[name]
+        if paused and not phase.paused:
+            # time spent paused doesn't count toward the next tick
+            phase.accumulated_ms = 0
+        phase.paused = paused
+
+    def set_interval(self, name, interval_ms):
+        self.phases[name].interval_ms = interval_ms
+
+    def tick(self, dt_ms, ms_elapsed_since_start):
+        for phase in self.phases.values():
+            if phase.paused:
+                continue
+            if phase.interval_ms:
+                phase.accumulated_ms += dt_ms
+                if phase.accumulated_ms < phase.interval_ms:
+                    continue
+                phase_dt_ms, phase.accumulated_ms = phase.accumulated_ms, 0
+            else:
+                phase_dt_ms = dt_ms
+            start = time.perf_counter()
+            phase.update(phase_dt_ms, ms_elapsed_since_start)
+            phase.last_duration_ms = (time.perf_counter() - start) * 1000
+
+    def phase_times_ms(self):
+        return {name: phase.last_duration_ms for name, phase in self.phases.items()}
@@ -0,0 +1,101 @@
+import threading
+import time
+from typing import NamedTuple
+
+from spaceinvaders.helpers import Action
+from spaceinvaders.profiling import FrameProfiler
+
+
+class Snapshot(NamedTuple):
+    """Everything needed to draw one tick of the game. Nothing in it changes once it's been published."""
+    tick: int
+    # perf_counter() time it was published, for working out how far into the next tick a frame is
+    published_at: float
+    # (image, (x, y), (prev_x, prev_y)) for every sprite in draw order, prev is the top left a tick ago
+    sprites: tuple
+    # (surface, (x, y)) for the score, high score and lives
+    hud: tuple
+    game_over: bool
+
+
+class SnapshotBuffer:
+    """Hands snapshots from the simulation thread to the render thread without either one waiting.
+
+    There are two slots: the writer fills the one the reader isn't looking at, then flips which slot is
+    the front. Both are single reference assignments, and snapshots are immutable, so a reader that's
+    still drawing the old front is never disturbed by the write."""
+
+    def __init__(self):
+        self.slots = [None, None]
+        self.front = 0
+
+    def publish(self, snapshot: Snapshot):
+        back = 1 - self.front
+        self.slots[back] = snapshot
+        self.front = back
+
+    def latest(self) -> Snapshot:
+        return self.slots[self.front]
+
+
+class SimulationThread(threading.Thread):
+    """Steps the game at a fixed rate on a thread of its own and publishes a snapshot after every tick.
+
+    The render thread hands over input with set_input() and draws whatever latest() gives back. The game
+    is only ever touched from this thread while it runs. A NEW_GAME in the input applies to a single tick,
+    however many ticks go by before the next set_input(). If the simulation falls more than max_ticks_behind
+    ticks behind, say while the machine is busy, it drops the backlog rather than racing to catch up.
+    Every tick is a frame of profiler, if one is given."""
+
+    def __init__(self, game, tick_ms, profiler=None, max_ticks_behind=5):
+        super().__init__(name='simulation', daemon=True)
+        self.game = game
+        self.tick_ms = tick_ms
+        # a disabled profiler costs a method call per tick
+        self.profiler = profiler if profiler is not None else FrameProfiler()
+        self.max_ticks_behind = max_ticks_behind
+        self.snapshots = SnapshotBuffer()
+        # (input number, actions), replaced as a whole so the simulation never sees half an update
+        self.input = (0, Action.NONE)
+        self.last_input = 0
+        self.stopping = False
+        # anything the simulation raised, for the render thread to raise again
+        self.error = None
+
+    def set_input(self, actions: Action):
+        self.input = (self.input[0] + 1, actions)
+
+    def latest(self) -> Snapshot:
+        return self.snapshots.latest()
+
+    def stop(self):
+        self.stopping = True
+
+    def run(self):
+        game = self.game
+        next_tick = time.perf_counter()
+        try:
+            self.snapshots.publish(game.snapshot())
+            while not self.stopping and game.running:
+                now = time.perf_counter()
+                if now < next_tick:
+                    time.sleep(next_tick - now)
+                    continue
+                input_number, actions = self.input
+                if input_number == self.last_input:
+                    # already pressed on an earlier tick
+                    actions &= ~Action.NEW_GAME
+                self.last_input = input_number
+                self.profiler.begin_frame()
+                game.step(actions, self.tick_ms)
+                with self.profiler.stage('snapshot'):
+                    self.snapshots.publish(game.snapshot())
+                self.profiler.end_frame()
+
+                # fast-forward shortens the real time between ticks
+                interval = self.tick_ms / 1000 / game.timestep.speed
+                next_tick += interval
+                if now - next_tick > self.max_ticks_behind * interval:
+                    next_tick = now
+        except Exception as error:
+            self.error = error
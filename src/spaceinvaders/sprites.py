@@ -1,24 +1,35 @@
 import json
+import weakref
+from collections import OrderedDict
 from typing import List
 
+import numpy as np
 import pygame
 from pygame import Vector2
 
 from spaceinvaders.helpers import Direction
 
 
+def convert_alpha(image):
+    # converting needs a display mode, headless games keep the surface in its loaded format
+    if pygame.display.get_surface() is None:
+        return image
+    return image.convert_alpha()
+
+
 class SpriteSheet:
     def __init__(self, spritesheet_filename, spritemap_filename):
         # Load the spritesheet image
         try:
-            self.sheet = pygame.image.load(spritesheet_filename).convert_alpha()  # Use convert_alpha() for transparency
+            self.sheet = convert_alpha(pygame.image.load(spritesheet_filename))  # Use convert_alpha() for transparency
         except pygame.error as e:
             print(f"Unable to load spritesheet image: {spritesheet_filename}")
             raise e
 
         # Load the spritemap JSON
         try:
-            self.map = json.load(open(spritemap_filename))
+            with open(spritemap_filename) as f:
+                self.map = json.load(f)
         except json.decoder.JSONDecodeError as e:
             print(f"Unable to load spritemap: {spritemap_filename}")
             raise e
@@ -38,7 +49,7 @@ class SpriteSheet:
         
         Extract a single image from the sheet."""
         # Create a new blank surface for the individual sprite
-        image = pygame.Surface([width, height], pygame.SRCALPHA).convert_alpha()
+        image = convert_alpha(pygame.Surface([width, height], pygame.SRCALPHA))
         image.set_colorkey((0, 0, 0))
         # Copy the desired portion of the large sheet onto the new surface
         image.blit(self.sheet, (0, 0), (x, y, width, height))
@@ -56,8 +67,90 @@ def colorize_surface(image, new_color):
     return image
 
 
+class ColorizedFrameCache:
+    """Process-wide LRU cache of colorized frames, keyed by (source frame, color).
+
+    Every sprite drawn with the same frame and color gets the same surface back, so the surfaces
+    must be treated as read-only. Copy one before drawing onto it."""
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self.frames = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, image, color):
+        key = (image, tuple(color))
+        frame = self.frames.get(key)
+        if frame is None:
+            self.misses += 1
+            frame = colorize_surface(image, tuple(color))
+            self.put(image, color, frame)
+        else:
+            self.hits += 1
+            self.frames.move_to_end(key)
+        return frame
+
+    def put(self, image, color, frame):
+        # for frames that were colorized ahead of time, like the ones in the asset bundle
+        self.frames[(image, tuple(color))] = frame
+        # drop the least recently used frame once we're over the bound
+        if len(self.frames) > self.maxsize:
+            self.frames.popitem(last=False)
+
+    def clear(self):
+        self.frames.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self.frames), 'maxsize': self.maxsize}
+
+
+colorized_frame_cache = ColorizedFrameCache()
+
+
+class FrameMaskStore:
+    """Collision masks built once per frame and shared by every sprite showing that frame.
+
+    The bounding rect of each mask's set pixels is kept next to it, so broad-phase checks can skip
+    a frame's transparent border. Entries go away together with their frame."""
+
+    def __init__(self):
+        self.masks = weakref.WeakKeyDictionary()
+        self.bounds = weakref.WeakKeyDictionary()
+
+    def _build(self, image):
+        return self.put(image, pygame.mask.from_surface(image))
+
+    def put(self, image, mask):
+        self.masks[image] = mask
+        bounding_rects = mask.get_bounding_rects()
+        self.bounds[image] = bounding_rects[0].unionall(bounding_rects[1:]) if bounding_rects else pygame.Rect(0, 0, 0, 0)
+        return mask
+
+    def get(self, image):
+        mask = self.masks.get(image)
+        if mask is None:
+            mask = self._build(image)
+        return mask
+
+    def get_bounds(self, image):
+        if image not in self.bounds:
+            self._build(image)
+        return self.bounds[image]
+
+    def preload(self, images):
+        for image in images:
+            self.get(image)
+
+
+frame_mask_store = FrameMaskStore()
+
+
 def colorize_surfaces(images, new_color):
-    images_edited = [colorize_surface(image, new_color) for image in images]
+    # shared frames from the cache, nothing is copied if these frames have been colorized before
+    images_edited = [colorized_frame_cache.get(image, new_color) for image in images]
     return images_edited
 
 
@@ -67,6 +160,8 @@ class SpaceInvadersSprite(pygame.sprite.Sprite):
         # we were given an array of images for animation
         # if this Sprite has no animation, the array has a single image
         self.images = images
+        # keep the uncolored frames around for recoloring later
+        self.source_images = images
 
         self.initial_color = color
 
@@ -82,14 +177,17 @@ class SpaceInvadersSprite(pygame.sprite.Sprite):
         self.animation_interval_ms: int
         self.elapsed_since_animation_ms: int
 
-        # set mask for collision
-        self.mask = pygame.mask.from_surface(self.image)
+        # set masks for collision, one per frame and shared with every other sprite showing the same frames
+        self.masks = [frame_mask_store.get(image) for image in self.images]
+        self.mask = self.masks[self.image_frame]
 
         # set rect to image
         self.rect = self.image.get_rect()
 
         # initial rect positioning
         self.rect.center = (x_pos, y_pos)
+        # where the sprite was before the last tick moved it, for drawing in between ticks
+        self.prev_center = self.rect.center
 
         # initialize pos field
         self.pos = Vector2(x_pos, y_pos)
@@ -108,6 +206,44 @@ class SpaceInvadersSprite(pygame.sprite.Sprite):
         # velocity is an internal field used to compute distance traveled each frame if should_move=True
         self.vel = Vector2(0, 0)
 
+        # set by SpritePool for sprites that are reused instead of thrown away
+        self.pool = None
+        # the entity_info entry the sprite was built from, set by whoever builds it, so a reload can find it
+        self.entity_tag = None
+
+    def respawn(self, color: tuple, speed: int, x_pos, y_pos):
+        # re-arm a pooled sprite as if it had just been constructed
+        images = colorize_surfaces(self.source_images, color)
+        if images[0] is not self.images[0]:
+            self.masks = [frame_mask_store.get(image) for image in images]
+        self.images = images
+        self.initial_color = color
+        self.speed = speed
+        self.image_frame = 0
+        self.image = self.images[self.image_frame]
+        self.mask = self.masks[self.image_frame]
+        self.set_position((x_pos, y_pos))
+
+    def reskin(self, images: List[pygame.Surface], color: tuple, speed: int):
+        # swap in reloaded frames, color and speed without moving the sprite or restarting its animation
+        self.source_images = images
+        self.images = colorize_surfaces(images, color)
+        self.masks = [frame_mask_store.get(image) for image in self.images]
+        self.initial_color = color
+        self.speed = speed
+        self.set_frame(self.image_frame % len(self.images))
+        # the new frames might not be the same size as the old ones
+        self.rect.size = self.image.get_size()
+        self.rect.center = round(self.pos.x), round(self.pos.y)
+        self.prev_center = self.rect.center
+
+    def kill(self):
+        # pooled sprites go back to their pool once they leave the game
+        was_alive = self.alive()
+        super().kill()
+        if self.pool is not None and was_alive:
+            self.pool.release(self)
+
     def start_moving(self, direction: Direction):
         self.should_move = True
         self.direction = direction
@@ -129,15 +265,28 @@ class SpaceInvadersSprite(pygame.sprite.Sprite):
             case Direction.RIGHT:
                 return self.rect.right >= screen.get_width()
 
-    def animate(self):
-        self.image_frame = (self.image_frame + 1) % len(self.images)
+    @property
+    def hitbox(self):
+        # the rect shrunk down to the opaque pixels of the current frame
+        return frame_mask_store.get_bounds(self.image).move(self.rect.topleft)
+
+    def set_frame(self, image_frame):
+        # the mask always changes together with the image
+        self.image_frame = image_frame
         self.image = self.images[self.image_frame]
+        self.mask = self.masks[self.image_frame]
+
+    def animate(self):
+        self.set_frame((self.image_frame + 1) % len(self.images))
         
     def set_position(self, pos):
         self.pos.x, self.pos.y = pos
         self.rect.center = round(self.pos.x), round(self.pos.y)
+        # a jump, not a move, so there's nothing to draw in between
+        self.prev_center = self.rect.center
 
     def update(self, dt_ms, ms_elapsed_since_start):
+        self.prev_center = self.rect.center
         # update velocity to equal speed depending on direction of movement
         for direction, axis, sign in zip((Direction.LEFT, Direction.RIGHT, Direction.UP, Direction.DOWN),
                                          ('x', 'x', 'y', 'y'),
@@ -155,17 +304,94 @@ class SpaceInvadersSprite(pygame.sprite.Sprite):
             self.rect.center = round(self.pos.x), round(self.pos.y)
 
 
+def mask_stencil(mask: pygame.mask.Mask):
+    # the mask's set bits as a boolean array, indexed [x, y], the same way surfarray indexes pixels
+    width, height = mask.get_size()
+    return np.array([[mask.get_at((x, y)) for y in range(height)] for x in range(width)], dtype=bool)
+
+
+class Crater:
+    """A shape punched out of a barrier, as a mask for the collision side and a boolean stencil for the pixels."""
+
+    def __init__(self, mask: pygame.mask.Mask):
+        self.mask = mask
+        self.size = mask.get_size()
+        self.stencil = mask_stencil(mask)
+
+
 class BarrierSprite(SpaceInvadersSprite):
+    """A barrier that gets chipped away a crater at a time.
+
+    Each barrier owns a copy of its frame and of its collision mask, made once when it's built. A hit
+    erases a crater from both in place, the mask with Mask.erase and the pixels by clearing their alpha
+    through surfarray, so a hit never copies or recolors a surface."""
+
     def __init__(self, images: List[pygame.Surface], color: tuple, speed: int, x_pos, y_pos, groups):
         super().__init__(images, color, speed, x_pos, y_pos, groups)
-        self.barrier_health = 10
         self.color = self.initial_color
-
-    def reduce_health(self, num):
-        self.barrier_health -= num
-        self.color = tuple([(c / 10) * self.barrier_health for c in self.initial_color])
-        self.image = colorize_surface(self.image, self.color)
-        if self.barrier_health <= 0:
+        # the shared frame and mask from the caches must stay untouched
+        self.image = self.image.copy()
+        self.images = [self.image]
+        self.mask = self.mask.copy()
+        self.masks = [self.mask]
+        self._update_bounds()
+        # bumped whenever the pixels change, so anything caching our image knows to look again
+        self.image_version = 0
+        self._frozen_image = None
+        self._frozen_version = None
+
+    def frozen_image(self):
+        # a copy of the image as it is now, safe to hand to another thread while we keep eroding, only
+        # copied again once the barrier has been hit
+        if self._frozen_version != self.image_version:
+            self._frozen_image = self.image.copy()
+            self._frozen_version = self.image_version
+        return self._frozen_image
+
+    def reskin(self, images: List[pygame.Surface], color: tuple, speed: int):
+        # the new frame, with whatever bullets have already knocked out of the old one still missing
+        eroded = self.mask
+        super().reskin(images, color, speed)
+        self.color = self.initial_color
+        self.image = self.image.copy()
+        self.images = [self.image]
+        self.mask = self.mask.copy()
+        if self.mask.get_size() == eroded.get_size():
+            self.mask = self.mask.overlap_mask(eroded, (0, 0))
+            alpha = pygame.surfarray.pixels_alpha(self.image)
+            alpha[~mask_stencil(self.mask)] = 0
+            del alpha
+        self.masks = [self.mask]
+        self.image_version += 1
+        self._update_bounds()
+
+    def _update_bounds(self):
+        bounding_rects = self.mask.get_bounding_rects()
+        self.bounds = bounding_rects[0].unionall(bounding_rects[1:]) if bounding_rects else pygame.Rect(0, 0, 0, 0)
+
+    @property
+    def hitbox(self):
+        return self.bounds.move(self.rect.topleft)
+
+    def erode(self, hits):
+        """Apply every hit the barrier took this frame at once.
+
+        hits is [(crater, (x, y)), ...], with x, y where the crater's center goes relative to the barrier's top left."""
+        width, height = self.image.get_size()
+        alpha = pygame.surfarray.pixels_alpha(self.image)
+        for crater, (x, y) in hits:
+            crater_width, crater_height = crater.size
+            left, top = x - crater_width // 2, y - crater_height // 2
+            self.mask.erase(crater.mask, (left, top))
+            # the part of the crater that lands on the barrier
+            x0, y0, x1, y1 = max(left, 0), max(top, 0), min(left + crater_width, width), min(top + crater_height, height)
+            if x1 > x0 and y1 > y0:
+                alpha[x0:x1, y0:y1][crater.stencil[x0 - left:x1 - left, y0 - top:y1 - top]] = 0
+        # the pixel array keeps the surface locked until it's gone
+        del alpha
+        self.image_version += 1
+        self._update_bounds()
+        if self.mask.count() == 0:
             self.kill()
 
 
@@ -180,16 +406,31 @@ class PlayerSprite(SpaceInvadersSprite):
         self.time_since_shoot_ms += dt_ms
 
 
-class PlayerBulletSprite(SpaceInvadersSprite):
+class ProjectileSprite(SpaceInvadersSprite):
+    """A bullet, moved, animated and culled by a ProjectileManager rather than by its own update().
+
+    The manager owns the bullet's position while it's in play, rect and image are copied over from it."""
+
     def __init__(self, images: List[pygame.Surface], color: tuple, speed: int, x_pos, y_pos, groups):
         super().__init__(images, color, speed, x_pos, y_pos, groups)
         self.should_move = True
-        self.direction = Direction.UP
+        # 0 for bullets that don't animate
+        self.animation_interval_ms = 0
+        # set by the ProjectileManager that moves us
+        self.projectiles = None
+        self.slot = -1
 
-    def update(self, dt_ms, ms_elapsed_since_start):
-        super().update(dt_ms, ms_elapsed_since_start)
-        if self.rect.bottom < 0:
-            self.kill()
+    def kill(self):
+        # give the slot back before the sprite goes back to its pool
+        if self.projectiles is not None:
+            self.projectiles.remove(self)
+        super().kill()
+
+
+class PlayerBulletSprite(ProjectileSprite):
+    def __init__(self, images: List[pygame.Surface], color: tuple, speed: int, x_pos, y_pos, groups):
+        super().__init__(images, color, speed, x_pos, y_pos, groups)
+        self.direction = Direction.UP
 
 
 class EnemySprite(SpaceInvadersSprite):
@@ -232,8 +473,8 @@ class MainGridEnemySprite(EnemySprite):
         self.shoot_ms_interval = 1000
 
     def update(self, dt_ms, ms_elapsed_since_start):
-        # call super update after all this
-        super().update(dt_ms, ms_elapsed_since_start)
+        # grid enemies are moved and animated by the Formation they belong to, the sprite only draws
+        pass
 
 
 class ConeheadEnemySprite(MainGridEnemySprite):
@@ -257,30 +498,24 @@ class EarsEnemySprite(MainGridEnemySprite):
         self.score_for_kill = 10
 
 
-class GridEnemyBulletSprite(SpaceInvadersSprite):
+class GridEnemyBulletSprite(ProjectileSprite):
     def __init__(self, images: List[pygame.Surface], color: tuple, speed: int, x_pos, y_pos, groups):
         super().__init__(images, color, speed, x_pos, y_pos, groups)
-        self.should_move = True
         self.direction = Direction.DOWN
         self.animation_interval_ms = 50
-        self.elapsed_since_animation_ms = 0
 
-    def update(self, dt_ms, ms_elapsed_since_start):
-        super().update(dt_ms, ms_elapsed_since_start)
-        if self.elapsed_since_animation_ms >= self.animation_interval_ms:
-            self.animate()
-            self.elapsed_since_animation_ms = 0
-        else:
-            self.elapsed_since_animation_ms += dt_ms
-        if self.rect.top > 256:
-            self.kill()
-        
-      
+
 class ExplosionSprite(SpaceInvadersSprite):
     def __init__(self, images: List[pygame.Surface], color: tuple, speed: int, x_pos, y_pos, time_should_exist_ms: int, groups):
         super().__init__(images, color, speed, x_pos, y_pos, groups)
         self.time_since_creation_ms: int = 0
         self.time_should_exist_ms = time_should_exist_ms
+
+    def respawn(self, color: tuple, speed: int, x_pos, y_pos, time_should_exist_ms: int = None):
+        super().respawn(color, speed, x_pos, y_pos)
+        self.time_since_creation_ms = 0
+        if time_should_exist_ms is not None:
+            self.time_should_exist_ms = time_should_exist_ms
         
     def update(self, dt_ms, ms_elapsed_since_start):
         super().update(dt_ms, ms_elapsed_since_start)
@@ -294,6 +529,10 @@ class PlayerExplosionSprite(ExplosionSprite):
         super().__init__(images, color, speed, x_pos, y_pos, time_should_exist_ms, groups)
         self.animation_interval_ms = 100
         self.elapsed_since_animation_ms = 0
+
+    def respawn(self, color: tuple, speed: int, x_pos, y_pos, time_should_exist_ms: int = None):
+        super().respawn(color, speed, x_pos, y_pos, time_should_exist_ms)
+        self.elapsed_since_animation_ms = 0
         
     def update(self, dt_ms, ms_elapsed_since_start):
         super().update(dt_ms, ms_elapsed_since_start)
@@ -0,0 +1,52 @@
+import string
+from collections import OrderedDict
+
+import pygame
+
+DEFAULT_CHARSET = string.digits + string.ascii_letters + " -'!"
+
+
+class GlyphAtlas:
+    """Text in a single font and color, built out of glyphs that are only rendered once.
+
+    Every character in charset is rendered once, up front. A string is drawn by blitting its glyphs
+    side by side, and the last few strings are kept around, so nothing in the frame loop has to go
+    through the font renderer. Meant for fonts where glyphs don't kern, like the pixel font the game
+    uses."""
+
+    def __init__(self, font: pygame.font.Font, antialias: bool, color: tuple, charset=DEFAULT_CHARSET,
+                 memo_size=32):
+        self.font = font
+        self.antialias = antialias
+        self.color = color
+        self.height = font.get_height()
+        self.glyphs = {char: font.render(char, antialias, color) for char in charset}
+
+        self.memo_size = memo_size
+        self.memo = OrderedDict()
+
+    def _compose(self, text):
+        if any(char not in self.glyphs for char in text):
+            # a character we don't keep a glyph for, let the font deal with the whole string
+            return self.font.render(text, self.antialias, self.color)
+        glyphs = [self.glyphs[char] for char in text]
+        surface = pygame.Surface((sum(glyph.get_width() for glyph in glyphs), self.height), pygame.SRCALPHA)
+        blits = []
+        x = 0
+        for glyph in glyphs:
+            blits.append((glyph, (x, 0)))
+            x += glyph.get_width()
+        surface.blits(blits, doreturn=False)
+        return surface
+
+    def render(self, text):
+        # strings come back shared from the memo, so don't draw onto them
+        surface = self.memo.get(text)
+        if surface is None:
+            surface = self._compose(text)
+            self.memo[text] = surface
+            if len(self.memo) > self.memo_size:
+                self.memo.popitem(last=False)
+        else:
+            self.memo.move_to_end(text)
+        return surface
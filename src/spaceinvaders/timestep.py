@@ -0,0 +1,51 @@
+from contextlib import contextmanager
+
+
+class FixedTimestep:
+    """Turns the real time between rendered frames into a whole number of fixed-length simulation ticks.
+
+    Real time goes into an accumulator, scaled by speed for fast-forward, and comes out tick_ms at a time.
+    Whatever is left over, less than a tick, is carried into the next frame, and alpha says how far into
+    the next tick the frame being drawn is. After a long stall only max_ticks_per_frame (times the speed)
+    are run and the rest of the backlog is dropped, so the game slows down instead of never catching up."""
+
+    def __init__(self, tick_ms, max_ticks_per_frame=5, speed=1):
+        self.tick_ms = tick_ms
+        self.max_ticks_per_frame = max_ticks_per_frame
+        self.speed = speed
+        self.accumulated_ms = 0.0
+
+    def advance(self, elapsed_ms):
+        # how many ticks to run for a frame that came elapsed_ms after the last one
+        self.accumulated_ms += elapsed_ms * self.speed
+        ticks = int(self.accumulated_ms // self.tick_ms)
+        max_ticks = self.max_ticks_per_frame * self.speed
+        if ticks > max_ticks:
+            ticks = max_ticks
+            self.accumulated_ms = 0.0
+        else:
+            self.accumulated_ms -= ticks * self.tick_ms
+        return ticks
+
+    @property
+    def alpha(self):
+        return self.accumulated_ms / self.tick_ms
+
+
+@contextmanager
+def interpolated(sprites, alpha):
+    """Draw sprites part of the way from where they were at the start of the last tick to where they are now.
+
+    Their rects are only moved for the duration of the with block, the simulation never sees it."""
+    moved = []
+    if alpha > 0:
+        for sprite in sprites:
+            (prev_x, prev_y), (x, y) = sprite.prev_center, sprite.rect.center
+            if (prev_x, prev_y) != (x, y):
+                moved.append((sprite, sprite.rect.topleft))
+                sprite.rect.center = round(x + (prev_x - x) * (1 - alpha)), round(y + (prev_y - y) * (1 - alpha))
+    try:
+        yield
+    finally:
+        for sprite, topleft in moved:
+            sprite.rect.topleft = topleft
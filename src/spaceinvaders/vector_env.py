@@ -0,0 +1,186 @@
+"""Many headless games in one process, stepped together, for training automated players.
+
+    from spaceinvaders.vector_env import VectorEnv
+
+    env = VectorEnv(64, seed=0, observation='features')
+    observations = env.reset()
+    while training:
+        observations, rewards, dones, infos = env.step(policy(observations))
+
+Run from the repository root, so the games can find their resources. Running the module measures how many
+environment steps a second it manages:
+
+    PYTHONPATH=src python -m spaceinvaders.vector_env --envs 16 --steps 20000 --frame-skip 4
+"""
+import argparse
+import os
+import time
+
+# keep the pygame banner out of the output
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+import numpy as np
+import pygame
+
+from spaceinvaders.collision import CollisionKind
+from spaceinvaders.helpers import Action, Direction
+from spaceinvaders.main import SpaceInvaders, TICK_MS
+
+# the discrete actions an agent picks from, by index
+ACTIONS = (
+    Action.NONE,
+    Action.LEFT,
+    Action.RIGHT,
+    Action.FIRE,
+    Action.LEFT | Action.FIRE,
+    Action.RIGHT | Action.FIRE,
+)
+OBSERVATIONS = ('features', 'frames')
+# enemy bullets in the feature vector, the ones closest to the bottom of the screen
+MAX_ENEMY_BULLETS = 8
+
+
+class VectorEnv:
+    """num_envs independent games, stepped in lockstep with one action index per game.
+
+    Observations come back batched as NumPy arrays, one row per game:
+
+    * 'features', float32 (num_envs, feature_size): player x and whether there is a player, lives left,
+      the formation's offset and direction, which of its enemies are alive, the player's bullet and the
+      enemy bullets closest to the bottom, each as x, y and whether it's there. Positions are scaled
+      to 0..1 by the size of the screen.
+    * 'frames', uint8 (num_envs, height // downsample, width // downsample): the screen in grayscale,
+      keeping every downsample'th pixel.
+
+    Each step repeats the action for frame_skip ticks. The reward is what the game added to the score
+    over those ticks. A game is done once it's over, or after max_steps steps if that's given, and is
+    then reset right away, so the observation returned for it is the first one of its next game. infos
+    has the final score and length of every game that finished on the step, with NaN and 0 elsewhere."""
+
+    def __init__(self, num_envs, seed=0, observation='features', frame_skip=1, downsample=2, config=None,
+                 max_steps=None, dt_ms=TICK_MS):
+        if observation not in OBSERVATIONS:
+            raise ValueError(f'observation must be one of {", ".join(OBSERVATIONS)}, not {observation}')
+        self.num_envs = num_envs
+        self.seed = seed
+        self.observation = observation
+        self.frame_skip = frame_skip
+        self.downsample = downsample
+        self.max_steps = max_steps
+        self.dt_ms = dt_ms
+        self.games = [SpaceInvaders(headless=True, seed=seed + i, config=config) for i in range(num_envs)]
+        self.steps = np.zeros(num_envs, dtype=np.int64)
+
+        game = self.games[0]
+        self.width, self.height = game.screen.get_size()
+        self.num_cells = game.enemy_rows * game.enemy_columns
+        self.feature_size = 3 + 3 + self.num_cells + 3 * (1 + MAX_ENEMY_BULLETS)
+        if observation == 'features':
+            self.observation_shape = (self.feature_size,)
+        else:
+            self.observation_shape = (self.height // downsample, self.width // downsample)
+        self.num_actions = len(ACTIONS)
+
+    def reset(self, seed=None):
+        # every game starts over, from seed + i if a seed is given, otherwise from where each one's seeds lead
+        for i, game in enumerate(self.games):
+            game.reset(None if seed is None else seed + i)
+        self.steps[:] = 0
+        return self._observe_all()
+
+    def step(self, actions):
+        actions = np.asarray(actions)
+        rewards = np.zeros(self.num_envs, dtype=np.float32)
+        dones = np.zeros(self.num_envs, dtype=bool)
+        truncated = np.zeros(self.num_envs, dtype=bool)
+        final_scores = np.full(self.num_envs, np.nan, dtype=np.float32)
+        final_steps = np.zeros(self.num_envs, dtype=np.int64)
+        self.steps += 1
+        for i, (game, action) in enumerate(zip(self.games, actions.tolist())):
+            score = game.score_player
+            action = ACTIONS[action]
+            for _ in range(self.frame_skip):
+                game.step(action, self.dt_ms)
+                if game.game_is_over:
+                    break
+            rewards[i] = game.score_player - score
+            truncated[i] = self.max_steps is not None and self.steps[i] >= self.max_steps
+            if game.game_is_over or truncated[i]:
+                dones[i] = True
+                final_scores[i] = game.score_player
+                final_steps[i] = self.steps[i]
+                game.reset()
+                self.steps[i] = 0
+        infos = {'final_score': final_scores, 'final_steps': final_steps, 'truncated': truncated}
+        return self._observe_all(), rewards, dones, infos
+
+    def _observe_all(self):
+        observe = self._features if self.observation == 'features' else self._frame
+        return np.stack([observe(game) for game in self.games])
+
+    def _features(self, game: SpaceInvaders):
+        features = np.zeros(self.feature_size, dtype=np.float32)
+        scale = np.array([self.width, self.height], dtype=np.float32)
+        if game.current_player_sprite is not None:
+            features[0] = game.current_player_sprite.rect.centerx / self.width
+            features[1] = 1
+        # a game configured with no lives at all has none left from the start
+        features[2] = game.count_lives() / game.starting_lives if game.starting_lives else 0
+
+        formation = game.formation
+        features[3:5] = formation.pos[0] / scale
+        features[5] = 1 if formation.direction == Direction.RIGHT else -1
+        cells_end = 6 + self.num_cells
+        features[6:cells_end] = formation.alive
+
+        # each bullet is x, y and a 1 saying it's there
+        projectiles = game.projectiles
+        bullets = features[cells_end:].reshape(1 + MAX_ENEMY_BULLETS, 3)
+        player_bullets = projectiles.live(CollisionKind.PLAYER_BULLET)
+        if len(player_bullets):
+            bullets[0, :2] = projectiles.pos[player_bullets[0]] / scale
+            bullets[0, 2] = 1
+        enemy_bullets = projectiles.live(CollisionKind.ENEMY_BULLET)
+        if len(enemy_bullets):
+            positions = projectiles.pos[enemy_bullets]
+            positions = positions[np.argsort(-positions[:, 1], kind='stable')[:MAX_ENEMY_BULLETS]]
+            bullets[1:1 + len(positions), :2] = positions / scale
+            bullets[1:1 + len(positions), 2] = 1
+        return features
+
+    def _frame(self, game: SpaceInvaders):
+        game.draw()
+        pixels = pygame.surfarray.pixels3d(game.screen)[::self.downsample, ::self.downsample]
+        # the game only draws in saturated colors on black, so the brightest channel is as good as luminance
+        frame = pixels.max(axis=2).T
+        del pixels
+        return frame
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m spaceinvaders.vector_env',
+                                     description='Measure how fast a vector of games steps with random actions.')
+    parser.add_argument('--envs', type=int, default=16)
+    parser.add_argument('--steps', type=int, default=10000, help='environment steps in total, across every game')
+    parser.add_argument('--observation', choices=OBSERVATIONS, default='features')
+    parser.add_argument('--frame-skip', type=int, default=1, help='ticks each action is repeated for')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    env = VectorEnv(args.envs, seed=args.seed, observation=args.observation, frame_skip=args.frame_skip)
+    rng = np.random.default_rng(args.seed)
+    env.reset()
+    batches = max(1, args.steps // args.envs)
+    games_finished = 0
+    start = time.perf_counter()
+    for _ in range(batches):
+        _, _, dones, _ = env.step(rng.integers(env.num_actions, size=env.num_envs))
+        games_finished += int(dones.sum())
+    elapsed = time.perf_counter() - start
+    steps = batches * args.envs
+    print(f'{steps} steps in {elapsed:.2f} s: {steps / elapsed:.0f} steps/s, '
+          f'{steps * args.frame_skip / elapsed:.0f} ticks/s, {games_finished} games finished')
+
+
+if __name__ == '__main__':
+    main()
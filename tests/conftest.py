@@ -0,0 +1,18 @@
+import os
+import sys
+
+# no window and no banner, every test runs headless
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+
+
+@pytest.fixture(autouse=True)
+def repository_root(monkeypatch):
+    # the game finds its resources relative to the repository root
+    monkeypatch.chdir(ROOT)
+    return ROOT
@@ -0,0 +1,116 @@
+import os
+import shutil
+
+import pygame
+import pytest
+
+from spaceinvaders import assets, main
+from spaceinvaders.assets import BUNDLE_EXTENSION, AssetBundle, bundle_key, load_asset_bundle
+from spaceinvaders.main import SpaceInvaders, SPRITEMAP_PATH, SPRITESHEET_PATH, BULLET_PLAYER_TAG
+
+WANTED = {1: [(255, 255, 255)], 14: [(32, 255, 32), (255, 0, 0)], 27: [(32, 255, 32)], 31: [(32, 255, 32)]}
+
+
+@pytest.fixture
+def sources(tmp_path, monkeypatch):
+    # copies of the spritesheet and its map the test can change, and a cache of their own
+    monkeypatch.setattr(assets, '_loaded_bundles', {})
+    spritesheet = tmp_path / 'sheet.png'
+    spritemap = tmp_path / 'sheet.json'
+    shutil.copy(SPRITESHEET_PATH, spritesheet)
+    shutil.copy(SPRITEMAP_PATH, spritemap)
+    return str(spritesheet), str(spritemap), str(tmp_path / '.cache' / 'assets')
+
+
+def _bundles(cache_dir):
+    return sorted(name for name in os.listdir(cache_dir) if name.endswith(BUNDLE_EXTENSION))
+
+
+def _same_surface(a, b):
+    if a.get_size() != b.get_size() or a.get_colorkey() != b.get_colorkey():
+        return False
+    a, b = a.copy(), b.copy()
+    a.set_colorkey(None)
+    b.set_colorkey(None)
+    return pygame.image.tobytes(a, 'RGBA') == pygame.image.tobytes(b, 'RGBA')
+
+
+def _same_mask(a, b):
+    return a.get_size() == b.get_size() and a.count() == b.count() == a.overlap_area(b, (0, 0))
+
+
+def test_a_saved_bundle_loads_back_the_same(sources):
+    spritesheet, spritemap, cache_dir = sources
+    built = AssetBundle.build(spritesheet, spritemap, WANTED)
+    load_asset_bundle(spritesheet, spritemap, WANTED, cache_dir)
+    assert _bundles(cache_dir) == [bundle_key(spritesheet, spritemap, WANTED) + BUNDLE_EXTENSION]
+
+    loaded = AssetBundle.load(os.path.join(cache_dir, _bundles(cache_dir)[0]))
+    assert loaded.frames.keys() == built.frames.keys() == WANTED.keys()
+    for num in WANTED:
+        assert _same_surface(loaded.frames[num], built.frames[num])
+    assert loaded.colorized.keys() == built.colorized.keys()
+    for key, (colorized, mask) in built.colorized.items():
+        assert _same_surface(loaded.colorized[key][0], colorized)
+        assert _same_mask(loaded.colorized[key][1], mask)
+
+
+def test_unchanged_sources_load_from_the_cache(sources, monkeypatch):
+    spritesheet, spritemap, cache_dir = sources
+    load_asset_bundle(spritesheet, spritemap, WANTED, cache_dir)
+    monkeypatch.setattr(assets, '_loaded_bundles', {})
+
+    def build(*args):
+        raise AssertionError('rebuilt a bundle that was in the cache')
+
+    monkeypatch.setattr(AssetBundle, 'build', build)
+    bundle = load_asset_bundle(spritesheet, spritemap, WANTED, cache_dir)
+    assert bundle.frames.keys() == WANTED.keys()
+
+
+def _change_spritesheet(spritesheet, spritemap):
+    sheet = pygame.image.load(spritesheet)
+    sheet.set_at((0, 0), (1, 2, 3, 255) if sheet.get_at((0, 0)) != (1, 2, 3, 255) else (4, 5, 6, 255))
+    pygame.image.save(sheet, spritesheet)
+
+
+def _change_spritemap(spritesheet, spritemap):
+    with open(spritemap, 'a') as f:
+        f.write('\n')
+
+
+@pytest.mark.parametrize('change', [_change_spritesheet, _change_spritemap])
+def test_a_changed_source_rebuilds_the_bundle(sources, change):
+    spritesheet, spritemap, cache_dir = sources
+    load_asset_bundle(spritesheet, spritemap, WANTED, cache_dir)
+    old = _bundles(cache_dir)
+    change(spritesheet, spritemap)
+    load_asset_bundle(spritesheet, spritemap, WANTED, cache_dir)
+    # one bundle for the new sources, the one for the old ones is gone
+    assert len(_bundles(cache_dir)) == 1
+    assert _bundles(cache_dir) != old
+
+
+def test_touching_a_source_without_changing_it_keeps_the_bundle(sources, monkeypatch):
+    # bundles are keyed by what's in the sources, not when they were saved
+    spritesheet, spritemap, cache_dir = sources
+    load_asset_bundle(spritesheet, spritemap, WANTED, cache_dir)
+    old = _bundles(cache_dir)
+    stat = os.stat(spritesheet)
+    os.utime(spritesheet, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    monkeypatch.setattr(assets, '_loaded_bundles', {})
+    monkeypatch.setattr(AssetBundle, 'build', None)
+    load_asset_bundle(spritesheet, spritemap, WANTED, cache_dir)
+    assert _bundles(cache_dir) == old
+
+
+def test_a_changed_entity_info_rebuilds_the_bundle(tmp_path, monkeypatch):
+    cache_dir = str(tmp_path / 'assets')
+    monkeypatch.setattr(main, 'ASSET_CACHE_DIR', cache_dir)
+    SpaceInvaders(headless=True, seed=0)
+    old = _bundles(cache_dir)
+    # the player's bullet in a color nothing else is drawn in
+    red = SpaceInvaders(headless=True, seed=0, config={'entity_info': {BULLET_PLAYER_TAG: {'color': [255, 0, 0]}}})
+    assert len(_bundles(cache_dir)) == 1
+    assert _bundles(cache_dir) != old
+    assert any(color == (255, 0, 0) for _, color in red.assets.colorized)
@@ -0,0 +1,41 @@
+import multiprocessing
+
+import pytest
+
+from spaceinvaders.batch import ResultCache, run_batch, summarize
+
+SEEDS = [4, 9, 13]
+
+
+def _outcomes(results):
+    # everything but the frame times, which are wall clock
+    return sorted((result['seed'], result['score'], result['enemy_grid_clears'], result['frames'], result['game_over'])
+                  for result in results)
+
+
+def test_summary_of_no_games():
+    assert summarize([]) == {'games': 0, 'games_finished': 0}
+
+
+def test_a_seeded_batch_plays_out_the_same_and_comes_from_the_cache_the_second_time(tmp_path, monkeypatch):
+    cache = ResultCache(str(tmp_path))
+    first = list(run_batch({}, SEEDS, processes=2, max_frames=600, cache=cache))
+    assert sorted(result['seed'] for result in first) == SEEDS
+    assert summarize(first)['games'] == len(SEEDS)
+
+    # played again without the cache, the same seeds play out the same way
+    assert _outcomes(run_batch({}, SEEDS, processes=2, max_frames=600)) == _outcomes(first)
+
+    # with it, nothing is played at all
+    def no_pool(*args, **kwargs):
+        raise AssertionError('a cached batch started a process pool')
+
+    monkeypatch.setattr(multiprocessing, 'Pool', no_pool)
+    second = list(run_batch({}, SEEDS, processes=2, max_frames=600, cache=cache))
+    assert sorted(second, key=lambda result: result['seed']) == sorted(first, key=lambda result: result['seed'])
+
+    # a different config, or different runner settings, don't get the cached games
+    with pytest.raises(AssertionError, match='process pool'):
+        list(run_batch({'starting_lives': 1}, SEEDS, processes=2, max_frames=600, cache=cache))
+    with pytest.raises(AssertionError, match='process pool'):
+        list(run_batch({}, SEEDS, processes=2, max_frames=300, cache=cache))
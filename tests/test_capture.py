@@ -0,0 +1,25 @@
+import pygame
+import pytest
+
+from spaceinvaders.capture import FrameCapture
+
+
+def test_gif_stops_keeping_frames_once_full(tmp_path, capsys):
+    Image = pytest.importorskip('PIL.Image')
+    path = tmp_path / 'capture.gif'
+    capture = FrameCapture(str(path), (16, 8))
+    capture.writer.max_frames = 5
+    # every frame at once, rather than one per 20 ms
+    capture.min_frame_ms = 0
+    surface = pygame.Surface((16, 8))
+    for i in range(10):
+        surface.fill((i * 20, 0, 0))
+        capture.submit(surface)
+    capture.close()
+
+    assert capture.written == 10
+    assert capture.writer.left_out == 5
+    assert 'full at 5 frames' in capsys.readouterr().err
+    assert '5 written' in capture.report() and '5 left out' in capture.report()
+    with Image.open(path) as gif:
+        assert gif.n_frames == 5
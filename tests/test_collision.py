@@ -0,0 +1,97 @@
+import itertools
+
+import pygame
+
+from spaceinvaders.benchmarks.scenarios import BarrierDamage
+from spaceinvaders.collision import BroadPhase, CollisionKind, INTERACTIONS
+from spaceinvaders.main import SpaceInvaders
+
+
+def _brute_force_pairs(sprites_by_kind):
+    # every pair of live sprites of interacting kinds whose rects overlap and that pass the narrow phase
+    pairs = set()
+    for (kind_a, kind_b), collide in INTERACTIONS.items():
+        for sprite_a, sprite_b in itertools.product(sprites_by_kind[kind_a], sprites_by_kind[kind_b]):
+            if sprite_a.rect.colliderect(sprite_b.rect) and collide(sprite_a, sprite_b):
+                pairs.add((kind_a, kind_b, sprite_a, sprite_b))
+    return pairs
+
+
+def _found_pairs(colliding):
+    return {(kind_a, kind_b, sprite_a, sprite_b) for (kind_a, kind_b), pairs in colliding.items()
+            for sprite_a, sprite_b in pairs}
+
+
+def test_colliding_pairs_match_a_brute_force_check(monkeypatch):
+    game = SpaceInvaders(headless=True, seed=3)
+    scenario = BarrierDamage(seed=3)
+    checked = []
+    colliding_pairs = game.collision_grid.colliding_pairs
+
+    def checked_colliding_pairs():
+        colliding = colliding_pairs()
+        sprites_by_kind = {
+            CollisionKind.PLAYER: [game.current_player_sprite] if game.current_player_sprite else [],
+            CollisionKind.PLAYER_BULLET: game.player_bullet_sprites.sprites(),
+            CollisionKind.ENEMY_BULLET: game.enemy_bullet_sprites.sprites(),
+            CollisionKind.GRID_ENEMY: game.grid_enemy_sprites.sprites(),
+            CollisionKind.BARRIER: game.barrier_sprites.sprites(),
+        }
+        expected = _brute_force_pairs(sprites_by_kind)
+        # the static hash keeps enemies that were shot until the formation next moves, the handlers skip
+        # those, so only pairs of live sprites count
+        found = {pair for pair in _found_pairs(colliding) if pair[2].alive() and pair[3].alive()}
+        assert found == expected
+        checked.append(len(expected))
+        return colliding
+
+    monkeypatch.setattr(game.collision_grid, 'colliding_pairs', checked_colliding_pairs)
+    for frame in range(600):
+        if game.game_is_over:
+            break
+        scenario.before_frame(game, frame)
+        if frame % 150 == 75:
+            # a new grid and new barriers, both only get into the static hash through invalidate_static()
+            for enemy in game.grid_enemy_sprites.sprites():
+                enemy.kill()
+                game.formation.kill(enemy)
+            for barrier in game.barrier_sprites.sprites():
+                barrier.kill()
+            game.setup_barriers()
+        game.step(scenario.act(game, frame), 16)
+    # through three rebuilt grids and sets of barriers at least
+    assert len(checked) > 375
+    assert sum(checked) > 100
+
+
+def _sprite(left, top, width=12, height=8):
+    sprite = pygame.sprite.Sprite()
+    sprite.rect = pygame.Rect(left, top, width, height)
+    return sprite
+
+
+def test_static_hash_is_only_rebuilt_after_invalidate_static():
+    broad_phase = BroadPhase()
+    enemy = _sprite(0, 0)
+    enemies = pygame.sprite.Group(enemy)
+    player = _sprite(100, 100)
+
+    def colliding():
+        broad_phase.update_static(1, [(enemies, CollisionKind.GRID_ENEMY)])
+        broad_phase.update_dynamic([((player,), CollisionKind.PLAYER)])
+        return _found_pairs(broad_phase.colliding_pairs())
+
+    assert colliding() == set()
+    # the enemy moves onto the player without the version changing, so the static hash still has it where it was
+    enemy.rect.topleft = (104, 102)
+    assert colliding() == set()
+    broad_phase.invalidate_static()
+    expected = _brute_force_pairs({CollisionKind.PLAYER: [player], CollisionKind.GRID_ENEMY: [enemy],
+                                   CollisionKind.PLAYER_BULLET: [], CollisionKind.ENEMY_BULLET: [],
+                                   CollisionKind.BARRIER: []})
+    assert colliding() == expected == {(CollisionKind.PLAYER, CollisionKind.GRID_ENEMY, player, enemy)}
+    # and an enemy that's gone is gone from the hash too, once it's invalidated again
+    enemy.kill()
+    assert colliding() == expected
+    broad_phase.invalidate_static()
+    assert colliding() == set()
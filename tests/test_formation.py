@@ -0,0 +1,84 @@
+import random
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from spaceinvaders.formation import Formation
+from spaceinvaders.helpers import Action
+from spaceinvaders.main import SpaceInvaders
+
+
+def _formation(rows, columns):
+    formation = Formation(rows=rows, columns=columns, origin=(32, 60), spacing=(16, 16),
+                          kinds=[min(row, 2) for row in range(rows)], frame_counts=[2, 2, 2],
+                          widths=[12, 12, 12], heights=[8, 8, 8], speeds=[150, 150, 150])
+    for row in range(rows):
+        for column in range(columns):
+            formation.attach(SimpleNamespace(initial_grid_position=(row, column)))
+    return formation
+
+
+def _check_index(formation):
+    # every part of the index against the same thing worked out from the alive array from scratch
+    alive = formation.alive.reshape(formation.rows, formation.columns)
+    assert formation.num_alive == alive.sum()
+    assert formation.column_count == alive.sum(axis=0).tolist()
+    assert formation.row_count == alive.sum(axis=1).tolist()
+    assert formation.bottom_row == [int(np.flatnonzero(column)[-1]) if column.any() else -1 for column in alive.T]
+    occupied = np.flatnonzero(alive.any(axis=0)).tolist()
+    assert formation.occupied_columns == occupied
+    for index, view in enumerate(formation.views):
+        assert (view is not None) == formation.alive[index]
+    if not occupied:
+        assert formation.min_column == formation.max_column == -1
+        assert formation.bounding_box() is None
+        return
+    assert (formation.min_column, formation.max_column) == (occupied[0], occupied[-1])
+    rows = np.flatnonzero(alive.any(axis=1))
+    assert (formation.top_row, formation.lowest_row) == (rows[0], rows[-1])
+    for column in occupied:
+        assert formation.shooter(column).initial_grid_position == (formation.bottom_row[column], column)
+
+    # the edges of the living enemies' rects, rounded the way the sprites' are
+    cells = np.flatnonzero(formation.alive)
+    lefts = np.rint(formation.pos[cells, 0]).astype(int) - formation.max_width // 2
+    tops = np.rint(formation.pos[cells, 1]).astype(int) - formation.max_height // 2
+    left, top = lefts.min(), tops.min()
+    assert formation.bounding_box() == (left, top, lefts.max() + formation.max_width - left,
+                                        tops.max() + formation.max_height - top)
+
+
+@pytest.mark.parametrize('rows, columns, seed', [(5, 11, 0), (8, 12, 1), (1, 1, 2), (3, 7, 3)])
+def test_index_follows_random_kills(rows, columns, seed):
+    rng = random.Random(seed)
+    formation = _formation(rows, columns)
+    _check_index(formation)
+    cells = list(range(rows * columns))
+    rng.shuffle(cells)
+    for step, index in enumerate(cells):
+        if step % 3 == 0:
+            # the formation moves between kills, the index shouldn't care
+            formation.pos += rng.uniform(-3, 3), rng.uniform(0, 2)
+        formation.kill(SimpleNamespace(initial_grid_position=(index // columns, index % columns)))
+        # killing the same enemy twice changes nothing
+        formation.kill(SimpleNamespace(initial_grid_position=(index // columns, index % columns)))
+        _check_index(formation)
+
+
+def test_index_after_the_game_clears_and_repopulates_the_grid():
+    game = SpaceInvaders(headless=True, seed=4, config={'starting_lives': 99})
+    rng = random.Random(4)
+    for clear in range(3):
+        _check_index(game.formation)
+        enemies = list(game.grid_enemy_sprites)
+        rng.shuffle(enemies)
+        for enemy in enemies:
+            enemy.kill()
+            game.formation.kill(enemy)
+            _check_index(game.formation)
+            # the tick after the last kill finds the grid empty and builds a full one
+            game.step(Action.NONE, 16)
+        assert game.enemy_grid_clears == clear + 1
+        assert game.formation.num_alive == game.enemy_rows * game.enemy_columns
+    _check_index(game.formation)
@@ -0,0 +1,83 @@
+from multiprocessing import resource_tracker
+
+import numpy as np
+import pygame
+import pytest
+
+from spaceinvaders import framebuffer
+from spaceinvaders.framebuffer import FramebufferReader, FramebufferRing
+
+SIZE = (8, 6)
+
+
+@pytest.fixture
+def ring():
+    ring = FramebufferRing(size=SIZE, slots=3)
+    reader = FramebufferReader(ring.name)
+    # the reader takes the ring off this process's resource tracker, which here is the writer's process too
+    resource_tracker.register(ring.memory._name, 'shared_memory')
+    yield ring, reader
+    reader.close()
+    ring.close()
+
+
+def _frame(seed):
+    # a screen sized surface of random pixels, and its bytes in the ring's BGRA layout
+    pixels = np.random.default_rng(seed).integers(0, 256, (SIZE[0], SIZE[1], 3), dtype=np.uint8)
+    surface = pygame.surfarray.make_surface(pixels).convert(32, 0)
+    expected = np.frombuffer(pygame.image.tobytes(surface, 'BGRA'), dtype=np.uint8).reshape(SIZE[1], SIZE[0], 4)
+    return surface, expected
+
+
+def test_a_published_frame_reads_back_byte_for_byte(ring):
+    ring, reader = ring
+    assert reader.latest == 0 and reader.read() is None
+    surface, expected = _frame(0)
+    assert ring.publish(surface, timestamp_ns=1234) == 1
+    assert reader.latest == 1
+    frame, timestamp_ns, pixels = reader.read()
+    assert (frame, timestamp_ns) == (1, 1234)
+    assert pixels.tobytes() == expected.tobytes()
+    # and the same pixels in place
+    view = reader.view(1)
+    assert view.still_valid()
+    assert view.pixels.tobytes() == expected.tobytes()
+
+
+def test_a_frame_being_written_is_never_read(ring, monkeypatch):
+    ring, reader = ring
+    surface, _ = _frame(1)
+    ring.publish(surface)
+    # the writer is halfway through the slot, its sequence is odd
+    header = ring.slot_headers[1]
+    header[0] += 1
+    assert reader.view(1) is None
+    assert reader.read(1) is None
+    header[0] += 1
+    assert reader.read(1) is not None
+
+    # the writer comes round to the slot again while the reader is copying it out
+    copyto = np.copyto
+
+    def copy_then_overwrite(out, pixels):
+        copyto(out, pixels)
+        for seed in range(ring.slot_count):
+            ring.publish(_frame(seed + 2)[0])
+
+    monkeypatch.setattr(framebuffer.np, 'copyto', copy_then_overwrite)
+    assert reader.read(1) is None
+
+
+def test_the_ring_wraps_around(ring):
+    ring, reader = ring
+    frames = [_frame(seed) for seed in range(7)]
+    for surface, _ in frames:
+        ring.publish(surface)
+    assert reader.latest == 7
+    # the last slot_count frames are still there, anything older has been written over
+    for frame in range(1, 5):
+        assert reader.view(frame) is None
+    for frame in range(5, 8):
+        number, _, pixels = reader.read(frame)
+        assert number == frame
+        assert pixels.tobytes() == frames[frame - 1][1].tobytes()
@@ -0,0 +1,81 @@
+import json
+import os
+import shutil
+
+import pytest
+
+from spaceinvaders.collision import CollisionKind
+from spaceinvaders.helpers import Action
+from spaceinvaders.hotreload import AssetWatcher
+from spaceinvaders.main import SpaceInvaders, ENTITYINFO_PATH, SPRITESHEET_PATH, SPRITEMAP_PATH, \
+    BULLET_GRID_ENEMY_1_TAG, BULLET_PLAYER_TAG
+
+
+@pytest.fixture
+def watched(tmp_path):
+    # a game watching copies of its resources, so the test can edit them
+    paths = []
+    for path in (ENTITYINFO_PATH, SPRITESHEET_PATH, SPRITEMAP_PATH):
+        paths.append(str(tmp_path / os.path.basename(path)))
+        shutil.copy(path, paths[-1])
+    game = SpaceInvaders(headless=True, seed=5)
+    watcher = AssetWatcher(game, *paths, interval_ms=0)
+    return game, watcher, paths[0]
+
+
+def _edit(entity_info_path, **entries):
+    with open(entity_info_path) as f:
+        entity_info = json.load(f)
+    for tag, entry in entries.items():
+        entity_info[tag].update(entry)
+    with open(entity_info_path, 'w') as f:
+        json.dump(entity_info, f)
+    # make sure the watcher sees a new modification time, however coarse the filesystem's clock
+    stat = os.stat(entity_info_path)
+    os.utime(entity_info_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def _step_until_enemy_bullets(game):
+    for _ in range(2000):
+        game.step(Action.NONE, 16)
+        if len(game.projectiles.live(CollisionKind.ENEMY_BULLET)):
+            return
+    pytest.fail('no enemy fired')
+
+
+def test_reloading_a_bullet_with_a_fifth_frame(watched):
+    game, watcher, entity_info_path = watched
+    _step_until_enemy_bullets(game)
+    frames = [14, 15, 16, 17, 14]
+    _edit(entity_info_path, **{BULLET_GRID_ENEMY_1_TAG: {'image_indexes': frames}})
+    assert watcher.poll(0) == [BULLET_GRID_ENEMY_1_TAG]
+
+    projectiles = game.projectiles
+    for _ in range(600):
+        game.step(Action.NONE, 16)
+        for slot in projectiles.live(CollisionKind.ENEMY_BULLET).tolist():
+            bullet = projectiles.views[slot]
+            assert bullet.slot == slot
+            if bullet.entity_tag == BULLET_GRID_ENEMY_1_TAG:
+                assert projectiles.frame_count[slot] == len(bullet.images) == len(frames)
+    for bullet in game.enemy_bullet_sprites:
+        assert bullet.slot >= 0
+
+
+def test_a_reload_the_game_cant_take_changes_nothing(watched, capsys):
+    game, watcher, entity_info_path = watched
+    _step_until_enemy_bullets(game)
+    player_bullet_speed = game.entity_info[BULLET_PLAYER_TAG]['speed']
+    enemy_bullet_images = game.entity_info[BULLET_GRID_ENEMY_1_TAG]['images']
+    # a fine change alongside one with no frames at all
+    _edit(entity_info_path, **{BULLET_PLAYER_TAG: {'speed': 400},
+                               BULLET_GRID_ENEMY_1_TAG: {'image_indexes': []}})
+    assert watcher.poll(0) == []
+    assert 'hot reload: skipped' in capsys.readouterr().err
+    assert game.entity_info[BULLET_PLAYER_TAG]['speed'] == player_bullet_speed
+    assert game.entity_info[BULLET_GRID_ENEMY_1_TAG]['images'] is enemy_bullet_images
+
+    # the next save that gets it right goes through
+    _edit(entity_info_path, **{BULLET_GRID_ENEMY_1_TAG: {'image_indexes': [14, 15]}})
+    assert set(watcher.poll(0)) == {BULLET_PLAYER_TAG, BULLET_GRID_ENEMY_1_TAG}
+    assert game.entity_info[BULLET_PLAYER_TAG]['speed'] == 400
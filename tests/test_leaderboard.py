@@ -0,0 +1,65 @@
+import sqlite3
+
+from spaceinvaders.leaderboard import Leaderboard, LeaderboardEntry
+
+
+def _entry(score, finished_at, level=0, duration_ms=1000):
+    return LeaderboardEntry(score, level, duration_ms, finished_at)
+
+
+def test_recorded_scores_are_there_after_reopening(tmp_path):
+    path = str(tmp_path / 'cache' / 'leaderboard.sqlite3')
+    leaderboard = Leaderboard(path)
+    entry = _entry(1230, 100.5, level=2, duration_ms=64000)
+    leaderboard.record(entry)
+    assert leaderboard.high_score == 1230
+    leaderboard.close()
+
+    reopened = Leaderboard(path)
+    assert reopened.top() == [entry]
+    assert reopened.high_score == 1230
+    reopened.close()
+
+
+def test_top_scores_are_best_first_and_ties_go_to_the_earlier_game(tmp_path):
+    path = str(tmp_path / 'leaderboard.sqlite3')
+    leaderboard = Leaderboard(path, top_n=4)
+    entries = [_entry(500, 10), _entry(900, 11), _entry(500, 5), _entry(100, 12), _entry(900, 13),
+               _entry(700, 14)]
+    for entry in entries:
+        leaderboard.record(entry)
+    expected = [_entry(900, 11), _entry(900, 13), _entry(700, 14), _entry(500, 5)]
+    assert leaderboard.top() == expected
+    assert leaderboard.top(2) == expected[:2]
+    leaderboard.close()
+
+    # every game is kept in the database, the same top four come back out of it
+    reopened = Leaderboard(path, top_n=4)
+    assert reopened.top() == expected
+    reopened.close()
+    connection = sqlite3.connect(path)
+    assert connection.execute('SELECT COUNT(*) FROM games').fetchone() == (len(entries),)
+    connection.close()
+
+
+def test_writes_from_a_second_connection_are_seen(tmp_path):
+    path = str(tmp_path / 'leaderboard.sqlite3')
+    first = Leaderboard(path)
+    second = Leaderboard(path)
+    # a reader with a connection of its own, open the whole time
+    connection = sqlite3.connect(path)
+    first.record(_entry(300, 1))
+    second.record(_entry(400, 2))
+    first.record(_entry(200, 3))
+    # close() waits for each writer's games to be committed, both writers' games are in
+    second.close()
+    first.close()
+    assert connection.execute('SELECT score FROM games ORDER BY score DESC').fetchall() == [(400,), (300,), (200,)]
+
+    # a leaderboard opened after them starts out with every game, whichever connection wrote it
+    third = Leaderboard(path)
+    assert [entry.score for entry in third.top()] == [400, 300, 200]
+    third.record(_entry(1000, 4))
+    third.close()
+    assert connection.execute('SELECT MAX(score) FROM games').fetchone() == (1000,)
+    connection.close()
@@ -0,0 +1,54 @@
+import functools
+
+import pygame
+
+from spaceinvaders.pools import SpritePool
+from spaceinvaders.sprites import SpaceInvadersSprite
+
+
+def _pool(size):
+    images = [pygame.Surface((3, 4), pygame.SRCALPHA)]
+    factory = functools.partial(SpaceInvadersSprite, images=images, color=(255, 255, 255), speed=0, x_pos=0,
+                                y_pos=0, groups=())
+    return SpritePool(factory, size=size, tag='BULLET')
+
+
+def _acquire(pool, group, x_pos=10):
+    return pool.acquire((group,), color=(0, 255, 0), speed=100, x_pos=x_pos, y_pos=20)
+
+
+def test_killed_sprites_are_reused():
+    pool = _pool(size=2)
+    group = pygame.sprite.Group()
+    first, second = _acquire(pool, group), _acquire(pool, group)
+    assert first is not second
+    assert first.entity_tag == second.entity_tag == 'BULLET'
+    assert pool.stats() == {'in_use': 2, 'free': 0, 'high_water': 2, 'created': 2}
+
+    first.kill()
+    assert pool.stats() == {'in_use': 1, 'free': 1, 'high_water': 2, 'created': 2}
+    # killing it twice doesn't put it in the pool twice
+    first.kill()
+    assert pool.stats()['free'] == 1
+
+    # the same sprite comes back, re-armed where it was asked for
+    again = _acquire(pool, group, x_pos=50)
+    assert again is first
+    assert again.alive() and again in group
+    assert again.rect.center == (50, 20)
+    assert pool.stats() == {'in_use': 2, 'free': 0, 'high_water': 2, 'created': 2}
+
+
+def test_a_pool_grows_past_its_size_and_remembers_its_high_water():
+    pool = _pool(size=1)
+    group = pygame.sprite.Group()
+    sprites = [_acquire(pool, group) for _ in range(4)]
+    assert len({id(sprite) for sprite in sprites}) == 4
+    assert pool.stats() == {'in_use': 4, 'free': 0, 'high_water': 4, 'created': 4}
+    for sprite in sprites:
+        sprite.kill()
+    assert pool.stats() == {'in_use': 0, 'free': 4, 'high_water': 4, 'created': 4}
+    # fewer at once the next time, nothing new is created and the high water stays where it was
+    for _ in range(3):
+        _acquire(pool, group).kill()
+    assert pool.stats() == {'in_use': 0, 'free': 4, 'high_water': 4, 'created': 4}
@@ -0,0 +1,53 @@
+import json
+import threading
+
+import pygame
+
+from spaceinvaders.main import SpaceInvaders
+from spaceinvaders.profiling import FrameProfiler
+
+
+def test_stages_registered_from_many_threads_get_a_column_each():
+    profiler = FrameProfiler(max_stages=64, enabled=True)
+    start = threading.Barrier(8)
+
+    def register(thread):
+        start.wait()
+        # every thread registers the same stages, each starting from a different one
+        for i in range(16):
+            profiler.stage(f'stage {(thread + i) % 16}')
+
+    threads = [threading.Thread(target=register, args=(thread,)) for thread in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(profiler.stage_names) == sorted(f'stage {i}' for i in range(16))
+    for name, stage in profiler.stages.items():
+        assert profiler.stage_names[stage.column] == name
+
+
+def test_threaded_game_traces_the_simulation_on_its_own_thread(tmp_path, monkeypatch):
+    frames = []
+    get_events = pygame.event.get
+
+    def quit_after_a_while():
+        frames.append(None)
+        events = get_events()
+        if len(frames) > 30:
+            events.append(pygame.event.Event(pygame.QUIT))
+        return events
+
+    monkeypatch.setattr(pygame.event, 'get', quit_after_a_while)
+    trace_path = tmp_path / 'trace.json'
+    game = SpaceInvaders(seed=3, threaded=True, profile=True, profile_path=str(trace_path), leaderboard_path=None)
+    assert game.simulation_profiler.frames > 0
+
+    events = json.loads(trace_path.read_text())['traceEvents']
+    threads = {event['tid']: event['args']['name'] for event in events if event['ph'] == 'M'}
+    assert threads == {0: 'main', 1: 'simulation'}
+    stages = {tid: {event['name'] for event in events if event['ph'] == 'X' and event['tid'] == tid}
+              for tid in threads}
+    assert {'frame', 'collision', 'update', 'input', 'snapshot'} <= stages[1]
+    assert {'frame', 'draw', 'flip'} <= stages[0]
+    assert not stages[0] & {'collision', 'update', 'input', 'snapshot'}
@@ -0,0 +1,37 @@
+import numpy as np
+
+from spaceinvaders.helpers import Action
+from spaceinvaders.main import SpaceInvaders, PROJECTILE_KINDS
+from spaceinvaders.collision import CollisionKind
+
+ENEMY_BULLET_TAGS = [tag for tag, kind in PROJECTILE_KINDS.items() if kind is CollisionKind.ENEMY_BULLET]
+
+
+def test_bullets_with_more_frames_than_the_manager_started_with():
+    # six frames, where the manager starts out with room for four
+    frames = [14, 15, 16, 17, 14, 15]
+    config = {'entity_info': {tag: {'image_indexes': frames} for tag in ENEMY_BULLET_TAGS}}
+    game = SpaceInvaders(headless=True, seed=5, config=config)
+    frames_seen = set()
+    for _ in range(1500):
+        game.step(Action.NONE, 16)
+        projectiles = game.projectiles
+        slots = projectiles.live(CollisionKind.ENEMY_BULLET)
+        frames_seen.update(projectiles.frame[slots].tolist())
+        for slot in slots.tolist():
+            bullet = projectiles.views[slot]
+            assert projectiles.frame_count[slot] == len(frames)
+            assert bullet.image is bullet.images[projectiles.frame[slot]]
+    assert projectiles.max_frames >= len(frames)
+    assert frames_seen >= {4, 5}
+
+
+def test_live_slots_follow_adds_and_kills():
+    game = SpaceInvaders(headless=True, seed=11)
+    for _ in range(800):
+        game.step(Action.FIRE, 16)
+        projectiles = game.projectiles
+        live = projectiles.live()
+        assert np.array_equal(live, np.flatnonzero(projectiles.alive))
+        assert {id(projectiles.views[slot]) for slot in live.tolist()} == \
+            {id(bullet) for bullet in list(game.player_bullet_sprites) + list(game.enemy_bullet_sprites)}
@@ -0,0 +1,40 @@
+import random
+
+import pygame
+
+from spaceinvaders.helpers import Action
+from spaceinvaders.main import SpaceInvaders, BG_COLOR
+from spaceinvaders.rendering import DirtyRectRenderer
+from spaceinvaders.timestep import interpolated
+
+ACTIONS = [Action.NONE, Action.LEFT, Action.RIGHT, Action.FIRE, Action.LEFT | Action.FIRE, Action.RIGHT | Action.FIRE]
+
+
+def test_dirty_rects_draw_the_same_frames_as_a_full_redraw():
+    # the same seeded game twice, one drawn with dirty rects and one redrawn from scratch every frame
+    config = {'starting_lives': 1, 'base_enemy_shoot_interval_ms': 150}
+    dirty = SpaceInvaders(headless=True, seed=3, config=config)
+    full = SpaceInvaders(headless=True, seed=3, config=config)
+    renderer = DirtyRectRenderer(dirty, BG_COLOR)
+    rng = random.Random(3)
+    game_overs = 0
+    for frame in range(4000):
+        if frame == 2500:
+            # a new game from outside, the way the vector env and benchmarks start one
+            dirty.reset(8)
+            full.reset(8)
+        actions = rng.choice(ACTIONS)
+        if dirty.game_is_over:
+            game_overs += 1
+            actions |= Action.NEW_GAME
+        dirty.step(actions, 16)
+        full.step(actions, 16)
+        alpha = rng.random()
+        with interpolated(dirty.interpolated_sprites(), alpha):
+            renderer.render()
+        with interpolated(full.interpolated_sprites(), alpha):
+            full.draw()
+        assert pygame.image.tobytes(dirty.screen, 'RGB') == pygame.image.tobytes(full.screen, 'RGB'), \
+            f'frame {frame} differs'
+    # the comparison went through game overs and new games too
+    assert game_overs
@@ -0,0 +1,64 @@
+import argparse
+import random
+
+import pytest
+
+from spaceinvaders.helpers import Action
+from spaceinvaders.main import SpaceInvaders, seed_argument
+from spaceinvaders.replay import HEADER, MAX_SEED, MIN_SEED, VERSION, InputRecorder, Recording, replay
+
+
+def _record(path, seed=42, frames=2500):
+    game = SpaceInvaders(headless=True, seed=seed, record_path=str(path), config={'starting_lives': 2})
+    rng = random.Random(seed)
+    actions = [Action.NONE, Action.LEFT, Action.RIGHT, Action.FIRE, Action.LEFT | Action.FIRE,
+               Action.RIGHT | Action.FIRE]
+    for _ in range(frames):
+        game.step(rng.choice(actions), rng.choice((15, 16, 17)))
+    game.save_recording()
+    return game
+
+
+def test_replay_ends_where_the_recorded_game_did(tmp_path):
+    path = tmp_path / 'session.sir'
+    game = _record(path)
+    recording = Recording.load(str(path))
+    assert recording.seed == 42
+    assert recording.config == {'starting_lives': 2}
+    assert len(recording.frames) == 2500
+    assert recording.final_digest == game.state_digest()
+
+    result = replay(str(path))
+    assert result['matches']
+    assert result['score'] == game.score_player
+    assert result['digest'] == game.state_digest().hex()
+
+
+@pytest.mark.parametrize('offset, value, message', [
+    (0, b'XXXX', 'not a recording'),
+    (4, (VERSION + 1).to_bytes(2, 'little'), f'version {VERSION + 1}'),
+])
+def test_recordings_with_the_wrong_magic_or_version_are_rejected(tmp_path, offset, value, message):
+    path = tmp_path / 'session.sir'
+    _record(path, frames=10)
+    data = bytearray(path.read_bytes())
+    assert len(data) > HEADER.size
+    data[offset:offset + len(value)] = value
+    path.write_bytes(data)
+    with pytest.raises(ValueError, match=message):
+        Recording.load(str(path))
+
+
+@pytest.mark.parametrize('seed', [MIN_SEED - 1, MAX_SEED + 1, 2 ** 64])
+def test_seeds_that_dont_fit_in_a_recording_are_turned_down_up_front(seed):
+    with pytest.raises(ValueError):
+        InputRecorder(seed)
+    with pytest.raises(argparse.ArgumentTypeError):
+        seed_argument(str(seed))
+
+
+def test_seeds_at_the_ends_of_the_range_are_recorded(tmp_path):
+    for seed in (MIN_SEED, MAX_SEED):
+        path = tmp_path / f'{seed}.sir'
+        _record(path, seed=seed, frames=10)
+        assert Recording.load(str(path)).seed == seed == seed_argument(str(seed))
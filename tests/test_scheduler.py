@@ -0,0 +1,60 @@
+from spaceinvaders.scheduler import UpdateScheduler
+
+
+def _scheduler(*phases):
+    # phases are (name, interval_ms), every tick is logged as (name, dt_ms, ms_elapsed_since_start)
+    scheduler = UpdateScheduler()
+    log = []
+    for name, interval_ms in phases:
+        scheduler.add_phase(name, lambda dt_ms, t, name=name: log.append((name, dt_ms, t)), interval_ms)
+    return scheduler, log
+
+
+def test_phases_tick_in_the_order_they_were_added():
+    scheduler, log = _scheduler(('player', 0), ('enemies', 0), ('hud', 0))
+    scheduler.tick(16, 16)
+    scheduler.tick(16, 32)
+    assert log == [('player', 16, 16), ('enemies', 16, 16), ('hud', 16, 16),
+                   ('player', 16, 32), ('enemies', 16, 32), ('hud', 16, 32)]
+    assert set(scheduler.phase_times_ms()) == {'player', 'enemies', 'hud'}
+
+
+def test_a_phase_with_an_interval_gets_the_time_built_up_since_its_last_tick():
+    scheduler, log = _scheduler(('every_frame', 0), ('slow', 50))
+    for frame in range(1, 11):
+        scheduler.tick(16, frame * 16)
+    slow = [(dt_ms, t) for name, dt_ms, t in log if name == 'slow']
+    # 16 ms frames against a 50 ms interval, every fourth frame, with all four frames' worth of time
+    assert slow == [(64, 64), (64, 128)]
+    assert len(log) == 10 + 2
+
+    scheduler.set_interval('slow', 16)
+    scheduler.tick(16, 176)
+    # the 32 ms left over from before comes along with the first tick at the new interval
+    assert log[-1] == ('slow', 48, 176)
+
+
+def test_a_paused_phase_is_skipped_and_starts_over_when_resumed():
+    scheduler, log = _scheduler(('player', 0), ('formation', 40))
+    scheduler.tick(16, 16)
+    scheduler.tick(16, 32)
+    scheduler.set_paused('formation', True)
+    for frame in range(3, 10):
+        scheduler.tick(16, frame * 16)
+    assert [name for name, _, _ in log] == ['player'] * 9
+    # pausing it again while paused doesn't matter
+    scheduler.set_paused('formation', True)
+
+    scheduler.set_paused('formation', False)
+    log.clear()
+    for frame in range(10, 13):
+        scheduler.tick(16, frame * 16)
+    # the 32 ms it had built up before the pause were dropped, so it needs a full interval again
+    assert [entry for entry in log if entry[0] == 'formation'] == [('formation', 48, 192)]
+
+    # resuming a phase that isn't paused keeps what it has built up
+    scheduler.tick(16, 208)
+    scheduler.set_paused('formation', False)
+    scheduler.tick(16, 224)
+    scheduler.tick(16, 240)
+    assert [entry for entry in log if entry[0] == 'formation'][-1] == ('formation', 48, 240)
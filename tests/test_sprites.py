@@ -0,0 +1,103 @@
+import numpy as np
+import pygame
+import pytest
+
+from spaceinvaders.collision import CollisionKind
+from spaceinvaders.main import SpaceInvaders
+from spaceinvaders.sprites import ColorizedFrameCache, mask_stencil
+
+
+@pytest.fixture
+def barrier_and_crater():
+    game = SpaceInvaders(headless=True, seed=0)
+    return game.barrier_sprites.sprites()[0], game.craters[CollisionKind.ENEMY_BULLET]
+
+
+def _state(barrier):
+    return pygame.surfarray.array_alpha(barrier.image), mask_stencil(barrier.mask)
+
+
+def _crater_area(barrier, crater, center):
+    # the pixels of the barrier the crater lands on, as a boolean array indexed [x, y]
+    area = np.zeros(barrier.image.get_size(), dtype=bool)
+    left, top = center[0] - crater.size[0] // 2, center[1] - crater.size[1] // 2
+    for x, y in zip(*np.nonzero(crater.stencil)):
+        if 0 <= left + x < area.shape[0] and 0 <= top + y < area.shape[1]:
+            area[left + x, top + y] = True
+    return area
+
+
+@pytest.mark.parametrize('center', [(11, 8), (0, 0), (21, 15)])
+def test_erode_clears_the_crater_and_nothing_else(barrier_and_crater, center):
+    barrier, crater = barrier_and_crater
+    alpha_before, mask_before = _state(barrier)
+    barrier.erode([(crater, center)])
+    alpha, mask = _state(barrier)
+    inside = _crater_area(barrier, crater, center)
+    assert inside.any()
+    # inside the crater, transparent and out of the mask, in both cases only where there was barrier before
+    assert not alpha[inside].any()
+    assert not mask[inside].any()
+    assert (alpha_before[inside] > 0).any()
+    # outside it, untouched
+    assert np.array_equal(alpha[~inside], alpha_before[~inside])
+    assert np.array_equal(mask[~inside], mask_before[~inside])
+    # the mask still agrees with the pixels
+    assert np.array_equal(mask, alpha > 0)
+    assert barrier.hitbox == barrier.mask.get_bounding_rects()[0].unionall(
+        barrier.mask.get_bounding_rects()[1:]).move(barrier.rect.topleft)
+
+
+def test_hitting_the_same_spot_again_changes_nothing(barrier_and_crater):
+    barrier, crater = barrier_and_crater
+    barrier.erode([(crater, (11, 8))])
+    alpha, mask = _state(barrier)
+    version = barrier.image_version
+    # twice more in one frame, then again in another
+    barrier.erode([(crater, (11, 8)), (crater, (11, 8))])
+    barrier.erode([(crater, (11, 8))])
+    assert np.array_equal(_state(barrier)[0], alpha)
+    assert np.array_equal(_state(barrier)[1], mask)
+    assert barrier.image_version == version + 2
+    assert barrier.alive()
+
+
+def _frames(count):
+    frames = []
+    for index in range(count):
+        frame = pygame.Surface((4, 4), pygame.SRCALPHA)
+        frame.fill((255, 255, 255, 255), (0, 0, index + 1, 1))
+        frames.append(frame)
+    return frames
+
+
+def test_colorized_frames_are_evicted_least_recently_used_first():
+    cache = ColorizedFrameCache(maxsize=2)
+    a, b, c = _frames(3)
+    red = (255, 0, 0)
+    a_red = cache.get(a, red)
+    cache.get(b, red)
+    # a was used last, so b is the one to go when c comes in
+    assert cache.get(a, red) is a_red
+    cache.get(c, red)
+    assert list(cache.frames) == [(a, red), (c, red)]
+    assert cache.stats() == {'hits': 1, 'misses': 3, 'size': 2, 'maxsize': 2}
+    # b is colorized again, and pushes a out, the least recently used now
+    cache.get(b, red)
+    assert list(cache.frames) == [(c, red), (b, red)]
+    assert cache.get(a, red) is not a_red
+    assert cache.stats() == {'hits': 1, 'misses': 5, 'size': 2, 'maxsize': 2}
+
+
+def test_the_same_frame_in_another_color_is_another_entry():
+    cache = ColorizedFrameCache(maxsize=4)
+    [frame] = _frames(1)
+    red, green = cache.get(frame, (255, 0, 0)), cache.get(frame, [0, 255, 0])
+    assert red is not green
+    assert red.get_at((0, 0)) == (255, 0, 0, 255)
+    assert green.get_at((0, 0)) == (0, 255, 0, 255)
+    # a color given as a list finds the entry made with a tuple
+    assert cache.get(frame, [255, 0, 0]) is red
+    assert cache.stats() == {'hits': 1, 'misses': 2, 'size': 2, 'maxsize': 4}
+    cache.clear()
+    assert cache.stats() == {'hits': 0, 'misses': 0, 'size': 0, 'maxsize': 4}
@@ -0,0 +1,62 @@
+import string
+
+import pygame
+import pytest
+
+from spaceinvaders.main import SCORE_FONT_PATH, FG_COLOR
+from spaceinvaders.text import DEFAULT_CHARSET, GlyphAtlas
+
+# the overlay's charset, see ProfilerOverlay
+OVERLAY_CHARSET = string.digits + string.ascii_letters + ' ._-'
+HUD_STRINGS = ['SCORE P1', 'HI-SCORE', '0000', '0120', '9990', '12345', 'GAME OVER', '\'N\' to play again!',
+               '0', '3', '9']
+OVERLAY_STRINGS = ['p50 0.1 p95 12.3 p99 105.7', 'collision.enemy_and_ 0.42', 'update 1.05', 'draw 0.37',
+                   'collision.bullet_and 0.01']
+
+
+@pytest.fixture(scope='module')
+def font():
+    pygame.font.init()
+    return pygame.font.Font(SCORE_FONT_PATH, 8)
+
+
+def _pixels(surface, size):
+    # what the surface looks like drawn onto the black screen
+    screen = pygame.Surface(size)
+    screen.blit(surface, (0, 0))
+    return pygame.image.tobytes(screen, 'RGB')
+
+
+@pytest.mark.parametrize('charset, strings', [
+    (DEFAULT_CHARSET, HUD_STRINGS + list(DEFAULT_CHARSET)),
+    (OVERLAY_CHARSET, OVERLAY_STRINGS + list(OVERLAY_CHARSET)),
+])
+def test_glyphs_side_by_side_look_like_the_font(font, charset, strings):
+    atlas = GlyphAtlas(font, False, FG_COLOR, charset=charset)
+    for text in strings:
+        expected = font.render(text, False, FG_COLOR)
+        composed = atlas.render(text)
+        assert composed.get_size() == expected.get_size(), text
+        assert _pixels(composed, expected.get_size()) == _pixels(expected, expected.get_size()), text
+        # and the same surface from the memo the next time
+        assert atlas.render(text) is composed
+
+
+def test_text_outside_the_charset_goes_to_the_font(font):
+    atlas = GlyphAtlas(font, False, FG_COLOR, charset=string.digits)
+    expected = font.render('P1 0042', False, FG_COLOR)
+    composed = atlas.render('P1 0042')
+    assert _pixels(composed, expected.get_size()) == _pixels(expected, expected.get_size())
+    assert set(atlas.glyphs) == set(string.digits)
+
+
+def test_every_glyph_is_rendered_up_front(font, monkeypatch):
+    atlas = GlyphAtlas(font, False, FG_COLOR)
+    assert set(atlas.glyphs) == set(DEFAULT_CHARSET)
+
+    def render(*args):
+        raise AssertionError('font.render called after the atlas was built')
+
+    monkeypatch.setattr(atlas, 'font', type('Font', (), {'render': staticmethod(render)})())
+    for text in HUD_STRINGS:
+        atlas.render(text)
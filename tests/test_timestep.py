@@ -0,0 +1,47 @@
+import random
+
+import pytest
+
+from spaceinvaders.timestep import FixedTimestep
+
+
+def test_leftover_time_is_carried_into_the_next_frame():
+    timestep = FixedTimestep(16)
+    assert timestep.advance(10) == 0
+    assert timestep.alpha == pytest.approx(10 / 16)
+    # 10 + 10 is one tick with 4 ms over
+    assert timestep.advance(10) == 1
+    assert timestep.accumulated_ms == pytest.approx(4)
+    assert timestep.advance(60) == 4
+    assert timestep.accumulated_ms == pytest.approx(0)
+
+
+@pytest.mark.parametrize('refresh_hz', [30, 60, 75, 144, 240])
+def test_ticks_per_frame_add_up_to_the_time_gone_by(refresh_hz):
+    timestep = FixedTimestep(16)
+    frame_ms = 1000 / refresh_hz
+    ticks = [timestep.advance(frame_ms) for _ in range(refresh_hz * 10)]
+    # ten seconds of frames is ten seconds of ticks, give or take the one still accumulating
+    assert sum(ticks) == 10_000 // 16
+    assert max(ticks) - min(ticks) <= 1
+    assert max(ticks) == -(-frame_ms // 16)
+
+
+@pytest.mark.parametrize('speed', [1, 2, 4, 8])
+def test_a_stall_runs_at_most_max_ticks_and_drops_the_rest(speed):
+    timestep = FixedTimestep(16, max_ticks_per_frame=5, speed=speed)
+    assert timestep.advance(2000) == 5 * speed
+    assert timestep.alpha == 0
+    # and the frames after it are back to normal, not still working off the backlog
+    assert timestep.advance(16) == speed
+    # speed scales the time going in
+    assert timestep.advance(8) == speed // 2
+    assert timestep.alpha == pytest.approx(0 if speed > 1 else 0.5)
+
+
+def test_alpha_stays_within_a_tick():
+    timestep = FixedTimestep(16, speed=2)
+    rng = random.Random(1)
+    for _ in range(10_000):
+        timestep.advance(rng.choice([0, 0.5, 7, 16, 16.7, 33.3, 100, 500]))
+        assert 0 <= timestep.alpha < 1
@@ -0,0 +1,30 @@
+import numpy as np
+
+from spaceinvaders.sprites import colorized_frame_cache
+from spaceinvaders.vector_env import VectorEnv
+
+
+def test_games_share_their_frames():
+    env = VectorEnv(8, seed=0)
+    env.reset()
+    # every game was built from the same bundle, so they all draw the same colorized surfaces
+    assert len({id(game.assets) for game in env.games}) == 1
+    misses = colorized_frame_cache.misses
+    rng = np.random.default_rng(0)
+    for _ in range(200):
+        env.step(rng.integers(env.num_actions, size=env.num_envs))
+    assert colorized_frame_cache.misses == misses
+
+
+def test_no_lives():
+    env = VectorEnv(2, seed=0, config={'starting_lives': 0})
+    observations = env.reset()
+    assert np.all(observations[:, 2] == 0)
+    observations, _, _, _ = env.step([3, 3])
+    assert np.all(observations[:, 2] == 0)
+
+
+def test_lives_are_scaled_by_the_starting_lives():
+    env = VectorEnv(2, seed=0, config={'starting_lives': 2})
+    observations = env.reset()
+    assert np.all(observations[:, 2] == 1)